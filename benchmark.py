@@ -0,0 +1,855 @@
+"""Micro-benchmarks for the Character Tracker data layer.
+
+Run with `python benchmark.py [name ...]`; with no names every benchmark runs.
+"""
+import gc
+import json
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from character_tracker_core import (
+    CORE_ATTRIBUTES, EQUIPMENT_SLOTS, INVENTORY_SORT_KEYS, MAX_LEVEL, Character, Item, PersistenceManager,
+    SaveFileStream, SheetRenderer, ShardedPersistenceManager, SQLitePersistenceManager, Skill, SkillLevelArrays,
+    apply_exp_events, character_from_dict, compact_inventories, export_sheets, get_exp_for_next_level,
+    recompute_all_stats, render_character_sheet, resolve_level_gain, resolve_level_loss, search_capped,
+    set_derived_stats, sheet_filename
+)
+import character_tracker_core
+
+
+def _timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+
+# --- Reference implementations (the original per-level loops) ---
+def _loop_level_gain(level, exp, amount):
+    exp += amount
+    while level < MAX_LEVEL and exp >= get_exp_for_next_level(level):
+        exp -= get_exp_for_next_level(level)
+        level += 1
+    return level, exp
+
+
+def _loop_level_loss(level, exp, amount):
+    exp -= amount
+    while level > 1 and exp < 0:
+        level -= 1
+        exp += get_exp_for_next_level(level)
+    if exp < 0:
+        exp = 0
+    return level, exp
+
+
+def _loop_total_attribute(char, attr_name):
+    bonus = 0
+    for item in char.equipment.values():
+        if item and hasattr(item, 'effects') and item.effects:
+            bonus += item.effects.get(attr_name, 0)
+    return char.attributes.get(attr_name, 0) + bonus
+
+
+def bench_leveling(grants=20000, seed=1):
+    """Large EXP grants on many skills: per-level loop vs prefix-table bisect."""
+    rng = random.Random(seed)
+    cases = [(rng.randint(1, MAX_LEVEL), rng.randint(0, 500), rng.randint(0, 20_000_000)) for _ in range(grants)]
+
+    for level, exp, amount in cases:
+        assert resolve_level_gain(level, exp, amount) == _loop_level_gain(level, exp, amount)
+        assert resolve_level_loss(level, exp, amount) == _loop_level_loss(level, exp, amount)
+
+    def run(resolve):
+        for level, exp, amount in cases:
+            resolve(level, exp, amount)
+
+    _, loop_gain = _timed(run, _loop_level_gain)
+    _, fast_gain = _timed(run, resolve_level_gain)
+    _, loop_loss = _timed(run, _loop_level_loss)
+    _, fast_loss = _timed(run, resolve_level_loss)
+    print(f"leveling: {grants} grants, results identical")
+    print(f"  gain  loop {loop_gain * 1000:8.1f} ms | bisect {fast_gain * 1000:8.1f} ms | x{loop_gain / fast_gain:.1f}")
+    print(f"  loss  loop {loop_loss * 1000:8.1f} ms | bisect {fast_loss * 1000:8.1f} ms | x{loop_loss / fast_loss:.1f}")
+
+
+def _make_roster(characters, skills_per_character):
+    roster = []
+    for c in range(characters):
+        char = Character(name=f"Character {c}")
+        char.skills = [Skill(f"Skill {s}") for s in range(skills_per_character)]
+        roster.append(char)
+    return roster
+
+
+def _make_full_roster(characters, skills_per_character=30, items_per_character=60):
+    roster = {}
+    for char in _make_roster(characters, skills_per_character):
+        char.inventory = [Item(f"Item {i}", description="A well-worn piece of adventuring gear.",
+                               item_type="Material", effects={"Strength": 1} if i % 10 == 0 else None)
+                          for i in range(items_per_character)]
+        char.notes = "Session notes. " * 20
+        roster[char.name] = char
+    return roster
+
+
+def bench_batch_exp(event_count=500_000, seed=2):
+    """Session-log EXP events: one call per event vs apply_exp_events."""
+    rng = random.Random(seed)
+    skill_names = [f"Skill {s}" for s in range(50)] + [None]
+
+    def make_events(roster):
+        rng.seed(seed)
+        return [(rng.choice(roster), rng.choice(skill_names), rng.randint(-50, 400)) for _ in range(event_count)]
+
+    per_event_roster = _make_roster(200, 50)
+    events = make_events(per_event_roster)
+
+    def per_event():
+        for char, skill_name, delta in events:
+            if skill_name is None:
+                if delta >= 0:
+                    char.add_exp(delta)
+                else:
+                    char.remove_exp(-delta)
+                continue
+            index = next(i for i, s in enumerate(char.skills) if s.name == skill_name)
+            if delta >= 0:
+                char.add_skill_exp(index, delta)
+            else:
+                char.remove_skill_exp(index, -delta)
+
+    _, per_event_time = _timed(per_event)
+    batch_roster = _make_roster(200, 50)
+    report, batch_time = _timed(apply_exp_events, make_events(batch_roster))
+    print(f"batch_exp: {event_count} events over {len(report)} targets")
+    print(f"  per-event {per_event_time * 1000:8.1f} ms | batch {batch_time * 1000:8.1f} ms"
+          f" | {event_count / batch_time:,.0f} events/s")
+
+
+def bench_bulk_leveling(skill_count=300_000, seed=3):
+    """Whole-roster skill recompute: scalar engine per skill vs SkillLevelArrays."""
+    rng = random.Random(seed)
+    skills = [Skill(f"Skill {i}", rng.randint(1, MAX_LEVEL), rng.randint(0, 300)) for i in range(skill_count)]
+    deltas = [rng.randint(-2_000_000, 2_000_000) for _ in range(skill_count)]
+
+    def scalar():
+        results = []
+        for skill, delta in zip(skills, deltas):
+            if delta >= 0:
+                results.append(resolve_level_gain(skill.level, skill.exp, delta))
+            else:
+                results.append(resolve_level_loss(skill.level, skill.exp, -delta))
+        return results
+
+    expected, scalar_time = _timed(scalar)
+    arrays = SkillLevelArrays([Skill(s.name, s.level, s.exp) for s in skills])
+    _, bulk_time = _timed(arrays.apply_exp, deltas)
+    arrays.write_back()
+    assert [(s.level, s.exp) for s in arrays.skills] == expected
+
+    old_table = [0] + [int(80 * (lvl ** 1.4)) for lvl in range(1, MAX_LEVEL + 1)]
+    _, rebalance_time = _timed(arrays.rebalance, old_table)
+    engine = "numpy" if character_tracker_core.np is not None else "pure Python"
+    print(f"bulk_leveling: {skill_count} skills ({engine}), results match the scalar engine")
+    print(f"  scalar {scalar_time * 1000:8.1f} ms | bulk {bulk_time * 1000:8.1f} ms | rebalance {rebalance_time * 1000:8.1f} ms")
+
+
+def bench_startup_load(characters=2000):
+    """Startup with a large roster: v6 single-file load vs sharded index + active character."""
+    roster = _make_full_roster(characters)
+    active = next(iter(roster))
+    with tempfile.TemporaryDirectory() as tmp:
+        legacy_path = os.path.join(tmp, "character_data_v6.json")
+        PersistenceManager(legacy_path).save(roster, "dark", active)
+        ShardedPersistenceManager(os.path.join(tmp, "shards")).save(roster, "dark", active)
+
+        _, legacy_time = _timed(PersistenceManager(legacy_path).load)
+
+        def sharded_startup():
+            loaded, _, active_name = ShardedPersistenceManager(os.path.join(tmp, "shards")).load()
+            return loaded[active_name]
+
+        _, sharded_time = _timed(sharded_startup)
+    print(f"startup_load: {characters} characters")
+    print(f"  v6 single file {legacy_time * 1000:8.1f} ms | sharded {sharded_time * 1000:8.1f} ms")
+
+
+def bench_sqlite(characters=10_000):
+    """JSON vs SQLite backends: full save, load, one EXP change and a cross-roster query."""
+    roster = _make_full_roster(characters, skills_per_character=10, items_per_character=20)
+    active = next(iter(roster))
+    with tempfile.TemporaryDirectory() as tmp:
+        json_pm = PersistenceManager(os.path.join(tmp, "character_data_v6.json"))
+        sqlite_pm = SQLitePersistenceManager(os.path.join(tmp, "character_data.db"))
+        _, json_save = _timed(json_pm.save, roster, "dark", active)
+        _, sqlite_save = _timed(sqlite_pm.save, roster, "dark", active)
+
+        _, json_load = _timed(PersistenceManager(json_pm.filepath).load)
+        reader = SQLitePersistenceManager(sqlite_pm.filepath)
+        (loaded, _, _), sqlite_load = _timed(reader.load)
+
+        roster[active].add_skill_exp(0, 250)
+        _, json_update = _timed(json_pm.save, roster, "dark", active, {active})
+        _, sqlite_update = _timed(sqlite_pm.save, roster, "dark", active, {active})
+        _, query = _timed(reader.characters_holding_item, "Item 7")
+        sqlite_pm.close()
+        reader.close()
+    print(f"sqlite: {characters} characters")
+    print(f"  full save  json {json_save * 1000:8.1f} ms | sqlite {sqlite_save * 1000:8.1f} ms")
+    print(f"  load       json {json_load * 1000:8.1f} ms | sqlite {sqlite_load * 1000:8.1f} ms (lazy roster)")
+    print(f"  EXP change json {json_update * 1000:8.1f} ms | sqlite {sqlite_update * 1000:8.1f} ms")
+    print(f"  characters_holding_item {query * 1000:8.1f} ms")
+
+
+def bench_search(item_count=100_000, seed=4, budget_ms=16):
+    """Live inventory search while typing: substring scan of every item vs the SearchIndex."""
+    rng = random.Random(seed)
+    words = ["iron", "sword", "shield", "potion", "elixir", "ring", "amulet", "bow", "dagger", "scroll",
+             "herb", "ancient", "cursed", "blessed", "dragon", "goblin", "silver", "golden", "minor", "greater"]
+    char = Character(name="Hoarder")
+    char.inventory = [Item(f"{rng.choice(words).title()} {rng.choice(words).title()} {i}",
+                           description=f"{rng.choice(words)} {rng.choice(words)} {rng.choice(words)}",
+                           item_type=rng.choice(["Weapon", "Ring", "Consumable", "Material", "Other"]))
+                      for i in range(item_count)]
+    _, build_time = _timed(char.search_inventory, "warmup")
+    print(f"search: {item_count} items, index built in {build_time * 1000:.1f} ms (once per list, in time slices)")
+    typed = "golden dagger 9"
+    worst, over = 0.0, []
+    for length in range(1, len(typed) + 1):
+        term = typed[:length]
+
+        def scan():
+            needle = term.lower()
+            return [item for item in char.inventory
+                    if needle in item.name.lower() or needle in item.item_type.lower() or needle in item.description.lower()]
+        expected, scan_time = _timed(scan)
+        found, index_time = _timed(char.search_inventory, term)
+        capped = search_capped(term, len(found))
+        assert found == (expected[:len(found)] if capped else expected)
+        worst = max(worst, index_time)
+        if index_time * 1000 > budget_ms:
+            over.append(term)
+        hits = f"first {len(found)}" if capped else f"{len(found)}"
+        print(f"  {term!r:<18} {hits:>10} hits | scan {scan_time * 1000:7.2f} ms | index {index_time * 1000:7.2f} ms")
+    print(f"  worst keystroke with index: {worst * 1000:.2f} ms (budget {budget_ms} ms)")
+    if over:
+        print(f"  over budget: {', '.join(map(repr, over))}")
+    char.sorted_records(char.inventory, "Item Name") # Sort order cache, built once per column
+    for term in ("g", "go"):
+        shown, sorted_time = _timed(char.sorted_records, char.inventory, "Item Name", True, term)
+        print(f"  {term!r} sorted by name, descending: first {len(shown)} in that order in {sorted_time * 1000:.2f} ms")
+
+
+def bench_sorting(item_count=100_000, edits=200, seed=5):
+    """Column-header clicks and single edits on a large inventory: full re-sort vs cached sort orders."""
+    rng = random.Random(seed)
+    types = ["Weapon", "Ring", "Consumable", "Material", "Other"]
+
+    def make_item():
+        return Item(f"Item {rng.randint(0, 10 ** 6)}", item_type=rng.choice(types), quantity=rng.randint(1, 99))
+
+    char = Character(name="Hoarder")
+    char.inventory = [make_item() for _ in range(item_count)]
+    inventory = char.inventory
+    clicks = [(column, reverse) for column in INVENTORY_SORT_KEYS for reverse in (False, True)]
+
+    def resort_clicks():
+        for column, reverse in clicks:
+            sorted(inventory, key=INVENTORY_SORT_KEYS[column], reverse=reverse)
+
+    def cached_clicks():
+        for column, reverse in clicks:
+            char.sorted_records(inventory, column, reverse)
+
+    _, build_time = _timed(cached_clicks)
+    _, resort_time = _timed(resort_clicks)
+    _, cached_time = _timed(cached_clicks)
+
+    def resort_edits():
+        for _ in range(edits):
+            inventory[rng.randrange(len(inventory))] = make_item()
+            sorted(inventory, key=INVENTORY_SORT_KEYS["Qty"])
+
+    def cached_edits():
+        for _ in range(edits):
+            position = rng.randrange(len(inventory))
+            old = inventory[position]
+            inventory[position] = make_item()
+            char.index_record(inventory, position, replaced=old)
+            char.sorted_records(inventory, "Qty")
+
+    _, resort_edit_time = _timed(resort_edits)
+    char._inventory_order = None # The re-sort run bypassed the cache
+    char.sorted_records(inventory, "Qty")
+    _, cached_edit_time = _timed(cached_edits)
+
+    char.unindex_record(inventory, 0)
+    del inventory[0]
+    inventory.append(make_item())
+    char.index_record(inventory, len(inventory) - 1)
+    for column, reverse in clicks:
+        expected = sorted(inventory, key=INVENTORY_SORT_KEYS[column])
+        if reverse:
+            expected.reverse()
+        assert char.sorted_records(inventory, column, reverse) == expected
+    print(f"sorting: {item_count} items, {len(clicks)} header clicks, orders match a full re-sort")
+    print(f"  clicks  re-sort {resort_time * 1000:8.1f} ms | cached {cached_time * 1000:8.1f} ms"
+          f" (first build {build_time * 1000:.1f} ms)")
+    print(f"  {edits} edits re-sort {resort_edit_time * 1000:8.1f} ms | incremental {cached_edit_time * 1000:8.1f} ms")
+
+
+def bench_equipment_bonus(characters=5000, seed=6):
+    """Derived stats for a fully equipped roster: per-call slot scan vs cached equipment bonuses."""
+    rng = random.Random(seed)
+
+    def make_gear(slot):
+        return Item(f"{slot} of Testing", item_type=slot.split()[0],
+                    effects={attr: rng.randint(-2, 5) for attr in rng.sample(CORE_ATTRIBUTES, 3)})
+
+    roster = []
+    for c in range(characters):
+        char = Character(name=f"Character {c}")
+        for slot in EQUIPMENT_SLOTS:
+            char.equip(slot, make_gear(slot))
+        roster.append(char)
+
+    def loop_stats():
+        return [[(_loop_total_attribute(char, attr) - 10) // 2 for attr in CORE_ATTRIBUTES] for char in roster]
+
+    def cached_stats():
+        return [[char.get_attribute_modifier(attr) for attr in CORE_ATTRIBUTES] for char in roster]
+
+    expected, loop_time = _timed(loop_stats)
+    _, first_time = _timed(cached_stats)
+    found, cached_time = _timed(cached_stats)
+    assert found == expected
+
+    for char in roster:
+        for slot in rng.sample(EQUIPMENT_SLOTS, 3):
+            if rng.random() < 0.5:
+                char.unequip(slot)
+            else:
+                char.equip(slot, make_gear(slot))
+    assert cached_stats() == loop_stats()
+    print(f"equipment_bonus: {characters} characters x {len(CORE_ATTRIBUTES)} modifiers, results match the slot scan")
+    print(f"  scan {loop_time * 1000:8.1f} ms | cached {cached_time * 1000:8.1f} ms (first pass {first_time * 1000:.1f} ms)"
+          f" | {characters / cached_time:,.0f} characters/s")
+
+
+def bench_derived_stats(characters=10_000, seed=7):
+    """Derived stats: attribute edits re-evaluating only dependents, and a roster-wide balance patch."""
+    rng = random.Random(seed)
+    roster = []
+    for c in range(characters):
+        char = Character(name=f"Character {c}", level=rng.randint(1, 50),
+                         attributes={attr: rng.randint(3, 20) for attr in CORE_ATTRIBUTES})
+        char.equip("Ring 1", Item("Ring of Vigor", item_type="Ring", effects={"Constitution": 2, "Strength": 1}))
+        roster.append(char)
+
+    def original_stats(char):
+        stats = {"Health": 100 + (char.attributes["Constitution"] - 10) * 5,
+                 "Mana": 100 + (char.attributes["Intelligence"] - 10) * 5}
+        stats.update({f"{attr} Modifier": (_loop_total_attribute(char, attr) - 10) // 2 for attr in CORE_ATTRIBUTES})
+        return stats
+
+    _, first_time = _timed(lambda: [char.derived_stats() for char in roster])
+    edits = [(char, rng.choice(CORE_ATTRIBUTES), rng.randint(3, 20)) for char in roster]
+
+    def full_recompute():
+        for char, attr, value in edits:
+            char.attributes[attr] = value
+            char._derived = None
+            char.derived_stats()
+
+    def incremental():
+        for char, attr, value in edits:
+            char.set_attribute(attr, value + 1)
+
+    _, full_time = _timed(full_recompute)
+    _, incremental_time = _timed(incremental)
+    assert all(char.derived_stats() == original_stats(char) for char in roster)
+
+    definitions = dict(character_tracker_core.DERIVED_STATS)
+    try:
+        set_derived_stats({**definitions,
+                           "Health": (("Constitution Total", "level"), lambda con, level: 80 + con * 4 + level * 2)})
+        _, per_char_time = _timed(lambda: [char.derived_stats() for char in roster])
+        columns, bulk_time = _timed(recompute_all_stats, roster)
+        assert columns["Health"] == [80 + char.get_total_attribute("Constitution") * 4 + char.level * 2 for char in roster]
+        char = roster[0]
+        char.add_exp(get_exp_for_next_level(char.level))
+        assert char.get_health() == 80 + char.get_total_attribute("Constitution") * 4 + char.level * 2
+    finally:
+        set_derived_stats(definitions)
+    print(f"derived_stats: {characters} characters, {len(definitions)} stats, results match the original formulas")
+    print(f"  first evaluation {first_time * 1000:8.1f} ms")
+    print(f"  one attribute edit each: full {full_time * 1000:8.1f} ms | dependents only {incremental_time * 1000:8.1f} ms")
+    print(f"  balance patch: per character {per_char_time * 1000:8.1f} ms | bulk {bulk_time * 1000:8.1f} ms"
+          f" | {characters / bulk_time:,.0f} characters/s")
+
+
+class _DictItem:
+    """Item as it was before __slots__, for the memory comparison."""
+    def __init__(self, name, description="", quantity=1, item_type="Other", effects=None):
+        self.name = name
+        self.description = description
+        self.quantity = quantity
+        self.item_type = item_type
+        self.effects = effects if effects is not None else {}
+
+
+def _traced_size(build, text):
+    """Bytes still allocated after parsing `text` and building records from it, once the parsed data is dropped."""
+    gc.collect()
+    tracemalloc.start()
+    records = build(json.loads(text))
+    gc.collect()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return records, size
+
+
+def bench_memory(count=200_000, seed=8):
+    """Memory for many items and skills as loaded from a save: dict-backed vs __slots__ records."""
+    rng = random.Random(seed)
+    items_text = json.dumps([{'name': f"Item {i}", 'description': "", 'quantity': rng.randint(1, 5),
+                              'item_type': rng.choice(["Weapon", "Ring", "Consumable", "Material"]),
+                              'effects': {"Strength": 1} if i % 20 == 0 else {}} for i in range(count)])
+    skills_text = json.dumps([{'name': f"Skill {i}", 'level': rng.randint(1, MAX_LEVEL), 'exp': rng.randint(0, 5000)}
+                              for i in range(count)])
+
+    _, dict_items = _traced_size(lambda data: [_DictItem(**d) for d in data], items_text)
+    _, slot_items = _traced_size(lambda data: [Item(**d) for d in data], items_text)
+    _, dict_skills = _traced_size(lambda data: data, skills_text)
+    _, slot_skills = _traced_size(lambda data: [Skill(**d) for d in data], skills_text)
+
+    roster = _make_full_roster(50)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "character_data_v6.json")
+        PersistenceManager(path).save(roster, "dark", "Character 0")
+        with open(path, encoding='utf-8') as f:
+            first = f.read()
+        loaded, _, _ = PersistenceManager(path).load()
+        PersistenceManager(path).save(loaded, "dark", "Character 0")
+        with open(path, encoding='utf-8') as f:
+            assert f.read() == first
+    print(f"memory: {count} items and {count} skills, save files round-trip byte for byte")
+    print(f"  items  dict {dict_items / count:6.1f} B each | __slots__ {slot_items / count:6.1f} B each"
+          f" | {dict_items / 2 ** 20:.1f} -> {slot_items / 2 ** 20:.1f} MiB")
+    print(f"  skills dict {dict_skills / count:6.1f} B each | __slots__ {slot_skills / count:6.1f} B each"
+          f" | {dict_skills / 2 ** 20:.1f} -> {slot_skills / 2 ** 20:.1f} MiB")
+
+
+def bench_record_index(skill_count=5000, item_count=100_000, lookups=200, seed=9):
+    """Bulk skill import and Treeview row lookups: linear scans vs name and uid/position indexes."""
+    rng = random.Random(seed)
+    names = [f"Skill {i}" for i in range(skill_count)]
+
+    def scan_import():
+        skills = []
+        for name in names:
+            if not any(s.name == name for s in skills):
+                skills.append(Skill(name))
+        return skills
+
+    expected, scan_time = _timed(scan_import)
+    char = Character(name="Scholar")
+    _, index_time = _timed(lambda: [char.add_skill(name) for name in names])
+    assert [s.name for s in char.skills] == [s.name for s in expected]
+    assert not char.add_skill(names[0])
+
+    char.inventory = [Item(f"Item {i}") for i in range(item_count)]
+    targets = [char.inventory[rng.randrange(item_count)] for _ in range(lookups)]
+    iids = [str(id(item)) for item in targets]
+
+    def scan_lookups():
+        for iid in iids:
+            next(index for index, item in enumerate(char.inventory) if id(item) == int(iid))
+
+    def uid_lookups():
+        return [char.position_for_uid(char.inventory, item.uid) for item in targets]
+
+    _, row_scan_time = _timed(scan_lookups)
+    _, build_time = _timed(lambda: char.position_for_uid(char.inventory, -1)) # Builds the index once per list
+    positions, row_index_time = _timed(uid_lookups)
+    assert [char.inventory[p] for p in positions] == targets
+
+    def delete_and_look_up():
+        """Deletes as the Inventory tab does, looking each row up by uid first."""
+        for item in targets[:lookups // 2]:
+            position = char.position_for_uid(char.inventory, item.uid)
+            if position is not None:
+                char.unindex_record(char.inventory, position)
+                del char.inventory[position]
+        return [char.position_for_uid(char.inventory, item.uid) for item in targets[lookups // 2:]]
+
+    positions, delete_time = _timed(delete_and_look_up)
+    assert [char.inventory[p] for p in positions if p is not None] == [
+        item for item in targets[lookups // 2:] if item not in targets[:lookups // 2]]
+    print(f"record_index: importing {skill_count} skills, {lookups} row lookups in {item_count} items")
+    print(f"  import  any() scan {scan_time * 1000:8.1f} ms | name index {index_time * 1000:8.1f} ms")
+    print(f"  lookups id() scan  {row_scan_time * 1000:8.1f} ms | uid index  {row_index_time * 1000:8.1f} ms"
+          f" (+{build_time * 1000:.1f} ms to build it once)")
+    print(f"  {lookups // 2} deletes, then {lookups - lookups // 2} lookups {delete_time * 1000:8.1f} ms")
+
+
+def bench_stacking(drops=50_000, kinds=300, characters=20, seed=10):
+    """Loot-heavy campaign: appending every drop vs stacking, and compacting existing saves."""
+    rng = random.Random(seed)
+    loot = [(f"Loot {k}", rng.choice(["Material", "Consumable", "Other"]), f"Dropped by monster {k % 17}")
+            for k in range(kinds)]
+    rolls = [rng.choice(loot) for _ in range(drops)]
+
+    appended = Character(name="Packrat")
+    _, append_time = _timed(lambda: [appended.inventory.append(Item(n, d, 1, t)) for n, t, d in rolls])
+    stacked = Character(name="Organized")
+    _, stack_time = _timed(lambda: [stacked.add_item(Item(n, d, 1, t)) for n, t, d in rolls])
+    assert sum(i.quantity for i in stacked.inventory) == drops and len(stacked.inventory) <= kinds
+
+    roster = {}
+    for c in range(characters):
+        char = Character(name=f"Character {c}")
+        char.inventory = [Item(n, d, 1, t) for n, t, d in rolls[c::characters]]
+        roster[char.name] = char
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "character_data_v6.json")
+        PersistenceManager(path).save(roster, "dark", "Character 0")
+        before = os.path.getsize(path)
+        report, compact_time = _timed(compact_inventories, roster.values())
+        PersistenceManager(path).save(roster, "dark", "Character 0")
+        after = os.path.getsize(path)
+    entries = sum(len(char.inventory) for char in roster.values())
+    print(f"stacking: {drops} loot drops of {kinds} kinds")
+    print(f"  append {append_time * 1000:8.1f} ms -> {len(appended.inventory)} entries"
+          f" | stack {stack_time * 1000:8.1f} ms -> {len(stacked.inventory)} entries")
+    print(f"  compact {characters} characters {compact_time * 1000:8.1f} ms: {sum(report.values())} entries merged,"
+          f" {entries} left | save {before / 1024:.0f} KiB -> {after / 1024:.0f} KiB")
+
+
+def _peak_memory(func, *args):
+    gc.collect()
+    tracemalloc.start()
+    result = func(*args)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return result, peak
+
+
+def bench_streaming_load(characters=1500):
+    """Loading a large v6 save file: json.load of the whole tree vs SaveFileStream."""
+    roster = _make_full_roster(characters, skills_per_character=40, items_per_character=120)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "character_data_v6.json")
+        PersistenceManager(path).save(roster, "dark", "Character 0")
+        size = os.path.getsize(path)
+        del roster
+
+        def whole_tree():
+            with open(path, 'r') as f:
+                data = json.load(f)
+            return {name: character_from_dict(char_data) for name, char_data in data["characters"].items()}
+
+        def streamed():
+            return dict(SaveFileStream(path))
+
+        expected, tree_time = _timed(whole_tree)
+        found, stream_time = _timed(streamed)
+        assert list(found) == list(expected)
+        del expected, found
+        _, tree_peak = _peak_memory(whole_tree)
+        _, stream_peak = _peak_memory(streamed)
+        updates = []
+        PersistenceManager(path).load(progress=lambda done, total: updates.append(done))
+        assert updates[-1] == size
+    print(f"streaming_load: {characters} characters, {size / 2 ** 20:.1f} MiB file, {len(updates)} progress updates")
+    print(f"  json.load {tree_time * 1000:8.1f} ms, peak {tree_peak / 2 ** 20:7.1f} MiB"
+          f" | streamed {stream_time * 1000:8.1f} ms, peak {stream_peak / 2 ** 20:7.1f} MiB")
+
+
+def bench_save_formats(characters=10_000, seed=11):
+    """Size, save and load time of each SAVE_FORMATS mode for a large roster."""
+    rng = random.Random(seed)
+    words = ["iron", "sword", "ancient", "cursed", "dragon", "goblin", "silver", "minor", "scroll", "herb",
+             "the", "of", "a", "battle", "forest", "tavern", "quest", "gold", "map", "ally"]
+
+    def sentence(length):
+        return " ".join(rng.choice(words) for _ in range(length)).capitalize() + "."
+
+    roster = {}
+    for c in range(characters):
+        char = Character(name=f"Character {c}", level=rng.randint(1, 60), exp=rng.randint(0, 5000),
+                         notes=" ".join(sentence(12) for _ in range(4)))
+        char.skills = [Skill(f"Skill {rng.randint(0, 200)}", rng.randint(1, 40), rng.randint(0, 900)) for _ in range(10)]
+        char.inventory = [Item(f"{rng.choice(words).title()} {rng.choice(words).title()}", sentence(8),
+                               rng.randint(1, 9), rng.choice(["Weapon", "Ring", "Material"]))
+                          for _ in range(20)]
+        roster[char.name] = char
+
+    print(f"save_formats: {characters} characters")
+    with tempfile.TemporaryDirectory() as tmp:
+        for save_format in character_tracker_core.SAVE_FORMATS:
+            path = os.path.join(tmp, f"character_data_v6.{save_format}")
+            _, save_time = _timed(PersistenceManager(path, save_format).save, roster, "dark", "Character 0")
+            (loaded, _, _), load_time = _timed(PersistenceManager(path).load)
+            assert len(loaded) == characters
+            print(f"  {save_format:<8} {os.path.getsize(path) / 2 ** 20:7.1f} MiB"
+                  f" | save {save_time * 1000:8.1f} ms | load {load_time * 1000:8.1f} ms")
+
+
+def bench_snapshot(characters=10_000):
+    """Startup from a v6 save file: streaming every character vs the mmap'd RosterSnapshot."""
+    roster = _make_full_roster(characters, skills_per_character=10, items_per_character=20)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "character_data_v6.json")
+        snapshot_path = os.path.join(tmp, "character_data_v6.snap")
+        _, plain_save = _timed(PersistenceManager(path).save, roster, "dark", "Character 0")
+        _, snapshot_save = _timed(PersistenceManager(path, snapshot_path=snapshot_path).save,
+                                  roster, "dark", "Character 0")
+
+        (streamed, _, _), stream_time = _timed(PersistenceManager(path).load)
+        reader = PersistenceManager(path, snapshot_path=snapshot_path)
+        (lazy, _, _), open_time = _timed(reader.load)
+        names, names_time = _timed(list, lazy)
+        assert names == list(streamed)
+        first, first_time = _timed(lazy.__getitem__, "Character 0")
+        assert len(first.skills) == len(streamed["Character 0"].skills)
+
+        def stream_top_skills():
+            rows = [(name, skill.name, skill.level, skill.exp) for name, char in streamed.items() for skill in char.skills]
+            return sorted(rows, key=lambda row: (row[2], row[3]), reverse=True)[:10]
+
+        expected, scan_time = _timed(stream_top_skills)
+        found, query_time = _timed(reader.top_skills, 10)
+        assert [row[2:] for row in found] == [row[2:] for row in expected]
+
+        lazy["Character 0"].add_skill_exp(0, 250)
+        _, update_time = _timed(reader.save, lazy, "dark", "Character 0", {"Character 0"})
+        reloaded, _, _ = PersistenceManager(path, snapshot_path=snapshot_path).load()
+        assert reloaded["Character 0"].skills[0].exp == lazy["Character 0"].skills[0].exp
+        snapshot_size = os.path.getsize(snapshot_path)
+    print(f"snapshot: {characters} characters, {snapshot_size / 2 ** 20:.1f} MiB snapshot")
+    print(f"  save       plain {plain_save * 1000:8.1f} ms | with snapshot {snapshot_save * 1000:8.1f} ms")
+    print(f"  startup    streamed {stream_time * 1000:8.1f} ms | snapshot {open_time * 1000:8.1f} ms"
+          f" + names {names_time * 1000:.1f} ms + first character {first_time * 1000:.1f} ms")
+    print(f"  top_skills loaded scan {scan_time * 1000:8.1f} ms | snapshot {query_time * 1000:8.1f} ms")
+    print(f"  EXP change save on a lazy roster {update_time * 1000:8.1f} ms")
+
+
+class _ManualRoot:
+    """Stands in for tk.Tk in AutoSaver benchmarks: after() callbacks only run when run_pending() is called."""
+    def __init__(self):
+        self._jobs = {}
+        self._ids = iter(range(1, sys.maxsize))
+
+    def after(self, delay_ms, callback):
+        job = next(self._ids)
+        self._jobs[job] = callback
+        return job
+
+    def after_cancel(self, job):
+        self._jobs.pop(job, None)
+
+    def run_pending(self):
+        jobs, self._jobs = self._jobs, {}
+        for callback in jobs.values():
+            callback()
+
+
+def bench_background_save(characters=5000):
+    """Time an autosave holds the UI thread: a synchronous save vs AutoSaver handing a snapshot to its worker."""
+    try:
+        from character_tracker_app import AutoSaver # Imports tkinter, so only this benchmark needs it
+    except ImportError as e:
+        print(f"background_save: skipped, tkinter is not available ({e})")
+        return
+    roster = _make_full_roster(characters, skills_per_character=10, items_per_character=40)
+    active = next(iter(roster))
+    with tempfile.TemporaryDirectory() as tmp:
+        pm = PersistenceManager(os.path.join(tmp, "character_data_v6.json"))
+        _, sync_full = _timed(pm.save, roster, "dark", active)
+        roster[active].add_skill_exp(0, 250)
+        _, sync_update = _timed(pm.save, roster, "dark", active, {active})
+
+        root = _ManualRoot()
+        saver = AutoSaver(root, pm, lambda: (roster, "dark", active))
+        roster[active].add_skill_exp(0, 250)
+        saver.mark_dirty(active)
+        # Only the changed character is copied; the backend keeps every other one as stored
+        _, first_flush = _timed(saver.flush)
+        while saver.saving: # Let the worker go idle, so the next flush doesn't wait on its lock
+            time.sleep(0.005)
+            root.run_pending()
+        roster[active].add_skill_exp(0, 250)
+        saver.mark_dirty(active)
+        _, flush = _timed(saver.flush)
+        start = time.perf_counter()
+        assert saver.close()
+        wait = time.perf_counter() - start
+        reloaded, _, _ = PersistenceManager(pm.filepath).load()
+        assert reloaded[active].skills[0].exp == roster[active].skills[0].exp
+    print(f"background_save: {characters} characters")
+    print(f"  synchronous save  full {sync_full * 1000:8.1f} ms | one character {sync_update * 1000:8.1f} ms")
+    print(f"  UI thread per flush first {first_flush * 1000:8.1f} ms | one character {flush * 1000:8.1f} ms"
+          f" (close waited {wait * 1000:.1f} ms for the worker)")
+
+
+def bench_bulk_export(characters=4000):
+    """Markdown sheets for a whole roster: one process vs a process pool, to a directory and to a zip."""
+    roster = _make_full_roster(characters, skills_per_character=20, items_per_character=40)
+    broken = Character(name="Broken/Character")
+    broken.attributes["Strength"] = "ten" # Can't be totalled, so its sheet fails to render
+    roster[broken.name] = broken
+    print(f"bulk_export: {characters + 1} characters (one unrenderable)")
+    with tempfile.TemporaryDirectory() as tmp:
+        pool_size = max(2, os.cpu_count() or 1)
+        for label, destination, processes in [("in-process (default)", "serial", 1),
+                                              (f"{pool_size} processes, directory", "pool", pool_size),
+                                              (f"{pool_size} processes, zip", "sheets.zip", pool_size)]:
+            report = export_sheets(roster, os.path.join(tmp, destination), processes=processes)
+            assert report['exported'] == characters and list(report['failed']) == [broken.name]
+            print(f"  {label:<24} {report['seconds'] * 1000:8.1f} ms | {report['sheets_per_second']:8.0f} sheets/s"
+                  f" | {report['bytes'] / 2 ** 20:.1f} MiB")
+        name = next(iter(roster))
+        with open(os.path.join(tmp, "pool", sheet_filename(name)), encoding='utf-8') as f:
+            assert f.read() == render_character_sheet(roster[name])
+
+        # Workers can't be sent other stat formulas, so those sheets must render here
+        definitions = dict(character_tracker_core.DERIVED_STATS)
+        definitions["Health"] = (("Constitution",), lambda con: 1000 + con)
+        set_derived_stats(definitions)
+        try:
+            report = export_sheets({name: roster[name]}, os.path.join(tmp, "rebalanced"), processes=pool_size)
+            with open(os.path.join(tmp, "rebalanced", sheet_filename(name)), encoding='utf-8') as f:
+                assert f.read() == render_character_sheet(roster[name])
+        finally:
+            set_derived_stats(character_tracker_core.DERIVED_STATS)
+
+        # A worker that dies mid-batch breaks the pool; only its own character may be lost
+        if multiprocessing.get_start_method() != "fork":
+            print("  worker crash: skipped, workers only see the patched renderer when forked")
+            return
+        crasher = list(roster)[characters // 2]
+        render = character_tracker_core.render_character_sheet
+        def render_or_die(char, *args):
+            if char.name == crasher:
+                os._exit(1)
+            return render(char, *args)
+        character_tracker_core.render_character_sheet = render_or_die
+        try:
+            report = export_sheets(roster, os.path.join(tmp, "crash"), processes=pool_size)
+        finally:
+            character_tracker_core.render_character_sheet = render
+        assert report['exported'] == characters - 1 and sorted(report['failed']) == sorted([broken.name, crasher])
+        print(f"  {'worker killed mid-export':<24} {report['seconds'] * 1000:8.1f} ms"
+              f" | {report['sheets_per_second']:8.0f} sheets/s | only {crasher!r} lost")
+
+
+def bench_sheet_cache(characters=4000, changed=40):
+    """Re-exporting a roster through SheetRenderer: cold, unchanged, and with a few characters edited."""
+    roster = _make_full_roster(characters, skills_per_character=20, items_per_character=40)
+    edited = list(roster)[:changed]
+    print(f"sheet_cache: {characters} characters, {changed} edited between exports")
+    for target in character_tracker_core.SHEET_TARGETS:
+        renderer = SheetRenderer(target)
+        cold, cold_time = _timed(lambda: [renderer.render(char) for char in roster.values()])
+        warm, warm_time = _timed(lambda: [renderer.render(char) for char in roster.values()])
+        assert warm == cold
+        for name in edited:
+            roster[name].add_skill_exp(0, 10)
+        misses = renderer.misses
+        edited_sheets, edited_time = _timed(lambda: [renderer.render(char) for char in roster.values()])
+        assert renderer.misses - misses <= 2 * changed # Only status/skills sections of edited characters
+        assert edited_sheets == [SheetRenderer(target).render(char) for char in roster.values()]
+        print(f"  {target:<8} cold {cold_time * 1000:8.1f} ms | unchanged {warm_time * 1000:8.1f} ms"
+              f" | {changed} edited {edited_time * 1000:8.1f} ms")
+    # What `character_tracker_cli export` does when run again from the same process
+    with tempfile.TemporaryDirectory() as tmp:
+        renderer = SheetRenderer("markdown")
+        first = export_sheets(roster, os.path.join(tmp, "first"), renderer=renderer)
+        for name in edited:
+            roster[name].add_skill_exp(0, 10)
+        again = export_sheets(roster, os.path.join(tmp, "again"), renderer=renderer)
+    print(f"  export_sheets, kept renderer: first {first['seconds'] * 1000:8.1f} ms"
+          f" | again after {changed} edits {again['seconds'] * 1000:8.1f} ms")
+
+
+def bench_first_paint(skills=5000, items=100_000):
+    """Window construction to first paint for one large character, then the cost of opening each other tab."""
+    try:
+        import tkinter as tk # Needs a display, so only this benchmark imports the UI
+        from character_tracker_app import CharacterTracker
+    except ImportError as e:
+        print(f"first_paint: skipped, tkinter is not available ({e})")
+        return
+    try:
+        root = tk.Tk()
+    except tk.TclError as e:
+        print(f"first_paint: skipped, no display ({e})")
+        return
+    roster = _make_full_roster(1, skills_per_character=skills, items_per_character=items)
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp) # The app saves to the working directory
+        try:
+            pm = character_tracker_core.create_persistence_manager(character_tracker_core.STORAGE_BACKEND)
+            pm.save(roster, "dark", next(iter(roster)))
+            if hasattr(pm, 'close'):
+                pm.close()
+            app = CharacterTracker(root)
+            while app.first_paint_seconds is None:
+                root.update()
+            tab_times = []
+            for tab in app.notebook.tabs()[1:]:
+                start = time.perf_counter()
+                app.notebook.select(tab)
+                root.update()
+                tab_times.append((app.notebook.tab(tab, "text"), time.perf_counter() - start))
+            assert not app._stale_views and not app._tab_builders
+            app._on_close()
+        finally:
+            os.chdir(cwd)
+    print(f"first_paint: one character, {skills} skills, {items} items")
+    print(f"  first paint {app.first_paint_seconds * 1000:8.1f} ms (Status tab only)")
+    print("  first open  " + " | ".join(f"{text} {seconds * 1000:.1f} ms" for text, seconds in tab_times))
+
+
+BENCHMARKS = {
+    "leveling": bench_leveling,
+    "batch_exp": bench_batch_exp,
+    "bulk_leveling": bench_bulk_leveling,
+    "startup_load": bench_startup_load,
+    "sqlite": bench_sqlite,
+    "search": bench_search,
+    "sorting": bench_sorting,
+    "equipment_bonus": bench_equipment_bonus,
+    "derived_stats": bench_derived_stats,
+    "memory": bench_memory,
+    "record_index": bench_record_index,
+    "stacking": bench_stacking,
+    "streaming_load": bench_streaming_load,
+    "save_formats": bench_save_formats,
+    "snapshot": bench_snapshot,
+    "background_save": bench_background_save,
+    "bulk_export": bench_bulk_export,
+    "sheet_cache": bench_sheet_cache,
+    "first_paint": bench_first_paint,
+}
+
+
+def main(argv=None):
+    names = argv if argv else list(BENCHMARKS)
+    for name in names:
+        if name not in BENCHMARKS:
+            print(f"Unknown benchmark '{name}'. Available: {', '.join(BENCHMARKS)}")
+            return 1
+        BENCHMARKS[name]()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
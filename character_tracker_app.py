@@ -1,16 +1,24 @@
 import tkinter as tk
 from tkinter import ttk, messagebox, simpledialog, filedialog
-import json
-import os
+import queue
+import threading
+import time
+from collections import deque
+
+from character_tracker_core import (
+    CORE_ATTRIBUTES, EQUIPMENT_SLOTS, ITEM_TYPES, STORAGE_BACKEND, Character, CharacterRoster, Item, SheetRenderer,
+    Skill, create_persistence_manager, get_exp_for_next_level, render_character_sheet, search_capped,
+    set_error_reporter, sheet_filename, sheet_target_for
+)
 
 # --- Constants ---
-SAVE_FILE = "character_data_v6.json"
-MAX_LEVEL = 200
-BASE_EXP = 100
-GROWTH_FACTOR = 1.5
-CORE_ATTRIBUTES = ["Strength", "Dexterity", "Constitution", "Intelligence", "Wisdom", "Charisma"]
-EQUIPMENT_SLOTS = ["Weapon", "Shield", "Helmet", "Chestplate", "Leggings", "Boots", "Ring 1", "Ring 2", "Amulet"]
-ITEM_TYPES = ["Weapon", "Shield", "Helmet", "Chestplate", "Leggings", "Boots", "Ring", "Amulet", "Consumable", "Material", "Quest Item", "Other"]
+AUTOSAVE_DELAY_MS = 2000
+SAVE_POLL_MS = 100 # How often the UI checks on saves running in the background
+SAVE_CLOSE_TIMEOUT_S = 10 # Longest the window waits on close for pending saves
+SEARCH_DEBOUNCE_MS = 150 # Quiet time after the last keystroke before a search starts
+SEARCH_SLICE_MS = 8 # Longest a search may hold the event loop before yielding
+TREEVIEW_ROW_HEIGHT = 22
+VIRTUAL_ROW_BUFFER = 5 # Rows materialized beyond the visible viewport
 
 # --- THEME AND STYLE ---
 class Themes:
@@ -39,174 +47,6 @@ class Themes:
         "TREEVIEW_EVEN": "#E0E0E0"
     }
 
-# --- Utility Functions ---
-def generate_exp_table():
-    return [0] + [int(BASE_EXP * (lvl ** GROWTH_FACTOR)) for lvl in range(1, MAX_LEVEL + 1)]
-
-EXP_TABLE = generate_exp_table()
-
-# --- Data and Logic Layer ---
-class Item:
-    def __init__(self, name, description="", quantity=1, item_type="Other", effects=None):
-        self.name = name
-        self.description = description
-        self.quantity = quantity
-        self.item_type = item_type
-        self.effects = effects if effects is not None else {}
-
-class Character:
-    def __init__(self, name="", level=1, exp=0, skills=None, notes="", inventory=None, equipment=None, attributes=None):
-        self.name = name
-        self.level = level
-        self.exp = exp
-        self.skills = skills if skills is not None else []
-        self.notes = notes
-        self.inventory = inventory if inventory is not None else []
-        self.equipment = equipment if equipment is not None else {slot: None for slot in EQUIPMENT_SLOTS}
-        self.attributes = attributes if attributes is not None else {
-            "Strength": 10, "Dexterity": 10, "Constitution": 10,
-            "Intelligence": 10, "Wisdom": 10, "Charisma": 10
-        }
-
-    def get_health(self):
-        return 100 + (self.attributes["Constitution"] - 10) * 5
-
-    def get_mana(self):
-        return 100 + (self.attributes["Intelligence"] - 10) * 5
-
-    def get_total_attribute(self, attr_name):
-        base_value = self.attributes.get(attr_name, 0)
-        bonus = 0
-        for item in self.equipment.values():
-            if item and hasattr(item, 'effects') and item.effects:
-                bonus += item.effects.get(attr_name, 0)
-        return base_value + bonus
-
-    def get_attribute_modifier(self, attr_name):
-        """Calculates the attribute modifier based on the total score (e.g., D&D style)."""
-        total_score = self.get_total_attribute(attr_name)
-        return (total_score - 10) // 2
-
-    def get_exp_for_next_level(self, level):
-        if 1 <= level < MAX_LEVEL:
-            return EXP_TABLE[level]
-        return float('inf')
-
-    def add_exp(self, amount):
-        self.exp += amount
-        leveled_up = False
-        while self.level < MAX_LEVEL and self.exp >= self.get_exp_for_next_level(self.level):
-            self.exp -= self.get_exp_for_next_level(self.level)
-            self.level += 1
-            leveled_up = True
-        return leveled_up
-
-    def remove_exp(self, amount):
-        self.exp -= amount
-        leveled_down = False
-        while self.level > 1 and self.exp < 0:
-            self.level -= 1
-            self.exp += self.get_exp_for_next_level(self.level)
-            leveled_down = True
-        if self.exp < 0:
-            self.exp = 0
-        return leveled_down
-
-    def add_skill_exp(self, skill_index, amount):
-        if 0 <= skill_index < len(self.skills):
-            skill = self.skills[skill_index]
-            skill['exp'] += amount
-            leveled_up = False
-            while skill['level'] < MAX_LEVEL and skill['exp'] >= self.get_exp_for_next_level(skill['level']):
-                skill['exp'] -= self.get_exp_for_next_level(skill['level'])
-                skill['level'] += 1
-                leveled_up = True
-        return leveled_up, skill.get('level')
-
-    def remove_skill_exp(self, skill_index, amount):
-        if 0 <= skill_index < len(self.skills):
-            skill = self.skills[skill_index]
-            skill['exp'] -= amount
-            leveled_down = False
-            while skill['level'] > 1 and skill['exp'] < 0:
-                skill['level'] -= 1
-                skill['exp'] += self.get_exp_for_next_level(skill['level'])
-                leveled_down = True
-            if skill['exp'] < 0:
-                skill['exp'] = 0
-            return leveled_down, skill.get('level')
-        return False, None
-
-    def add_skill(self, name):
-        if any(s['name'] == name for s in self.skills):
-            return False
-        self.skills.append({'name': name, 'level': 1, 'exp': 0})
-        return True
-
-    def update_skill(self, index, **kwargs):
-        if 0 <= index < len(self.skills):
-            self.skills[index].update(kwargs)
-            return True
-        return False
-
-    def remove_skill(self, index):
-        if 0 <= index < len(self.skills):
-            del self.skills[index]
-            return True
-        return False
-
-class PersistenceManager:
-    def __init__(self, filepath):
-        self.filepath = filepath
-
-    def save(self, characters, theme_name, active_char_name):
-        characters_data = {}
-        for name, char in characters.items():
-            char_dict = char.__dict__.copy()
-            char_dict['inventory'] = [item.__dict__ for item in char.inventory]
-            char_dict['equipment'] = {slot: item.__dict__ if item else None for slot, item in char.equipment.items()}
-            characters_data[name] = char_dict
-
-        data = {
-            "theme": theme_name,
-            "active_character": active_char_name,
-            "characters": characters_data
-        }
-        try:
-            with open(self.filepath, 'w') as f:
-                json.dump(data, f, indent=4)
-            return True
-        except IOError as e:
-            messagebox.showerror("Save Error", f"Failed to save data to {self.filepath}\n{e}")
-            return False
-
-    def load(self):
-        if not os.path.exists(self.filepath):
-            return {}, "dark", None
-        try:
-            with open(self.filepath, 'r') as f:
-                data = json.load(f)
-                theme_name = data.get("theme", "dark")
-                active_char_name = data.get("active_character")
-                characters_data = data.get("characters", {})
-                characters = {}
-                for name, char_data in characters_data.items():
-                    inventory = [Item(**item_data) for item_data in char_data.get('inventory', [])]
-                    equipment_data = char_data.get('equipment', {})
-                    equipment = {slot: Item(**item_data) if item_data else None for slot, item_data in equipment_data.items()}
-                    for slot in EQUIPMENT_SLOTS:
-                        if slot not in equipment:
-                            equipment[slot] = None
-
-                    char_data['inventory'] = inventory
-                    char_data['equipment'] = equipment
-                    characters[name] = Character(**char_data)
-
-                return characters, theme_name, active_char_name
-        except (IOError, json.JSONDecodeError) as e:
-            messagebox.showerror("Load Error", f"Failed to load data from {self.filepath}\n{e}")
-            return {}, "dark", None
-
 # --- UI Layer ---
 class ToolTip:
     """Create a tooltip for a given widget."""
@@ -245,14 +85,395 @@ class ToolTip:
             self.tooltip.destroy()
             self.tooltip = None
 
+def sync_treeview_rows(tree, rows, shown):
+    """
+    Reconciles `tree` with `rows`, a display-ordered list of (iid, values, tags),
+    touching only rows that were added, removed, changed or moved. `shown` maps
+    iid -> (values, tags) for what the tree currently displays and is updated
+    in place.
+    """
+    wanted = {iid for iid, _, _ in rows}
+    stale = [iid for iid in shown if iid not in wanted]
+    if stale:
+        tree.delete(*stale)
+        for iid in stale:
+            del shown[iid]
+    for position, (iid, values, tags) in enumerate(rows):
+        current = shown.get(iid)
+        if current is None:
+            tree.insert("", position, iid=iid, values=values, tags=tags)
+        else:
+            if current != (values, tags):
+                tree.item(iid, values=values, tags=tags)
+            if tree.index(iid) != position:
+                tree.move(iid, "", position)
+        shown[iid] = (values, tags)
+
+class VirtualTreeview:
+    """
+    Drives a Treeview as a window over a large list of rows. Only the rows that
+    fit in the viewport (plus a small buffer) exist as Treeview items; the
+    scrollbar and mouse wheel move the window over the full list instead of
+    scrolling the widget itself.
+    """
+    def __init__(self, tree, scrollbar, buffer=VIRTUAL_ROW_BUFFER):
+        self.tree = tree
+        self.scrollbar = scrollbar
+        self.buffer = buffer
+        self.records = []
+        self.row_iid = None # Called as row_iid(record) and make_values(record) for materialized rows only
+        self.make_values = None
+        self.offset = 0
+        self.selected_iid = None
+        self._shown = {} # iid -> (values, tags) currently materialized in the tree
+
+        self.scrollbar.configure(command=self._on_scrollbar)
+        self.tree.configure(yscrollcommand="")
+        self.tree.bind("<Configure>", lambda e: self._render(), add="+")
+        self.tree.bind("<MouseWheel>", self._on_mousewheel, add="+")
+        self.tree.bind("<Button-4>", self._on_mousewheel, add="+") # For Linux scroll up
+        self.tree.bind("<Button-5>", self._on_mousewheel, add="+") # For Linux scroll down
+        self.tree.bind("<<TreeviewSelect>>", self._remember_selection, add="+")
+        for key in ("Up", "Down", "Prior", "Next", "Home", "End"):
+            self.tree.bind(f"<{key}>", self._on_key, add="+")
+
+    @property
+    def visible_rows(self):
+        height = self.tree.winfo_height()
+        if height <= 1: # Not mapped yet; fall back to the configured height
+            return int(self.tree.cget("height"))
+        return max(1, height // TREEVIEW_ROW_HEIGHT - 1) # One row's worth goes to the headings
+
+    def set_rows(self, records, row_iid, make_values, is_listed):
+        """
+        Replaces the full row list with `records` in display order. row_iid(record)
+        gives a stable row id; is_listed(iid) says whether that row is still in
+        the list, so keeping the selection doesn't scan it.
+        """
+        self.records = records
+        self.row_iid = row_iid
+        self.make_values = make_values
+        if self.selected_iid is not None and not is_listed(self.selected_iid):
+            self.selected_iid = None
+        self._render()
+
+    def focus(self):
+        """The selected row's iid, even while it is scrolled out of the materialized window."""
+        return self.tree.focus() or self.selected_iid or ""
+
+    def scroll_to_top(self):
+        self.offset = 0
+
+    def _clamp_offset(self):
+        self.offset = max(0, min(self.offset, len(self.records) - self.visible_rows))
+
+    def _render(self):
+        self._clamp_offset()
+        window = self.records[self.offset:self.offset + self.visible_rows + self.buffer]
+        rows = [(self.row_iid(record), self.make_values(record), ('evenrow' if position % 2 == 0 else 'oddrow',))
+                for position, record in enumerate(window, start=self.offset)]
+        sync_treeview_rows(self.tree, rows, self._shown)
+        if self.selected_iid is not None and self.selected_iid in self._shown and self.selected_iid not in self.tree.selection():
+            self.tree.selection_set(self.selected_iid)
+            self.tree.focus(self.selected_iid)
+
+        total = len(self.records)
+        if total:
+            self.scrollbar.set(self.offset / total, min(1.0, (self.offset + self.visible_rows) / total))
+        else:
+            self.scrollbar.set(0.0, 1.0)
+
+    def _scroll_to(self, offset):
+        old_offset = self.offset
+        self.offset = offset
+        self._clamp_offset()
+        if self.offset != old_offset:
+            self._render()
+
+    def _on_scrollbar(self, action, amount, unit=None):
+        if action == "moveto":
+            self._scroll_to(int(float(amount) * len(self.records)))
+        elif action == "scroll":
+            step = self.visible_rows if unit == "pages" else 1
+            self._scroll_to(self.offset + int(amount) * step)
+
+    def _on_mousewheel(self, event):
+        direction = 1 if event.num == 5 or event.delta < 0 else -1
+        self._scroll_to(self.offset + direction * 3)
+        return "break"
+
+    def _selected_position(self):
+        """The selected row's position in `records`, looking in the materialized window first; None if there is none."""
+        if self.selected_iid is None:
+            return None
+        if self.selected_iid in self._shown:
+            window = self.records[self.offset:self.offset + len(self._shown)]
+            for position, record in enumerate(window, start=self.offset):
+                if self.row_iid(record) == self.selected_iid:
+                    return position
+        return next((position for position, record in enumerate(self.records)
+                     if self.row_iid(record) == self.selected_iid), None)
+
+    def _on_key(self, event):
+        """Moves the selection over the full list, scrolling the window to keep it in view."""
+        if not self.records:
+            return "break"
+        last = len(self.records) - 1
+        current = self._selected_position()
+        if event.keysym == "Home":
+            target = 0
+        elif event.keysym == "End":
+            target = last
+        elif current is None:
+            target = self.offset # Nothing selected yet: start from the top visible row
+        else:
+            step = self.visible_rows if event.keysym in ("Prior", "Next") else 1
+            target = current + (step if event.keysym in ("Down", "Next") else -step)
+        target = max(0, min(target, last))
+        if target < self.offset:
+            self.offset = target
+        elif target >= self.offset + self.visible_rows:
+            self.offset = target - self.visible_rows + 1
+        self.selected_iid = self.row_iid(self.records[target])
+        self._render()
+        return "break" # The Treeview's own bindings only know the materialized rows
+
+    def _remember_selection(self, event=None):
+        selection = self.tree.selection()
+        if selection:
+            self.selected_iid = selection[0]
+        elif self.selected_iid is not None and self.tree.exists(self.selected_iid):
+            self.selected_iid = None # Deselected while visible, rather than scrolled out of the window
+
+class SearchScheduler:
+    """
+    Coalesces live-search keystrokes with root.after, runs each search as a
+    series of short slices on the event loop and drops a search as soon as a
+    newer keystroke arrives. Every finished or cancelled query is recorded in
+    `history` so the debounce window can be tuned.
+    """
+    def __init__(self, root, start_search, on_done, delay_ms=SEARCH_DEBOUNCE_MS, slice_ms=SEARCH_SLICE_MS):
+        self.root = root
+        self.start_search = start_search # Called with the term; returns a SearchIndex.iter_search generator
+        self.on_done = on_done # Called with the query report once a search completes
+        self.delay_ms = delay_ms
+        self.slice_ms = slice_ms
+        self.history = deque(maxlen=100)
+        self._job = None
+        self._search = None
+        self._query = None
+
+    def schedule(self, term):
+        self.cancel()
+        self._query = {'term': term, 'requested': time.perf_counter(), 'busy_ms': 0.0, 'slices': 0}
+        self._job = self.root.after(self.delay_ms, self._start)
+
+    def cancel(self):
+        if self._job:
+            self.root.after_cancel(self._job)
+            self._job = None
+        if self._search is not None:
+            self._search.close()
+            self._search = None
+        if self._query is not None:
+            self._finish(cancelled=True)
+
+    def _start(self):
+        self._job = None
+        self._query['started'] = time.perf_counter()
+        if not self._query['term']:
+            self._finish(results=None)
+            return
+        self._search = self.start_search(self._query['term'])
+        self._step()
+
+    def _step(self):
+        self._job = None
+        slice_start = time.perf_counter()
+        deadline = slice_start + self.slice_ms / 1000
+        try:
+            while time.perf_counter() < deadline:
+                next(self._search)
+        except StopIteration as done:
+            self._search = None
+            self._record_slice(slice_start)
+            self._finish(results=len(done.value))
+            return
+        self._record_slice(slice_start)
+        self._job = self.root.after(1, self._step)
+
+    def _record_slice(self, slice_start):
+        self._query['busy_ms'] += (time.perf_counter() - slice_start) * 1000
+        self._query['slices'] += 1
+
+    def _finish(self, cancelled=False, results=None):
+        query, self._query = self._query, None
+        now = time.perf_counter()
+        report = {
+            'term': query['term'],
+            'cancelled': cancelled,
+            'debounced': 'started' not in query, # Superseded before the search began
+            'results': results,
+            'wait_ms': (query.get('started', now) - query['requested']) * 1000, # Debounce delay actually spent
+            'elapsed_ms': (now - query.get('started', now)) * 1000, # Wall time from first slice to completion
+            'busy_ms': query['busy_ms'], # Time the search itself held the event loop
+            'slices': query['slices']
+        }
+        self.history.append(report)
+        if not cancelled:
+            self.on_done(report)
+
+class AutoSaver:
+    """
+    Collects dirty characters into one debounced, incremental save that runs
+    on a background thread. The Tk thread only hands over detached copies
+    (Character.snapshot()) of characters that changed since the last save,
+    or that the backend hasn't stored yet; the rest go over unloaded, so the
+    backend keeps what it has. The worker serializes and writes them.
+    Results come back to the Tk thread through a root.after poll, which
+    reports failures.
+    """
+    def __init__(self, root, persistence, get_state, delay_ms=AUTOSAVE_DELAY_MS):
+        self.root = root
+        self.persistence = persistence
+        self.get_state = get_state # Returns (characters, theme_name, active_char_name)
+        self.delay_ms = delay_ms
+        self.dirty = set()
+        self._job = None
+        self._poll_job = None
+        # Name -> (character, the copy of it last handed to the worker). Copies are never
+        # changed afterwards, so one can be handed over again while its character is clean.
+        self._snapshots = {}
+        self._pending = 0 # Saves handed to the worker whose result hasn't been polled yet
+        self._requests = queue.Queue() # (characters, theme_name, active_char_name, dirty), or None to stop
+        self._results = queue.Queue() # (saves, dirty, error) per save the worker ran
+        self._worker = threading.Thread(target=self._run, name="autosave", daemon=True)
+        self._worker.start()
+
+    def mark_dirty(self, char_name=None):
+        """Schedules a save; pass None when only settings (theme, active character, roster) changed."""
+        if char_name is not None:
+            self.dirty.add(char_name)
+        if self._job:
+            self.root.after_cancel(self._job)
+        self._job = self.root.after(self.delay_ms, self.flush)
+
+    def flush(self):
+        """Snapshots the current state and queues it for the worker."""
+        if self._job:
+            self.root.after_cancel(self._job)
+            self._job = None
+        characters, theme_name, active_char_name = self.get_state()
+        dirty, self.dirty = self.dirty, set()
+        self._pending += 1
+        self._requests.put((self._detach(characters, dirty), theme_name, active_char_name, dirty))
+        if self._poll_job is None:
+            self._poll_job = self.root.after(SAVE_POLL_MS, self._poll)
+
+    @property
+    def saving(self):
+        """Whether a save handed to the worker hasn't reported back yet."""
+        return self._pending > 0
+
+    def _detach(self, characters, dirty):
+        snapshots = {}
+        has_stored = getattr(self.persistence, 'has_stored', lambda name: False)
+
+        def detach(name, char):
+            previous = self._snapshots.get(name)
+            if previous is not None and previous[0] is char and name not in dirty:
+                snapshot = previous[1] # Handed over before, maybe to a save still queued; keep handing it over
+            elif name not in dirty and has_stored(name):
+                return None
+            else:
+                snapshot = char.snapshot()
+            snapshots[name] = (char, snapshot)
+            return snapshot
+
+        if not isinstance(characters, CharacterRoster):
+            roster = CharacterRoster((), self._not_handed_over)
+            for name, char in characters.items():
+                roster[name] = char
+            characters = roster
+        detached = characters.detached(detach)
+        self._snapshots = snapshots
+        return detached
+
+    @staticmethod
+    def _not_handed_over(name):
+        # has_stored() said save() wouldn't need this character, so it was never copied
+        raise KeyError(f"'{name}' was not handed to the save")
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            request = self._requests.get()
+            if request is None:
+                break
+            # Saves queued behind a slow one collapse into the newest state plus every dirty name.
+            saves = 1
+            while True:
+                try:
+                    newer = self._requests.get_nowait()
+                except queue.Empty:
+                    break
+                if newer is None:
+                    stopping = True
+                    break
+                request = (*newer[:3], request[3] | newer[3])
+                saves += 1
+            characters, theme_name, active_char_name, dirty = request
+            try:
+                self.persistence.save(characters, theme_name, active_char_name, dirty=dirty)
+                error = None
+            except Exception as e: # Anything escaping here would end the thread and every later save
+                error = e
+            self._results.put((saves, dirty, error))
+
+    def _poll(self):
+        self._poll_job = None
+        self._collect()
+        if self._pending:
+            self._poll_job = self.root.after(SAVE_POLL_MS, self._poll)
+
+    def _collect(self):
+        while True:
+            try:
+                saves, dirty, error = self._results.get_nowait()
+            except queue.Empty:
+                return
+            self._pending -= saves
+            if error is not None:
+                self.dirty |= dirty # Keep them pending for the next attempt
+                messagebox.showerror("Save Error", str(error))
+
+    def close(self, timeout=SAVE_CLOSE_TIMEOUT_S):
+        """
+        Flushes, then waits up to `timeout` seconds for the worker to finish
+        every queued save. Returns False if it was still writing.
+        """
+        self.flush()
+        self._requests.put(None)
+        self._worker.join(timeout)
+        if self._poll_job:
+            self.root.after_cancel(self._poll_job)
+            self._poll_job = None
+        self._collect()
+        return not self._worker.is_alive()
+
 class CharacterTracker:
     def __init__(self, root):
+        self._started = time.perf_counter()
+        self.first_paint_seconds = None # Set once the window has drawn for the first time
         self.root = root
         self.root.title("Character Tracker v6.1 - Polished UI")
         self.root.geometry("950x750")
 
-        self.pm = PersistenceManager(SAVE_FILE)
-        self.characters, self.theme_name, active_char_name = self.pm.load()
+        set_error_reporter(lambda title, message: messagebox.showerror(title, message, parent=self.root))
+        self.pm = create_persistence_manager(STORAGE_BACKEND)
+        self.characters, self.theme_name, active_char_name = self.pm.load(progress=self._show_load_progress)
+        self.root.title("Character Tracker v6.1 - Polished UI")
+        self.autosaver = AutoSaver(self.root, self.pm, lambda: (self.characters, self.theme_name, self.active_character_name))
         
         if not self.characters:
             default_char = Character(name="Default Character")
@@ -262,12 +483,22 @@ class CharacterTracker:
 
         self.theme = Themes.dark if self.theme_name == "dark" else Themes.light
         self.tooltips = []
+        self.context_menus = []
+        self.sheet_renderers = {} # Target -> SheetRenderer, so re-exports reuse unchanged sections
 
         # --- Search/Filter Variables ---
         self.skill_search_var = tk.StringVar()
         self.inventory_search_var = tk.StringVar()
         self.skill_search_var.trace_add("write", self._on_skill_search)
         self.inventory_search_var.trace_add("write", self._on_inventory_search)
+        self.skill_search_status_var = tk.StringVar()
+        self.inventory_search_status_var = tk.StringVar()
+        self.skill_search_scheduler = SearchScheduler(
+            self.root, lambda term: self.current_character.iter_search(self.current_character.skills, term),
+            lambda report: self._on_search_done(report, self.skill_view, "skills", self.skill_search_status_var))
+        self.inventory_search_scheduler = SearchScheduler(
+            self.root, lambda term: self.current_character.iter_search(self.current_character.inventory, term),
+            lambda report: self._on_search_done(report, self.inventory_view, "inventory", self.inventory_search_status_var))
         self.skill_exp_progress_var = tk.DoubleVar()
         self.skill_exp_label_var = tk.StringVar(value="Select a skill to see progress")
         self.skill_exp_progress_label_var = tk.StringVar()
@@ -284,11 +515,55 @@ class CharacterTracker:
         self._update_all_views()
 
         self.root.protocol("WM_DELETE_WINDOW", self._on_close)
+        self.root.after_idle(self._record_first_paint)
 
     @property
     def current_character(self):
         return self.characters.get(self.active_character_name)
 
+    @staticmethod
+    def _row_iid(record):
+        """Stable Treeview IID for a Skill or Item, independent of its list position."""
+        return str(record.uid)
+
+    def _record_for_iid(self, collection, iid):
+        record = self.current_character.record_for_uid(collection, int(iid))
+        if record is None:
+            raise IndexError(f"No record for row {iid}")
+        return record
+
+    def _index_for_iid(self, collection, iid):
+        position = self.current_character.position_for_uid(collection, int(iid))
+        if position is None:
+            raise IndexError(f"No record for row {iid}")
+        return position
+
+    def _listed_check(self, collection, term, records):
+        """Whether a row is still in a list filtered by `term`, from the uid index rather than the list itself."""
+        if search_capped(term, len(records)):
+            # A capped search leaves out some matches, so only the records actually listed count
+            return set(map(self._row_iid, records)).__contains__
+
+        def is_listed(iid):
+            record = self.current_character.record_for_uid(collection, int(iid))
+            return record is not None and self.current_character.record_matches(collection, record, term)
+        return is_listed
+
+    def _show_load_progress(self, done, total):
+        """Shows how far a (streamed) save file load has got in the title bar, before the UI exists."""
+        percent = done * 100 // total if total else 100
+        self.root.title(f"Character Tracker - Loading {percent}%")
+        self.root.update_idletasks()
+
+    def _record_first_paint(self):
+        """Measures construction to first paint; runs on the first idle pass, after pending redraws are flushed."""
+        self.root.update_idletasks()
+        self.first_paint_seconds = time.perf_counter() - self._started
+
+    def _mark_dirty(self):
+        """Flags the active character as changed so the autosaver picks it up."""
+        self.autosaver.mark_dirty(self.active_character_name)
+
     def _validate_integer_input(self, P):
         """Validation command to allow only integers in an Entry widget."""
         # P is the value of the entry if the edit is allowed
@@ -313,7 +588,7 @@ class CharacterTracker:
         style.configure("TNotebook.Tab", background=self.theme["WIDGET_BG"], foreground=self.theme["FOREGROUND"], font=Themes.FONT_BOLD, padding=[10, 5])
         style.map("TNotebook.Tab", background=[("selected", self.theme["ACCENT_COLOR"]), ("active", "#4a4a4a")])
 
-        style.configure("Treeview", background=self.theme["WIDGET_BG"], fieldbackground=self.theme["WIDGET_BG"], foreground=self.theme["WIDGET_FG"], font=Themes.FONT_NORMAL)
+        style.configure("Treeview", background=self.theme["WIDGET_BG"], fieldbackground=self.theme["WIDGET_BG"], foreground=self.theme["WIDGET_FG"], font=Themes.FONT_NORMAL, rowheight=TREEVIEW_ROW_HEIGHT)
         style.configure("Treeview.Heading", background=self.theme["ACCENT_COLOR"], foreground=Themes.light["WIDGET_FG"], font=Themes.FONT_BOLD, relief="flat")
         style.map("Treeview.Heading", background=[('active', self.theme["ACCENT_COLOR"])])
         style.configure("green.Horizontal.TProgressbar", background=self.theme["ACCENT_COLOR"])
@@ -329,11 +604,60 @@ class CharacterTracker:
         self.notebook = ttk.Notebook(self.root)
         self.notebook.pack(fill='both', expand=True, padx=10, pady=10)
 
-        self._create_status_tab()
-        self._create_attributes_tab()
-        self._create_skills_tab()
-        self._create_inventory_tab()
-        self._create_notes_tab()
+        # Variables outlive the tabs' widgets, so views can be updated before their tab is built
+        self._init_status_vars()
+        self._init_attribute_vars()
+
+        # Tabs start as empty frames; each is built and filled the first time it's selected
+        self._tab_builders = {}
+        self._view_tabs = {}
+        self._view_updaters = {}
+        self._add_tab("Status", "20", self._create_status_tab, {"status": self._update_status_view})
+        self._add_tab("Attributes", "20", self._create_attributes_tab, {"attributes": self._update_attributes_view})
+        self._add_tab("Skills", "10", self._create_skills_tab, {"skills": self._update_skills_view})
+        self._add_tab("Inventory", "10", self._create_inventory_tab,
+                      {"equipment": self._update_equipment_view, "inventory": self._update_inventory_view})
+        self._add_tab("Notes", "10", self._create_notes_tab, {"notes": self._update_notes_view})
+        self._stale_views = set(self._view_tabs) # Nothing has been drawn yet
+        self._redraw_job = None
+        self.notebook.bind("<<NotebookTabChanged>>", self._on_tab_changed)
+
+    def _add_tab(self, text, padding, builder, views):
+        """Adds an empty tab whose widgets `builder` creates on first selection; `views` maps view names to updaters."""
+        tab = ttk.Frame(self.notebook, padding=padding)
+        self.notebook.add(tab, text=text)
+        self._tab_builders[str(tab)] = builder
+        for view, updater in views.items():
+            self._view_tabs[view] = str(tab)
+            self._view_updaters[view] = updater
+
+    def _build_tab(self, tab):
+        builder = self._tab_builders.pop(tab, None)
+        if builder:
+            builder(self.notebook.nametowidget(tab))
+            self._update_theme_specific_widgets()
+
+    def _on_tab_changed(self, event=None):
+        self._redraw_views() # Straight away, so the tab never shows with old contents
+
+    def _invalidate(self, *views):
+        """Marks views as stale; one idle pass then redraws each stale view on the showing tab at most once."""
+        self._stale_views.update(views)
+        if self._redraw_job is None:
+            self._redraw_job = self.root.after_idle(self._on_redraw_idle)
+
+    def _on_redraw_idle(self):
+        self._redraw_job = None
+        self._redraw_views()
+
+    def _redraw_views(self):
+        """Builds the showing tab if needed and redraws its stale views; hidden tabs' views stay stale until shown."""
+        tab = str(self.notebook.select())
+        self._build_tab(tab)
+        for view, view_tab in self._view_tabs.items():
+            if view_tab == tab and view in self._stale_views:
+                self._stale_views.discard(view)
+                self._view_updaters[view]()
 
     def _create_character_manager(self, parent):
         frame = ttk.LabelFrame(parent, text="Character Management", padding=10)
@@ -365,12 +689,8 @@ class CharacterTracker:
         self.theme_button.pack(side="right")
         self.tooltips.append(ToolTip(self.theme_button, "Switch between light and dark themes.", self.theme))
 
-    def _create_status_tab(self):
-        """Creates the 'Status' tab with character info and EXP controls."""
-        tab = ttk.Frame(self.notebook, padding="20")
-        self.notebook.add(tab, text="Status")
-
-        self._init_status_vars()
+    def _create_status_tab(self, tab):
+        """Fills the 'Status' tab with character info and EXP controls."""
         self._create_status_info_frame(tab)
         self._create_status_exp_controls(tab)
 
@@ -437,12 +757,8 @@ class CharacterTracker:
         remove_exp_btn.pack(side="left", padx=5)
         self.tooltips.append(ToolTip(remove_exp_btn, "Remove EXP from the character's main level.", self.theme))
 
-    def _create_attributes_tab(self):
-        """Creates the 'Attributes' tab with core attribute display and editing."""
-        tab = ttk.Frame(self.notebook, padding="20")
-        self.notebook.add(tab, text="Attributes")
-
-        self._init_attribute_vars()
+    def _create_attributes_tab(self, tab):
+        """Fills the 'Attributes' tab with core attribute display and editing."""
         self._create_attribute_display_frame(tab)
     
     def _init_attribute_vars(self):
@@ -476,19 +792,19 @@ class CharacterTracker:
     def _on_attribute_change(self, event=None):
         if not self.current_character:
             return
+        changed = set()
         for attr, var in self.attribute_vars.items():
             try:
-                self.current_character.attributes[attr] = var.get()
+                changed |= self.current_character.set_attribute(attr, var.get())
             except tk.TclError:
                 # Handle cases where the entry might not have a valid integer
                 pass
-        self._update_status_view() # Refresh derived stats
-
-    def _create_skills_tab(self):
-        """Creates the 'Skills' tab with a Treeview for skills and EXP controls."""
-        tab = ttk.Frame(self.notebook, padding="10")
-        self.notebook.add(tab, text="Skills")
+        if changed:
+            self._mark_dirty()
+            self._refresh_derived_stats(changed) # Only stats that read a changed attribute
 
+    def _create_skills_tab(self, tab):
+        """Fills the 'Skills' tab with a Treeview for skills and EXP controls."""
         self._create_skill_search_bar(tab)
         self._create_skill_tree_view(tab)
         self._create_skill_controls(tab)
@@ -511,9 +827,9 @@ class CharacterTracker:
         self.skill_tree.pack(side="left", fill="both", expand=True, pady=5)
         self.skill_tree.bind("<<TreeviewSelect>>", self._on_skill_select)
 
-        scrollbar = ttk.Scrollbar(tree_frame, orient="vertical", command=self.skill_tree.yview)
-        self.skill_tree.configure(yscrollcommand=scrollbar.set)
+        scrollbar = ttk.Scrollbar(tree_frame, orient="vertical")
         scrollbar.pack(side="right", fill="y")
+        self.skill_view = VirtualTreeview(self.skill_tree, scrollbar)
     
     def _create_skill_search_bar(self, parent_tab):
         """Creates a search bar for filtering skills."""
@@ -522,6 +838,7 @@ class CharacterTracker:
         ttk.Label(search_frame, text="Search:").pack(side="left", padx=(0, 5))
         search_entry = ttk.Entry(search_frame, textvariable=self.skill_search_var)
         search_entry.pack(side="left", fill="x", expand=True)
+        ttk.Label(search_frame, textvariable=self.skill_search_status_var, font=Themes.FONT_ITALIC).pack(side="left", padx=(5, 0))
     
     def _create_skill_controls(self, parent_tab):
         """Creates buttons and EXP input for skill management."""
@@ -567,11 +884,8 @@ class CharacterTracker:
             ("Delete Skill", self._delete_skill)
         ])
 
-    def _create_inventory_tab(self):
-        """Creates the 'Inventory' tab with equipment, inventory, and item details."""
-        tab = ttk.Frame(self.notebook, padding="10")
-        self.notebook.add(tab, text="Inventory")
-
+    def _create_inventory_tab(self, tab):
+        """Fills the 'Inventory' tab with equipment, inventory, and item details."""
         self._create_inventory_panes(tab)
         self._create_inventory_buttons(tab)
 
@@ -591,6 +905,7 @@ class CharacterTracker:
         self.equip_tree.column("#2", width=150, anchor="w")
         self.equip_tree.pack(fill="both", expand=True)
         self.equip_tree.bind("<<TreeviewSelect>>", self._on_item_select)
+        self._equip_rows_shown = {}
         # --- Inventory Pane ---
         inv_frame = ttk.LabelFrame(main_pane, text="Inventory", padding=10)
         main_pane.add(inv_frame, weight=2)
@@ -601,9 +916,12 @@ class CharacterTracker:
         ttk.Label(inv_search_frame, text="Search:").pack(side="left", padx=(0, 5))
         search_entry = ttk.Entry(inv_search_frame, textvariable=self.inventory_search_var)
         search_entry.pack(side="left", fill="x", expand=True)
+        ttk.Label(inv_search_frame, textvariable=self.inventory_search_status_var, font=Themes.FONT_ITALIC).pack(side="left", padx=(5, 0))
 
+        inv_tree_frame = ttk.Frame(inv_frame)
+        inv_tree_frame.pack(fill="both", expand=True)
         inv_cols = ("#1", "#2", "#3")
-        self.inv_tree = ttk.Treeview(inv_frame, columns=inv_cols, show="headings", height=15)
+        self.inv_tree = ttk.Treeview(inv_tree_frame, columns=inv_cols, show="headings", height=15)
 
         headings = {"#1": "Item Name", "#2": "Type", "#3": "Qty"}
         for col, text in headings.items():
@@ -612,8 +930,12 @@ class CharacterTracker:
         self.inv_tree.column("#1", width=200, anchor="w")
         self.inv_tree.column("#2", width=100, anchor="w")
         self.inv_tree.column("#3", width=50, anchor="center")
-        self.inv_tree.pack(fill="both", expand=True)
+        self.inv_tree.pack(side="left", fill="both", expand=True)
         self.inv_tree.bind("<<TreeviewSelect>>", self._on_item_select)
+
+        inv_scrollbar = ttk.Scrollbar(inv_tree_frame, orient="vertical")
+        inv_scrollbar.pack(side="right", fill="y")
+        self.inventory_view = VirtualTreeview(self.inv_tree, inv_scrollbar)
         # --- Description Label ---
         self.item_desc_label = ttk.Label(inv_frame, text="Click an item to see its description.", wraplength=400, justify="left", font=Themes.FONT_ITALIC)
         self.item_desc_label.pack(pady=(10,0), fill="x")
@@ -628,6 +950,10 @@ class CharacterTracker:
         add_item_btn.pack(side="left", padx=5)
         self.tooltips.append(ToolTip(add_item_btn, "Add a new item to your inventory.", self.theme))
 
+        stack_btn = ttk.Button(btn_frame, text="Stack Duplicates", command=self._compact_inventory)
+        stack_btn.pack(side="left", padx=5)
+        self.tooltips.append(ToolTip(stack_btn, "Merge identical items into single stacks.", self.theme))
+
         # --- Context Menus ---
         self.inv_context_menu = self._create_context_menu(self.inv_tree, [
             ("Equip", self._equip_item),
@@ -640,11 +966,8 @@ class CharacterTracker:
             ("Unequip", self._unequip_item)
         ])
 
-    def _create_notes_tab(self):
-        """Creates the 'Notes' tab with a text area for character notes."""
-        tab = ttk.Frame(self.notebook, padding="10")
-        self.notebook.add(tab, text="Notes")
-        
+    def _create_notes_tab(self, tab):
+        """Fills the 'Notes' tab with a text area for character notes."""
         self._create_notes_text_area(tab)
 
     def _create_notes_text_area(self, parent_tab):
@@ -667,12 +990,7 @@ class CharacterTracker:
     def _update_all_views(self):
         self._update_character_selector()
         if self.current_character:
-            self._update_status_view()
-            self._update_attributes_view()
-            self._update_skills_view()
-            self._update_inventory_views()
-            self._update_notes_view()
-            self._update_theme_specific_widgets()
+            self._invalidate(*self._view_tabs)
 
     def _update_character_selector(self):
         self.character_selector['values'] = list(self.characters.keys())
@@ -696,20 +1014,30 @@ class CharacterTracker:
             self.exp_progress_var.set(100)
             self.exp_progress_label_var.set("MAX LEVEL")
 
-        # Reset skill progress on character change
-        self._reset_skill_progress_bar()
-
     def _update_attributes_view(self):
         for attr, var in self.attribute_vars.items():
-            base_val = self.current_character.attributes.get(attr, 0)
-            total_val = self.current_character.get_total_attribute(attr)
-            modifier = self.current_character.get_attribute_modifier(attr)
-            var.set(base_val)
-            if total_val > base_val:
-                self.total_attribute_vars[attr].set(f"{total_val} ({base_val} + {total_val - base_val})")
-            else:
-                self.total_attribute_vars[attr].set(total_val)
-            self.attribute_modifier_vars[attr].set(f"{modifier:+}") # Show + for positive
+            var.set(self.current_character.attributes.get(attr, 0))
+            self._update_attribute_totals(attr)
+
+    def _update_attribute_totals(self, attr):
+        base_val = self.current_character.attributes.get(attr, 0)
+        total_val = self.current_character.get_total_attribute(attr)
+        modifier = self.current_character.get_attribute_modifier(attr)
+        if total_val > base_val:
+            self.total_attribute_vars[attr].set(f"{total_val} ({base_val} + {total_val - base_val})")
+        else:
+            self.total_attribute_vars[attr].set(total_val)
+        self.attribute_modifier_vars[attr].set(f"{modifier:+}") # Show + for positive
+
+    def _refresh_derived_stats(self, changed):
+        """Updates only the labels showing one of the `changed` inputs or derived stats."""
+        if "Health" in changed:
+            self.health_var.set(self.current_character.get_health())
+        if "Mana" in changed:
+            self.mana_var.set(self.current_character.get_mana())
+        for attr in self.attribute_vars:
+            if f"{attr} Total" in changed or f"{attr} Modifier" in changed:
+                self._update_attribute_totals(attr)
 
     def _update_skills_view(self):
         # Add sort indicators to headers
@@ -722,46 +1050,26 @@ class CharacterTracker:
             else:
                 self.skill_tree.heading(col_id, text=text)
 
-        self.skill_tree.tag_configure('oddrow', background=self.theme["TREEVIEW_ODD"], foreground=self.theme["WIDGET_FG"])
-        self.skill_tree.tag_configure('evenrow', background=self.theme["TREEVIEW_EVEN"], foreground=self.theme["WIDGET_FG"])
-        for i in self.skill_tree.get_children():
-            self.skill_tree.delete(i)
-        self._reset_skill_progress_bar()
+        # Sort orders are cached per column on the character and only reversed for descending views
+        skills, term = self.current_character.skills, self.skill_search_var.get()
+        filtered_skills = self.current_character.sorted_records(
+            skills, self.skill_sort_column, self.skill_sort_reverse, term)
 
-        search_term = self.skill_search_var.get().lower()
-        
-        filtered_skills = [
-            (i, skill) for i, skill in enumerate(self.current_character.skills)
-            if search_term in skill['name'].lower()
-        ]
+        def make_values(skill):
+            next_exp = get_exp_for_next_level(skill.level)
+            next_exp_str = str(next_exp) if next_exp != float('inf') else "MAX"
+            return (skill.name, skill.level, skill.exp, next_exp_str)
 
-        # --- Sorting Logic ---
-        sort_key_map = {
-            "Skill Name": lambda item: item[1]['name'].lower(),
-            "Level": lambda item: item[1]['level'],
-            "Current EXP": lambda item: item[1]['exp'],
-            "EXP to Next": lambda item: self.current_character.get_exp_for_next_level(item[1]['level'])
-        }
-        sort_key = sort_key_map.get(self.skill_sort_column)
-        if sort_key:
-            # Sort the list of (original_index, skill_dict) tuples
-            filtered_skills.sort(key=sort_key, reverse=self.skill_sort_reverse)
+        # Rows keep a stable IID per skill, so only changed rows are touched; only visible rows are built
+        self.skill_view.set_rows(filtered_skills, self._row_iid, make_values, self._listed_check(skills, term, filtered_skills))
+        self._on_skill_select()
 
-        for i, (original_index, skill) in enumerate(filtered_skills):
-            next_exp = self.current_character.get_exp_for_next_level(skill['level'])
-            next_exp_str = str(next_exp) if next_exp != float('inf') else "MAX"
-            tag = 'evenrow' if i % 2 == 0 else 'oddrow'
-            # Use original_index as the IID to link back to the original list
-            self.skill_tree.insert("", "end", iid=original_index, values=(skill['name'], skill['level'], skill['exp'], next_exp_str), tags=(tag,))
-
-    def _update_inventory_views(self):
-        # Equipment view is not filtered
-        for i in self.equip_tree.get_children():
-            self.equip_tree.delete(i)
-        for slot, item in self.current_character.equipment.items():
-            item_name = item.name if item else "-"
-            self.equip_tree.insert("", "end", values=(slot, item_name))
+    def _update_equipment_view(self):
+        # Equipment view is not filtered; slots are their own stable IIDs
+        equip_rows = [(slot, (slot, item.name if item else "-"), ()) for slot, item in self.current_character.equipment.items()]
+        sync_treeview_rows(self.equip_tree, equip_rows, self._equip_rows_shown)
 
+    def _update_inventory_view(self):
         # Add sort indicators to headers
         headings = {"#1": "Item Name", "#2": "Type", "#3": "Qty"}
         arrow = ' \u25BC' if self.inventory_sort_reverse else ' \u25B2'
@@ -772,35 +1080,18 @@ class CharacterTracker:
             else:
                 self.inv_tree.heading(col_id, text=text)
 
-        # Inventory view is filtered
-        for i in self.inv_tree.get_children():
-            self.inv_tree.delete(i)
+        # Inventory view is filtered; sort orders are cached per column on the character
+        inventory, term = self.current_character.inventory, self.inventory_search_var.get()
+        filtered_inventory = self.current_character.sorted_records(
+            inventory, self.inventory_sort_column, self.inventory_sort_reverse, term)
 
-        search_term = self.inventory_search_var.get().lower()
-        
-        filtered_inventory = [
-            (i, item) for i, item in enumerate(self.current_character.inventory)
-            if search_term in item.name.lower()
-        ]
+        def make_values(item):
+            return (item.name, item.item_type, item.quantity)
+
+        # Rows keep a stable IID per item, so only changed rows are touched; only visible rows are built
+        self.inventory_view.set_rows(filtered_inventory, self._row_iid, make_values, self._listed_check(inventory, term, filtered_inventory))
 
-        # --- Sorting Logic ---
-        sort_key_map = {
-            "Item Name": lambda item: item[1].name.lower(),
-            "Type": lambda item: item[1].item_type.lower(),
-            "Qty": lambda item: item[1].quantity
-        }
-        sort_key = sort_key_map.get(self.inventory_sort_column)
-        if sort_key:
-            # Sort the list of (original_index, item_obj) tuples
-            filtered_inventory.sort(key=sort_key, reverse=self.inventory_sort_reverse)
-
-        for i, (original_index, item) in enumerate(filtered_inventory):
-            tag = 'evenrow' if i % 2 == 0 else 'oddrow'
-            # Use original_index as the IID to link back to the original list
-            self.inv_tree.insert("", "end", iid=original_index, values=(item.name, item.item_type, item.quantity), tags=(tag,))
-        
         self.item_desc_label.config(text="Click an item to see its description.")
-        self._update_attributes_view() # Update attributes when equipment changes
 
     def _update_notes_view(self):
         self.notes_text.delete("1.0", tk.END)
@@ -808,8 +1099,12 @@ class CharacterTracker:
         self.notes_text.edit_modified(False)
 
     def _update_theme_specific_widgets(self):
-        """Updates widgets that need manual theme configuration."""
-        self.notes_text.config(bg=self.theme["WIDGET_BG"], fg=self.theme["WIDGET_FG"], insertbackground=self.theme["WIDGET_FG"])
+        """Updates widgets that need manual theme configuration, in the tabs built so far."""
+        if hasattr(self, "skill_tree"):
+            self.skill_tree.tag_configure('oddrow', background=self.theme["TREEVIEW_ODD"], foreground=self.theme["WIDGET_FG"])
+            self.skill_tree.tag_configure('evenrow', background=self.theme["TREEVIEW_EVEN"], foreground=self.theme["WIDGET_FG"])
+        if hasattr(self, "notes_text"):
+            self.notes_text.config(bg=self.theme["WIDGET_BG"], fg=self.theme["WIDGET_FG"], insertbackground=self.theme["WIDGET_FG"])
 
     def _create_context_menu(self, treeview, commands):
         menu = tk.Menu(treeview, tearoff=0, bg=self.theme["WIDGET_BG"], fg=self.theme["FOREGROUND"])
@@ -828,6 +1123,7 @@ class CharacterTracker:
                 menu.post(event.x_root, event.y_root)
 
         treeview.bind("<Button-3>", show_menu)
+        self.context_menus.append(menu)
         return menu
 
     def _smooth_scroll_handler(self, event):
@@ -858,12 +1154,13 @@ class CharacterTracker:
     def _toggle_theme(self):
         self.theme_name = "light" if self.theme_name == "dark" else "dark"
         self.theme = Themes.light if self.theme_name == "light" else Themes.dark
-        self._apply_styles()
-        self._update_all_views()
+        self._apply_styles() # ttk styles restyle every tab, built or not; no view needs redrawing
+        self._update_theme_specific_widgets()
+        self.autosaver.mark_dirty()
         for tooltip in self.tooltips:
             tooltip.set_theme(self.theme)
         
-        for menu in [self.skill_context_menu, self.inv_context_menu, self.equip_context_menu]:
+        for menu in self.context_menus: # Only menus of tabs built so far
             menu.config(bg=self.theme["WIDGET_BG"], fg=self.theme["FOREGROUND"])
 
     def _on_item_select(self, event):
@@ -876,7 +1173,8 @@ class CharacterTracker:
             if source_widget == self.inv_tree:
                 selected_item_iid = self.inv_tree.focus()
                 if selected_item_iid:
-                    item = self.current_character.inventory[int(selected_item_iid)]
+                    inventory = self.current_character.inventory
+                    item = self._record_for_iid(inventory, selected_item_iid)
             elif source_widget == self.equip_tree:
                 selected_item_iid = self.equip_tree.focus()
                 if selected_item_iid:
@@ -897,29 +1195,30 @@ class CharacterTracker:
         if new_name and new_name != self.active_character_name:
             self._sync_ui_to_character()
             self.active_character_name = new_name
-            self._update_all_views()
+            self._invalidate(*self._view_tabs) # The selector already shows the new name
+            self.autosaver.mark_dirty()
 
     def _on_skill_select(self, event=None):
         if not self.current_character: return
-        selected_iid = self.skill_tree.focus()
+        selected_iid = self.skill_view.focus()
         if not selected_iid:
             self._reset_skill_progress_bar()
             return
 
         try:
-            index = int(selected_iid)
-            skill = self.current_character.skills[index]
-            current_exp = skill['exp']
-            next_exp = self.current_character.get_exp_for_next_level(skill['level'])
+            skills = self.current_character.skills
+            skill = self._record_for_iid(skills, selected_iid)
+            current_exp = skill.exp
+            next_exp = self.current_character.get_exp_for_next_level(skill.level)
 
             if next_exp != float('inf'):
                 progress = (current_exp / next_exp) * 100 if next_exp > 0 else 100
                 self.skill_exp_progress_var.set(progress)
-                self.skill_exp_label_var.set(f"{skill['name']}:")
+                self.skill_exp_label_var.set(f"{skill.name}:")
                 self.skill_exp_progress_label_var.set(f"{current_exp} / {next_exp} ({progress:.1f}%)")
             else:
                 self.skill_exp_progress_var.set(100)
-                self.skill_exp_label_var.set(f"{skill['name']} is at MAX LEVEL")
+                self.skill_exp_label_var.set(f"{skill.name} is at MAX LEVEL")
                 self.skill_exp_progress_label_var.set("MAX")
 
         except (IndexError, ValueError):
@@ -937,7 +1236,7 @@ class CharacterTracker:
         else:
             self.skill_sort_column = col
             self.skill_sort_reverse = False
-        self._update_skills_view()
+        self._invalidate("skills")
 
     def _sort_inventory_column(self, col):
         """Handles sorting of the inventory treeview when a column header is clicked."""
@@ -946,13 +1245,25 @@ class CharacterTracker:
         else:
             self.inventory_sort_column = col
             self.inventory_sort_reverse = False
-        self._update_inventory_views()
+        self._invalidate("inventory")
         
     def _on_skill_search(self, *args):
-        self._update_skills_view()
+        self.skill_search_scheduler.schedule(self.skill_search_var.get())
 
     def _on_inventory_search(self, *args):
-        self._update_inventory_views()
+        self.inventory_search_scheduler.schedule(self.inventory_search_var.get())
+
+    def _on_search_done(self, report, view, view_name, status_var):
+        """Redraws a list once its debounced search has finished; the results are already cached in the search index."""
+        view.scroll_to_top()
+        self._invalidate(view_name)
+        if report['term']:
+            if search_capped(report['term'], report['results']):
+                status_var.set(f"first {report['results']} in this order shown, keep typing to narrow")
+            else:
+                status_var.set(f"{report['results']} found in {report['elapsed_ms']:.0f} ms")
+        else:
+            status_var.set("")
 
     def _add_character(self):
         new_name = simpledialog.askstring("Add New Character", "Enter the name for the new character:", parent=self.root)
@@ -964,6 +1275,7 @@ class CharacterTracker:
             self.characters[new_name] = Character(name=new_name)
             self.active_character_name = new_name
             self._update_all_views()
+            self._mark_dirty()
         elif new_name is not None:
             messagebox.showerror("Invalid Name", "Character name cannot be empty.")
 
@@ -977,7 +1289,10 @@ class CharacterTracker:
             self.current_character.name = new_name
             self.characters[new_name] = self.characters.pop(old_name)
             self.active_character_name = new_name
-            self._update_all_views()
+            self._prune_sheet_renderers()
+            self._update_character_selector()
+            self._invalidate("status") # Only the Status tab shows the name
+            self._mark_dirty()
         elif new_name is not None:
             messagebox.showerror("Invalid Name", "Character name cannot be empty.")
 
@@ -990,7 +1305,14 @@ class CharacterTracker:
         if messagebox.askyesno("Confirm Deletion", f"Are you sure you want to permanently delete '{char_to_delete}'?"):
             del self.characters[char_to_delete]
             self.active_character_name = list(self.characters.keys())[0]
+            self._prune_sheet_renderers()
             self._update_all_views()
+            self.autosaver.mark_dirty()
+
+    def _prune_sheet_renderers(self):
+        """Forgets cached sheet sections of characters that were renamed or deleted."""
+        for renderer in self.sheet_renderers.values():
+            renderer.prune(self.characters)
 
     def _export_character(self):
         if not self.current_character:
@@ -1000,11 +1322,11 @@ class CharacterTracker:
         self._sync_ui_to_character() # Ensure notes are up-to-date before exporting
 
         # Suggest a filename and open the save dialog
-        default_filename = f"{char.name.replace(' ', '_')}_sheet.md"
+        default_filename = sheet_filename(char.name)
         filepath = filedialog.asksaveasfilename(
             initialfile=default_filename,
             defaultextension=".md",
-            filetypes=[("Markdown Files", "*.md"), ("Text Files", "*.txt"), ("All Files", "*.*")],
+            filetypes=[("Markdown Files", "*.md"), ("Text Files", "*.txt"), ("HTML Files", "*.html"), ("All Files", "*.*")],
             parent=self.root,
             title="Export Character Sheet"
         )
@@ -1012,80 +1334,42 @@ class CharacterTracker:
         if not filepath:
             return # User cancelled the dialog
 
-        # Build the markdown content string
-        content = []
-        content.append(f"# Character Sheet: {char.name}\n")
-
-        # Status Section
-        content.append("## Status")
-        content.append(f"- **Level:** {char.level}")
-        next_exp = char.get_exp_for_next_level(char.level)
-        exp_str = f"{char.exp} / {next_exp}" if next_exp != float('inf') else "MAX"
-        content.append(f"- **Experience:** {exp_str}")
-        content.append(f"- **Health:** {char.get_health()}")
-        content.append(f"- **Mana:** {char.get_mana()}")
-        content.append("\n---\n")
-
-        # Attributes Section
-        content.append("## Attributes")
-        content.append("| Attribute    | Base | Total | Modifier |")
-        content.append("|--------------|------|-------|----------|")
-        for attr in CORE_ATTRIBUTES:
-            base = char.attributes.get(attr, 10)
-            total = char.get_total_attribute(attr)
-            mod = char.get_attribute_modifier(attr)
-            content.append(f"| {attr:<12} | {base:<4} | {total:<5} | {mod:+<8} |")
-        content.append("\n---\n")
-
-        # Skills Section
-        if char.skills:
-            content.append("## Skills")
-            content.append("| Skill        | Level | Experience |")
-            content.append("|--------------|-------|------------|")
-            for skill in sorted(char.skills, key=lambda s: s['name']):
-                skill_next_exp = char.get_exp_for_next_level(skill['level'])
-                skill_exp_str = f"{skill['exp']}/{skill_next_exp}" if skill_next_exp != float('inf') else "MAX"
-                content.append(f"| {skill['name']:<12} | {skill['level']:<5} | {skill_exp_str:<10} |")
-            content.append("\n---\n")
-
-        # Equipment, Inventory, and Notes sections follow...
-        content.append("## Equipment")
-        equipped_items = [f"- **{slot}:** {item.name}" for slot, item in char.equipment.items() if item]
-        content.append("\n".join(equipped_items) if equipped_items else "_No items equipped._")
-        content.append("\n---\n")
-
-        content.append("## Inventory")
-        inv_items = [f"- **{item.name} (x{item.quantity})**" + (f": {item.description}" if item.description else "") for item in sorted(char.inventory, key=lambda i: i.name)]
-        content.append("\n".join(inv_items) if inv_items else "_Inventory is empty._")
-        content.append("\n---\n")
-
-        content.append("## Notes")
-        content.append(char.notes.strip() if char.notes.strip() else "_No notes._")
-
         # Write the content to the selected file
         try:
+            target = sheet_target_for(filepath)
+            if target not in self.sheet_renderers:
+                self.sheet_renderers[target] = SheetRenderer(target)
             with open(filepath, 'w', encoding='utf-8') as f:
-                f.write("\n".join(content))
+                f.write(render_character_sheet(char, target, self.sheet_renderers[target]))
             messagebox.showinfo("Export Successful", f"Character sheet for '{char.name}' has been saved.", parent=self.root)
         except IOError as e:
             messagebox.showerror("Export Error", f"Failed to save file:\n{e}", parent=self.root)
 
-    def _handle_add(self, item_type, dialog_class, collection, update_view_func, factory=None):
+    def _handle_add(self, item_type, dialog_class, collection, view, factory=None, add=None):
         if not self.current_character: return
         dialog = dialog_class(self.root, self.theme, f"Add New {item_type.title()}")
         if dialog.result:
             new_obj = factory(**dialog.result) if factory else dialog.result
-            collection.append(new_obj)
-            update_view_func()
+            if add:
+                add(new_obj)
+            else:
+                collection.append(new_obj)
+                self.current_character.index_record(collection, len(collection) - 1)
+            self._mark_dirty()
+            self._invalidate(view)
 
-    def _handle_edit(self, treeview, collection, item_type, dialog_class, update_view_func, factory=None):
+    def _handle_edit(self, treeview, collection, item_type, dialog_class, view, factory=None):
         if not self.current_character: return
         selected_iid = treeview.focus()
         if not selected_iid:
             messagebox.showerror("Error", f"Please select an {item_type} to edit.")
             return
 
-        index = int(selected_iid)
+        try:
+            index = self._index_for_iid(collection, selected_iid)
+        except (IndexError, ValueError):
+            messagebox.showerror("Error", f"Could not find the selected {item_type}. It may have been deleted.")
+            return
         item_to_edit = collection[index]
 
         # Pass the item to edit with the correct keyword argument
@@ -1095,26 +1379,30 @@ class CharacterTracker:
         if dialog.result:
             updated_obj = factory(**dialog.result) if factory else dialog.result
             collection[index] = updated_obj
-            update_view_func()
+            self.current_character.index_record(collection, index, replaced=item_to_edit)
+            self._mark_dirty()
+            self._invalidate(view)
 
-    def _handle_delete(self, treeview, collection, item_type, update_view_func):
+    def _handle_delete(self, treeview, collection, item_type, view):
         if not self.current_character: return
         selected_iid = treeview.focus()
         if not selected_iid:
             messagebox.showerror("Error", f"Please select an {item_type} to delete.")
             return
 
-        index = int(selected_iid)
         # Safely get the name for the confirmation dialog
         try:
-            item_name = collection[index].name if hasattr(collection[index], 'name') else collection[index]['name']
-        except (IndexError, KeyError):
+            index = self._index_for_iid(collection, selected_iid)
+            item_name = collection[index].name
+        except (IndexError, ValueError):
             messagebox.showerror("Error", "Could not find the selected item. It may have been deleted.")
             return
 
         if messagebox.askyesno("Confirm Delete", f"Are you sure you want to delete '{item_name}'?"):
+            self.current_character.unindex_record(collection, index)
             del collection[index]
-            update_view_func()
+            self._mark_dirty()
+            self._invalidate(view)
 
     def _apply_main_exp(self):
         if not self.current_character: return
@@ -1124,7 +1412,8 @@ class CharacterTracker:
 
             old_level = self.current_character.level
             self.current_character.add_exp(amount)
-            self._update_status_view()
+            self._mark_dirty()
+            self._invalidate("status")
             self.main_exp_gain.set(0)
 
             if self.current_character.level > old_level:
@@ -1140,40 +1429,42 @@ class CharacterTracker:
             if amount <= 0: return
 
             self.current_character.remove_exp(amount)
-            self._update_status_view()
+            self._mark_dirty()
+            self._invalidate("status")
             self.main_exp_gain.set(0)
 
         except tk.TclError:
             messagebox.showerror("Input Error", "EXP amount must be a valid number.")
 
     def _add_skill(self):
-        self._handle_add("skill", SkillEditorDialog, self.current_character.skills, self._update_skills_view)
+        self._handle_add("skill", SkillEditorDialog, self.current_character.skills, "skills", factory=Skill)
 
     def _edit_skill(self):
-        self._handle_edit(self.skill_tree, self.current_character.skills, "skill", SkillEditorDialog, self._update_skills_view)
+        self._handle_edit(self.skill_view, self.current_character.skills, "skill", SkillEditorDialog, "skills", factory=Skill)
 
     def _delete_skill(self):
-        self._handle_delete(self.skill_tree, self.current_character.skills, "skill", self._update_skills_view)
+        self._handle_delete(self.skill_view, self.current_character.skills, "skill", "skills")
 
     def _apply_exp_to_skill(self):
         if not self.current_character: return
-        selected_item = self.skill_tree.focus()
+        selected_item = self.skill_view.focus()
         if not selected_item:
             messagebox.showerror("Error", "Please select a skill from the list to apply EXP to.")
             return
 
         try:
-            index = int(selected_item)
+            index = self._index_for_iid(self.current_character.skills, selected_item)
             amount = self.skill_exp_gain.get()
             if amount <= 0: return
 
             skill = self.current_character.skills[index]
             leveled_up, new_level = self.current_character.add_skill_exp(index, amount)
+            self._mark_dirty()
 
             if leveled_up:
-                messagebox.showinfo("Skill Level Up!", f"{skill['name']} has reached level {new_level}!")
+                messagebox.showinfo("Skill Level Up!", f"{skill.name} has reached level {new_level}!")
 
-            self._update_skills_view()
+            self._invalidate("skills")
             self.skill_exp_gain.set(0)
 
         except tk.TclError:
@@ -1183,18 +1474,19 @@ class CharacterTracker:
 
     def _remove_exp_from_skill(self):
         if not self.current_character: return
-        selected_item = self.skill_tree.focus()
+        selected_item = self.skill_view.focus()
         if not selected_item:
             messagebox.showerror("Error", "Please select a skill from the list to remove EXP from.")
             return
 
         try:
-            index = int(selected_item)
+            index = self._index_for_iid(self.current_character.skills, selected_item)
             amount = self.skill_exp_gain.get()
             if amount <= 0: return
 
             self.current_character.remove_skill_exp(index, amount)
-            self._update_skills_view()
+            self._mark_dirty()
+            self._invalidate("skills")
             self.skill_exp_gain.set(0)
 
         except tk.TclError:
@@ -1203,22 +1495,37 @@ class CharacterTracker:
             messagebox.showerror("Error", "Could not find the selected skill. It may have been deleted.")
 
     def _add_item(self):
-        self._handle_add("item", ItemEditorDialog, self.current_character.inventory, self._update_inventory_views, factory=Item)
+        self._handle_add("item", ItemEditorDialog, self.current_character.inventory, "inventory",
+                         factory=Item, add=self.current_character.add_item)
 
     def _edit_item(self):
-        self._handle_edit(self.inv_tree, self.current_character.inventory, "item", ItemEditorDialog, self._update_inventory_views, factory=Item)
+        self._handle_edit(self.inventory_view, self.current_character.inventory, "item", ItemEditorDialog, "inventory", factory=Item)
 
     def _delete_item(self):
-        self._handle_delete(self.inv_tree, self.current_character.inventory, "item", self._update_inventory_views)
+        self._handle_delete(self.inventory_view, self.current_character.inventory, "item", "inventory")
+
+    def _compact_inventory(self):
+        if not self.current_character: return
+        merged = self.current_character.compact_inventory()
+        if not merged:
+            messagebox.showinfo("Stack Duplicates", "There are no duplicate items to merge.")
+            return
+        self._mark_dirty()
+        self._invalidate("inventory")
+        messagebox.showinfo("Stack Duplicates", f"Merged {merged} duplicate item entries into existing stacks.")
 
     def _equip_item(self):
         if not self.current_character: return
-        selected_item_iid = self.inv_tree.focus()
+        selected_item_iid = self.inventory_view.focus()
         if not selected_item_iid:
             messagebox.showerror("Error", "Please select an item from the inventory to equip.")
             return
 
-        index = int(selected_item_iid)
+        try:
+            index = self._index_for_iid(self.current_character.inventory, selected_item_iid)
+        except IndexError:
+            messagebox.showerror("Error", "Could not find the selected item. It may have been deleted.")
+            return
         item = self.current_character.inventory[index]
 
         slot_to_fill = None
@@ -1242,11 +1549,14 @@ class CharacterTracker:
         if currently_equipped:
             if not messagebox.askyesno("Replace Item?", f"The {slot_to_fill} slot is already equipped with '{currently_equipped.name}'.\nDo you want to replace it? The old item will return to your inventory."):
                 return
-            self.current_character.inventory.append(currently_equipped)
 
-        self.current_character.equipment[slot_to_fill] = item
-        del self.current_character.inventory[index]
-        self._update_inventory_views()
+        # Equip one item off the stack; the rest stays in the inventory
+        item = self.current_character.take_item(index)
+        if currently_equipped:
+            self.current_character.add_item(currently_equipped)
+        self.current_character.equip(slot_to_fill, item)
+        self._mark_dirty()
+        self._invalidate("equipment", "inventory", "attributes") # Equipment bonuses change attribute totals
 
     def _unequip_item(self):
         if not self.current_character: return
@@ -1263,12 +1573,14 @@ class CharacterTracker:
             messagebox.showerror("Error", "The selected slot is empty.")
             return
 
-        self.current_character.inventory.append(item_to_unequip)
-        self.current_character.equipment[slot] = None
-        self._update_inventory_views()
+        self.current_character.unequip(slot)
+        self.current_character.add_item(item_to_unequip)
+        self._mark_dirty()
+        self._invalidate("equipment", "inventory", "attributes") # Equipment bonuses change attribute totals
 
     def _sync_ui_to_character(self):
-        if self.current_character:
+        # A stale (or never built) notes view doesn't hold the current character's notes
+        if self.current_character and "notes" not in self._stale_views:
             self.current_character.notes = self.notes_text.get("1.0", tk.END).strip()
 
     def _on_notes_modified(self, *args):
@@ -1277,10 +1589,14 @@ class CharacterTracker:
         if self.notes_text.edit_modified():
             self.current_character.notes = self.notes_text.get("1.0", tk.END).strip()
             self.notes_text.edit_modified(False)
+            self._mark_dirty()
 
     def _on_close(self):
         self._sync_ui_to_character()
-        self.pm.save(self.characters, self.theme_name, self.active_character_name)
+        self.autosaver.mark_dirty(self.active_character_name) # Notes may have been synced above
+        if not self.autosaver.close():
+            messagebox.showwarning("Save In Progress", f"Saving did not finish within {SAVE_CLOSE_TIMEOUT_S} seconds; "
+                                   "the most recent changes may not have been written.")
         self.root.destroy()
 
 
@@ -1318,9 +1634,9 @@ class SkillEditorDialog(AnimatedDialog):
         super().__init__(parent, bg=theme["BACKGROUND"])
         self.title(title)
         self.geometry("350x180")
-        self.skill_name = tk.StringVar(value=skill['name'] if skill else "")
-        self.skill_level = tk.IntVar(value=skill['level'] if skill else 1)
-        self.skill_exp = tk.IntVar(value=skill['exp'] if skill else 0)
+        self.skill_name = tk.StringVar(value=skill.name if skill else "")
+        self.skill_level = tk.IntVar(value=skill.level if skill else 1)
+        self.skill_exp = tk.IntVar(value=skill.exp if skill else 0)
         self.result = None
 
         self._create_widgets(theme)
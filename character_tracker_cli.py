@@ -0,0 +1,199 @@
+"""Command line for the Character Tracker: scripted jobs on saved characters without Tk.
+
+Run with `python -m character_tracker_cli <command> ...` from the directory
+holding the save data; `--help` lists the commands. Only the data layer
+(character_tracker_core) is imported, so no display is needed.
+"""
+import argparse
+import heapq
+import sys
+
+from character_tracker_core import (
+    SHEET_TARGETS, STORAGE_BACKEND, SaveError, SheetRenderer, apply_exp_events, create_persistence_manager,
+    export_sheets, migrate_storage
+)
+
+BACKENDS = ("sharded", "sqlite", "json")
+# One SheetRenderer per format for as long as this process runs (e.g. a script calling
+# main() repeatedly), so a re-export only re-renders sections whose data changed.
+_sheet_renderers = {}
+
+
+class CommandError(Exception):
+    """A command can't run as asked; main() prints the message and exits with status 1."""
+
+
+def _load(args):
+    pm = create_persistence_manager(args.backend)
+    characters, theme_name, active_char_name = pm.load()
+    return pm, characters, theme_name, active_char_name
+
+
+def _close(pm):
+    if hasattr(pm, 'close'):
+        pm.close()
+
+
+def _select(characters, names):
+    """The characters called `names` (all of them when empty), as a name -> Character mapping."""
+    if not names:
+        return characters
+    missing = [name for name in names if name not in characters]
+    if missing:
+        raise CommandError(f"No character named {', '.join(repr(name) for name in missing)}")
+    return {name: characters[name] for name in names}
+
+
+# --- Commands ---
+def cmd_list(args):
+    pm, characters, _, active_char_name = _load(args)
+    for name in characters:
+        marker = "*" if name == active_char_name else " "
+        if args.names_only:
+            print(f"{marker} {name}")
+        else:
+            char = characters[name]
+            print(f"{marker} {name}\tlevel {char.level}\t{char.exp} EXP\t{len(char.skills)} skills\t{len(char.inventory)} items")
+    _close(pm)
+    return 0
+
+
+def cmd_grant_exp(args):
+    if not args.names and not args.all:
+        raise CommandError("Name at least one character, or pass --all")
+    pm, characters, theme_name, active_char_name = _load(args)
+    try:
+        selected = _select(characters, [] if args.all else args.names)
+        report = apply_exp_events((char, args.skill, args.amount) for char in selected.values())
+        for entry in report:
+            target = entry['character'] if entry['skill'] is None else f"{entry['character']} / {entry['skill']}"
+            if entry['new_level'] is None:
+                print(f"{target}: no such skill, skipped", file=sys.stderr)
+            else:
+                print(f"{target}: level {entry['old_level']} -> {entry['new_level']}, {entry['exp']} EXP")
+        pm.save(characters, theme_name, active_char_name, dirty={entry['character'] for entry in report})
+    finally:
+        _close(pm)
+    return 0
+
+
+def cmd_export(args):
+    pm, characters, _, _ = _load(args)
+    renderer = _sheet_renderers.get(args.format)
+    if renderer is None:
+        renderer = _sheet_renderers[args.format] = SheetRenderer(args.format)
+    try:
+        selected = _select(characters, args.names)
+        # Only the in-process path (the default) goes through the renderer's cache; pool workers render uncached
+        report = export_sheets(selected, args.destination, target=args.format, processes=args.processes,
+                               renderer=renderer)
+        renderer.prune(selected)
+    finally:
+        _close(pm)
+    print(f"Exported {report['exported']} sheets ({report['bytes'] / 2 ** 20:.1f} MiB) to {args.destination}"
+          f" in {report['seconds']:.2f} s, {report['sheets_per_second']:.0f} sheets/s")
+    for name, error in report['failed'].items():
+        print(f"Failed: {name}: {error}", file=sys.stderr)
+    return 1 if report['failed'] else 0
+
+
+def cmd_query(args):
+    pm, characters, _, _ = _load(args)
+    try:
+        if args.query == "top-skills":
+            rows = pm.top_skills(args.limit, args.skill) if hasattr(pm, 'top_skills') else None
+            if rows is None: # No index to ask (sharded backend, or no JSON snapshot yet): scan the roster
+                rows = heapq.nlargest(args.limit, ((name, skill.name, skill.level, skill.exp)
+                                                   for name in characters for skill in characters[name].skills
+                                                   if args.skill is None or skill.name == args.skill),
+                                      key=lambda row: (row[2], row[3]))
+            for name, skill_name, level, exp in rows:
+                print(f"{name}\t{skill_name}\tlevel {level}\t{exp} EXP")
+        else:
+            if hasattr(pm, 'characters_holding_item'):
+                names = pm.characters_holding_item(args.item)
+            else:
+                names = sorted(name for name in characters
+                               if characters[name].items_named(args.item)
+                               or any(item and item.name == args.item for item in characters[name].equipment.values()))
+            for name in names:
+                print(name)
+    finally:
+        _close(pm)
+    return 0
+
+
+def cmd_migrate(args):
+    if args.to == args.backend:
+        raise CommandError(f"Source and target are both the '{args.to}' backend")
+    source, target = create_persistence_manager(args.backend), create_persistence_manager(args.to)
+    try:
+        migrate_storage(source, target)
+    finally:
+        _close(source)
+        _close(target)
+    print(f"Copied every character from the '{args.backend}' backend to '{args.to}'")
+    return 0
+
+
+def cmd_benchmark(args):
+    import benchmark # Sits next to this module; only needed for this command
+    return benchmark.main(args.names)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="character_tracker_cli", description=__doc__.splitlines()[0])
+    parser.add_argument("--backend", choices=BACKENDS, default=STORAGE_BACKEND,
+                        help=f"storage to read and write (default: {STORAGE_BACKEND})")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    command = commands.add_parser("list", help="list characters with their level and EXP")
+    command.add_argument("--names-only", action="store_true", help="print names without loading any character")
+    command.set_defaults(run=cmd_list)
+
+    command = commands.add_parser("grant-exp", help="add (or, when negative, remove) EXP and save")
+    command.add_argument("amount", type=int)
+    command.add_argument("names", nargs="*", metavar="NAME")
+    command.add_argument("--all", action="store_true", help="every character")
+    command.add_argument("--skill", help="grant to this skill instead of the character level")
+    command.set_defaults(run=cmd_grant_exp)
+
+    command = commands.add_parser("export", help="write character sheets to a directory or .zip")
+    command.add_argument("destination")
+    command.add_argument("names", nargs="*", metavar="NAME", help="characters to export (default: all)")
+    command.add_argument("--format", choices=list(SHEET_TARGETS), default="markdown")
+    command.add_argument("--processes", type=int, default=1,
+                         help="render in a pool of this many worker processes, 0 for one per CPU"
+                              " (default: 1, render in this process)")
+    command.set_defaults(run=cmd_export)
+
+    command = commands.add_parser("query", help="cross-roster questions")
+    queries = command.add_subparsers(dest="query", required=True)
+    query = queries.add_parser("top-skills", help="highest skills across every character")
+    query.add_argument("--skill", help="only this skill")
+    query.add_argument("--limit", type=int, default=10)
+    query = queries.add_parser("holding", help="characters carrying or wearing an item")
+    query.add_argument("item")
+    command.set_defaults(run=cmd_query)
+
+    command = commands.add_parser("migrate", help="copy everything from --backend into another backend")
+    command.add_argument("--to", choices=BACKENDS, required=True)
+    command.set_defaults(run=cmd_migrate)
+
+    command = commands.add_parser("benchmark", help="run benchmark.py")
+    command.add_argument("names", nargs="*", metavar="NAME", help="benchmarks to run (default: all)")
+    command.set_defaults(run=cmd_benchmark)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    try:
+        return args.run(args)
+    except (CommandError, SaveError) as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 1
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
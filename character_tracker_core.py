@@ -0,0 +1,2559 @@
+"""Data layer of the Character Tracker: characters, leveling, persistence and export.
+
+Nothing here imports tkinter, so scripts and servers can use it without a
+display; character_tracker_app.py builds the desktop UI on top of it and
+character_tracker_cli.py the command line.
+"""
+import bisect
+import codecs
+import gzip
+import hashlib
+import heapq
+import html
+import json
+import mmap
+import operator
+import os
+import re
+import sqlite3
+import struct
+import sys
+import tempfile
+import threading
+import time
+import zipfile
+import zlib
+from collections import deque
+from collections.abc import MutableMapping
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, as_completed, wait
+from concurrent.futures.process import BrokenProcessPool
+from itertools import compress, count, islice, repeat
+from types import MappingProxyType
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional; bulk leveling falls back to pure Python
+    np = None
+
+# --- Constants ---
+SAVE_FILE = "character_data_v6.json"
+SAVE_SNAPSHOT = "character_data_v6.snap" # Binary index beside SAVE_FILE for the "json" backend; None to disable
+SAVE_DIR = "character_data"
+SAVE_DB = "character_data.db"
+STORAGE_BACKEND = "sharded" # "sharded" (SAVE_DIR), "sqlite" (SAVE_DB) or "json" (SAVE_FILE)
+SAVE_FORMAT = "pretty" # "pretty" (indented JSON), "compact" (minified JSON) or "gzip" (minified JSON, gzip-compressed)
+SAVE_FORMATS = ("pretty", "compact", "gzip")
+GZIP_LEVEL = 6 # Close to the best ratio for JSON at a fraction of level 9's time
+LOAD_CHUNK_SIZE = 1 << 20 # Bytes read at a time when streaming a JSON save file
+EXPORT_BATCH_SIZE = 50 # Characters sent to an export worker process per job
+SEARCH_CHUNK_SIZE = 5000 # Records scanned between time checks
+SEARCH_INDEX_CHUNK_SIZE = 500 # Records filed into the search index between time checks; filing costs far more than a scan
+SEARCH_GRAM = 3 # Length of the n-grams the search index files words under; shorter term pieces are scanned for
+SEARCH_SHORT_TERM = 2 # Terms this short match most records, so their search stops at SEARCH_SHORT_TERM_HITS
+SEARCH_SHORT_TERM_HITS = 1000
+MAX_LEVEL = 200
+BASE_EXP = 100
+GROWTH_FACTOR = 1.5
+CORE_ATTRIBUTES = ["Strength", "Dexterity", "Constitution", "Intelligence", "Wisdom", "Charisma"]
+EQUIPMENT_SLOTS = ["Weapon", "Shield", "Helmet", "Chestplate", "Leggings", "Boots", "Ring 1", "Ring 2", "Amulet"]
+ITEM_TYPES = ["Weapon", "Shield", "Helmet", "Chestplate", "Leggings", "Boots", "Ring", "Amulet", "Consumable", "Material", "Quest Item", "Other"]
+
+# --- Utility Functions ---
+def generate_exp_table():
+    return [0] + [int(BASE_EXP * (lvl ** GROWTH_FACTOR)) for lvl in range(1, MAX_LEVEL + 1)]
+
+EXP_TABLE = generate_exp_table()
+
+def generate_cumulative_exp_table(exp_table):
+    """Builds a prefix table where entry L is the total EXP needed to reach level L from level 1."""
+    cumulative = [0, 0]
+    for lvl in range(1, MAX_LEVEL):
+        cumulative.append(cumulative[-1] + exp_table[lvl])
+    return cumulative
+
+CUMULATIVE_EXP_TABLE = generate_cumulative_exp_table(EXP_TABLE)
+
+def rebuild_exp_tables():
+    """
+    Recomputes EXP_TABLE and CUMULATIVE_EXP_TABLE from BASE_EXP and
+    GROWTH_FACTOR; call it after changing either. Returns the previous
+    EXP_TABLE, for SkillLevelArrays.rebalance().
+    """
+    global EXP_TABLE, CUMULATIVE_EXP_TABLE
+    old_exp_table = EXP_TABLE
+    EXP_TABLE = generate_exp_table()
+    CUMULATIVE_EXP_TABLE = generate_cumulative_exp_table(EXP_TABLE)
+    return old_exp_table
+
+def get_exp_for_next_level(level):
+    if 1 <= level < MAX_LEVEL:
+        return EXP_TABLE[level]
+    return float('inf')
+
+def _step_level_gain(level, exp):
+    """Level-by-level resolution, used for levels outside the 1..MAX_LEVEL table."""
+    while level < MAX_LEVEL and exp >= get_exp_for_next_level(level):
+        exp -= get_exp_for_next_level(level)
+        level += 1
+    return level, exp
+
+def _step_level_loss(level, exp):
+    """Level-by-level resolution, used for levels below the 1..MAX_LEVEL table."""
+    while level > 1 and exp < 0:
+        level -= 1
+        exp += get_exp_for_next_level(level)
+    return level, max(exp, 0)
+
+def resolve_level_gain(level, exp, amount):
+    """Returns the (level, exp) reached after gaining `amount` EXP, in a single bisect over the prefix table."""
+    exp += amount
+    if not 1 <= level < MAX_LEVEL:
+        return _step_level_gain(level, exp)
+    if exp < EXP_TABLE[level]:
+        return level, exp
+    total = CUMULATIVE_EXP_TABLE[level] + exp
+    new_level = bisect.bisect_right(CUMULATIVE_EXP_TABLE, total, level, MAX_LEVEL + 1) - 1
+    return new_level, total - CUMULATIVE_EXP_TABLE[new_level]
+
+def resolve_level_loss(level, exp, amount):
+    """Returns the (level, exp) reached after losing `amount` EXP; EXP never drops below 0 at level 1."""
+    exp -= amount
+    if exp >= 0:
+        return level, exp
+    if level < 1:
+        return _step_level_loss(level, exp)
+    level = min(level, MAX_LEVEL) # Levels past the table have no EXP cost to step back through
+    total = CUMULATIVE_EXP_TABLE[level] + exp
+    if total < 0:
+        return 1, 0
+    new_level = bisect.bisect_right(CUMULATIVE_EXP_TABLE, total, 1, level) - 1
+    return new_level, total - CUMULATIVE_EXP_TABLE[new_level]
+
+# --- Data and Logic Layer ---
+# Shared by every item without effects; read-only, so it can't be changed through one item
+EMPTY_EFFECTS = MappingProxyType({})
+# Source of record uids: stable for a record's lifetime, never reused, never saved
+_record_uids = count(1)
+
+class Item:
+    __slots__ = ('name', 'description', 'quantity', 'item_type', 'effects', 'uid')
+
+    def __init__(self, name, description="", quantity=1, item_type="Other", effects=None):
+        self.name = name
+        self.description = description
+        self.quantity = quantity
+        self.item_type = sys.intern(item_type) # A handful of distinct types shared by every item
+        self.effects = effects if effects else EMPTY_EFFECTS
+        self.uid = next(_record_uids)
+
+def item_stack_key(item):
+    """Items with equal keys are interchangeable, so they can share one stack."""
+    return (item.name, item.item_type, item.description, frozenset(item.effects.items()))
+
+class Skill:
+    __slots__ = ('name', 'level', 'exp', 'uid')
+
+    def __init__(self, name, level=1, exp=0):
+        self.name = name
+        self.level = level
+        self.exp = exp
+        self.uid = next(_record_uids)
+
+class RecordIndex:
+    """
+    Uid, name and position lookups over a list of skills or items. A name maps
+    to every record carrying it, in the order they were indexed.
+
+    Each record holds a slot that only grows with its position; a delete
+    frees its slot instead of renumbering the records after it, and a
+    position is its slot minus the freed slots below it.
+    """
+    def __init__(self, records=()):
+        self._by_uid = {}
+        self._by_name = {} # name -> {uid: record}, in indexing order
+        self._filed = {} # uid -> (slot, name it is filed under)
+        self._freed = [] # Sorted slots of deleted records
+        self._next_slot = 0
+        for record in records:
+            self.add(record)
+
+    def __len__(self):
+        return len(self._by_uid)
+
+    def _file(self, record, slot):
+        self._by_uid[record.uid] = record
+        self._by_name.setdefault(record.name, {})[record.uid] = record
+        self._filed[record.uid] = (slot, record.name)
+
+    def _unfile(self, uid):
+        del self._by_uid[uid]
+        slot, name = self._filed.pop(uid)
+        named = self._by_name[name]
+        del named[uid]
+        if not named:
+            del self._by_name[name]
+        return slot
+
+    def add(self, record):
+        """Files an appended record, or re-files a known one whose name changed in place."""
+        filed = self._filed.get(record.uid)
+        if filed is None:
+            self._file(record, self._next_slot)
+            self._next_slot += 1
+        elif filed[1] != record.name:
+            self._file(record, self._unfile(record.uid))
+
+    def replace(self, old, new):
+        """Files `new` at the position `old` held."""
+        self._file(new, self._unfile(old.uid))
+
+    def discard(self, record):
+        """Forgets a deleted record; the records after it move up one position."""
+        if record.uid in self._filed:
+            bisect.insort(self._freed, self._unfile(record.uid))
+            if len(self._freed) > len(self._by_uid):
+                self._renumber()
+
+    def _renumber(self):
+        ordered = sorted(self._filed.items(), key=lambda entry: entry[1][0])
+        self._filed = {uid: (position, name) for position, (uid, (_, name)) in enumerate(ordered)}
+        self._freed, self._next_slot = [], len(ordered)
+
+    def get(self, uid):
+        return self._by_uid.get(uid)
+
+    def position(self, uid):
+        """The list position of the record with this uid, or None if it is gone."""
+        filed = self._filed.get(uid)
+        if filed is None:
+            return None
+        return filed[0] - bisect.bisect_left(self._freed, filed[0])
+
+    def named(self, name):
+        return list(self._by_name.get(name, {}).values())
+
+def search_capped(term, hits):
+    """Whether a search for `term` that found `hits` matches stopped at SEARCH_SHORT_TERM_HITS, so more may exist."""
+    return 0 < len(term) <= SEARCH_SHORT_TERM and hits >= SEARCH_SHORT_TERM_HITS
+
+def _search_words(text):
+    """The distinct words of a search text; fields are separated by whitespace or "\0"."""
+    return set(text.replace("\0", " ").split())
+
+def _word_grams(word):
+    return {word[i:i + SEARCH_GRAM] for i in range(len(word) - SEARCH_GRAM + 1)}
+
+class SearchIndex:
+    """
+    Lowercased search text for every record of a list, kept in list order so
+    matches come back as list positions, plus an inverted index built by the
+    first search that can use it: the records holding each word, and the
+    words holding each trigram. A term piece without whitespace only occurs
+    inside a single word, so a piece of SEARCH_GRAM or more characters is
+    answered from the words sharing its trigrams; a term of several pieces
+    only checks the records holding its rarest piece. Searches for a term
+    that extends a recent one only recheck that term's matches. Terms of up
+    to SEARCH_SHORT_TERM characters are scanned instead and stop at the
+    first SEARCH_SHORT_TERM_HITS matches (see search_capped()).
+    """
+    MAX_RECENT = 32
+
+    def __init__(self, texts=()):
+        self._texts = list(texts)
+        self._recent = {} # term -> matching positions; cleared whenever the texts change
+        self._version = 0
+        # The inverted index, None until built. It files records by slot, a number
+        # handed out in list order and never reused, so a delete renumbers nothing.
+        self._words = None # word -> ascending slots of the records holding it
+        self._grams = None # trigram -> words containing it
+        self._slots = None # position -> slot, ascending
+        self._next_slot = 0
+        self._slot_positions = None # slot -> position, built on demand once a delete left gaps in the slots
+
+    def __len__(self):
+        return len(self._texts)
+
+    def _changed(self):
+        self._recent.clear()
+        self._version += 1
+
+    def set(self, position, text):
+        """Sets the text at `position`, appending when it is one past the end."""
+        if position == len(self._texts):
+            self._texts.append(text)
+            if self._words is not None:
+                slot = self._next_slot
+                self._next_slot += 1
+                self._slots.append(slot)
+                if self._slot_positions is not None:
+                    self._slot_positions[slot] = position
+                self._file(slot, _search_words(text))
+        else:
+            if self._words is not None:
+                slot = self._slots[position]
+                old_words, new_words = _search_words(self._texts[position]), _search_words(text)
+                self._unfile(slot, old_words - new_words)
+                self._file(slot, new_words - old_words)
+            self._texts[position] = text
+        self._changed()
+
+    def delete(self, position):
+        if self._words is not None:
+            self._unfile(self._slots.pop(position), _search_words(self._texts[position]))
+            self._slot_positions = None
+        del self._texts[position]
+        self._changed()
+
+    # --- Inverted index ---
+    def _file(self, slot, words):
+        for word in words:
+            slots = self._words.get(word)
+            if slots is None:
+                self._words[word] = [slot]
+                for gram in _word_grams(word):
+                    self._grams.setdefault(gram, set()).add(word)
+            else:
+                bisect.insort(slots, slot)
+
+    def _unfile(self, slot, words):
+        for word in words:
+            slots = self._words[word]
+            del slots[bisect.bisect_left(slots, slot)]
+            if not slots:
+                del self._words[word]
+                for gram in _word_grams(word):
+                    holders = self._grams[gram]
+                    holders.discard(word)
+                    if not holders:
+                        del self._grams[gram]
+
+    def _build(self, chunk_size):
+        """Builds the inverted index, yielding after every `chunk_size` records; restarts if the texts change meanwhile."""
+        texts = self._texts
+        while True:
+            version = self._version
+            words, grams = {}, {}
+            for start in range(0, len(texts), chunk_size):
+                for slot, text in enumerate(texts[start:start + chunk_size], start):
+                    for word in _search_words(text):
+                        slots = words.get(word)
+                        if slots is None:
+                            words[word] = [slot]
+                            for gram in _word_grams(word):
+                                grams.setdefault(gram, set()).add(word)
+                        else:
+                            slots.append(slot)
+                yield
+                if self._version != version:
+                    break
+            else:
+                self._words, self._grams = words, grams
+                self._slots, self._next_slot, self._slot_positions = list(range(len(texts))), len(texts), None
+                return
+
+    def _positions(self, slots):
+        """List positions of the records in ascending `slots`."""
+        if not slots or self._slots[-1] == len(self._slots) - 1: # No gaps yet, so every slot is its position
+            return list(slots)
+        if self._slot_positions is None:
+            self._slot_positions = dict(zip(self._slots, count()))
+        return list(map(self._slot_positions.__getitem__, slots))
+
+    def _words_containing(self, piece):
+        holders = []
+        for gram in _word_grams(piece):
+            words = self._grams.get(gram)
+            if words is None:
+                return ()
+            holders.append(words)
+        holders.sort(key=len)
+        words = holders[0].intersection(*holders[1:])
+        return words if len(piece) == SEARCH_GRAM else [word for word in words if piece in word]
+
+    def _indexed(self, term):
+        """
+        (positions, exact) from the inverted index: the records holding the
+        rarest piece of `term` long enough to look up, and whether they are
+        exactly its matches rather than candidates to check. None if no piece
+        is long enough.
+        """
+        pieces = term.replace("\0", " ").split()
+        rarest = None
+        for piece in pieces:
+            if len(piece) >= SEARCH_GRAM:
+                postings = [self._words[word] for word in self._words_containing(piece)]
+                size = sum(map(len, postings))
+                if rarest is None or size < rarest[0]:
+                    rarest = (size, postings)
+        if rarest is None:
+            return None
+        postings = rarest[1]
+        slots = postings[0] if len(postings) == 1 else sorted(set().union(*postings))
+        return self._positions(slots), pieces == [term]
+
+    # --- Searching ---
+    def search(self, term):
+        """Returns the positions whose text contains `term` (case-insensitive), in order."""
+        search = self.iter_search(term, chunk_size=max(len(self._texts), 1))
+        while True:
+            try:
+                next(search)
+            except StopIteration as done:
+                return done.value
+
+    def _remember(self, term, matches):
+        if len(self._recent) >= self.MAX_RECENT:
+            self._recent.clear()
+        self._recent[term] = matches
+        return matches
+
+    def iter_search(self, term, chunk_size=SEARCH_CHUNK_SIZE):
+        """
+        Generator form of search() for time-sliced callers: yields after every
+        `chunk_size` records scanned (or SEARCH_INDEX_CHUNK_SIZE filed, while
+        the index is built) and returns the match list. A scan is restarted if
+        the texts change between two steps.
+        """
+        term = term.lower()
+        texts = self._texts
+        limit = SEARCH_SHORT_TERM_HITS if 0 < len(term) <= SEARCH_SHORT_TERM else None
+        if limit is not None:
+            chunk_size = min(chunk_size, limit) # Stop soon after the limit instead of scanning a whole chunk
+        while True:
+            matches = self._recent.get(term)
+            if matches is not None:
+                return matches
+            if limit is None and self._words is None and any(len(piece) >= SEARCH_GRAM for piece in term.split()):
+                yield from self._build(min(chunk_size, SEARCH_INDEX_CHUNK_SIZE))
+            version = self._version
+            base = None
+            for previous, positions in self._recent.items():
+                if (previous in term and not search_capped(previous, len(positions))
+                        and (base is None or len(positions) < len(base))):
+                    base = positions
+            indexed = self._indexed(term) if limit is None and self._words is not None else None
+            if indexed is not None:
+                positions, exact = indexed
+                if exact:
+                    return self._remember(term, positions)
+                if base is None or len(positions) < len(base):
+                    base = positions
+            candidates = range(len(texts)) if base is None else base
+            matches = []
+            for start in range(0, len(candidates), chunk_size):
+                part = candidates[start:start + chunk_size]
+                part_texts = texts[start:start + chunk_size] if base is None else map(texts.__getitem__, part)
+                matches.extend(compress(part, map(operator.contains, part_texts, repeat(term))))
+                if limit is not None and len(matches) >= limit:
+                    del matches[limit:]
+                    break
+                yield
+                if self._version != version:
+                    matches = None # Positions moved under the scan; start over
+                    break
+            if matches is not None:
+                return self._remember(term, matches)
+
+class SortOrderCache:
+    """
+    Ascending sort orders of a list of records, one per column, built the
+    first time a column is asked for. Afterwards single records are added,
+    removed or re-keyed with a bisect instead of re-sorting the whole list.
+    Ties keep list order, as a stable sort would.
+    """
+    def __init__(self, records, key_funcs):
+        self._key_funcs = key_funcs
+        self._records = {id(record): (seq, record) for seq, record in enumerate(records)}
+        self._next_seq = len(self._records)
+        self._orders = {} # column -> parallel sorted keys, tie-break seqs and records
+        self._keys = {} # column -> {id(record): key the record is filed under}
+
+    def __len__(self):
+        return len(self._records)
+
+    def __contains__(self, record):
+        return id(record) in self._records
+
+    def order(self, column):
+        """Records sorted ascending by `column`; reverse it for a descending view."""
+        if column not in self._orders:
+            by_seq = sorted(self._records.values(), key=operator.itemgetter(0))
+            records = [record for _, record in by_seq]
+            keys = list(map(self._key_funcs[column], records))
+            permutation = sorted(range(len(records)), key=keys.__getitem__) # Stable, so ties stay in seq order
+            self._keys[column] = dict(zip(map(id, records), keys))
+            self._orders[column] = ([keys[i] for i in permutation], [by_seq[i][0] for i in permutation],
+                                    [records[i] for i in permutation])
+        return list(self._orders[column][2])
+
+    @staticmethod
+    def _position(keys, seqs, key, seq):
+        low = bisect.bisect_left(keys, key)
+        high = bisect.bisect_right(keys, key, low)
+        return bisect.bisect_left(seqs, seq, low, high)
+
+    def add(self, record, seq=None):
+        if seq is None:
+            seq = self._next_seq
+            self._next_seq += 1
+        self._records[id(record)] = (seq, record)
+        for column, (keys, seqs, ordered) in self._orders.items():
+            key = self._key_funcs[column](record)
+            self._keys[column][id(record)] = key
+            position = self._position(keys, seqs, key, seq)
+            keys.insert(position, key)
+            seqs.insert(position, seq)
+            ordered.insert(position, record)
+
+    def remove(self, record):
+        """Removes `record` and returns its tie-break sequence number."""
+        seq, _ = self._records.pop(id(record))
+        for column, (keys, seqs, ordered) in self._orders.items():
+            position = self._position(keys, seqs, self._keys[column].pop(id(record)), seq)
+            del keys[position]
+            del seqs[position]
+            del ordered[position]
+        return seq
+
+    def update(self, record, replaced=None):
+        """Re-files `record` after its sort keys changed, or in place of `replaced`."""
+        old = record if replaced is None else replaced
+        self.add(record, self.remove(old) if old in self else None)
+
+# Sort keys for the skill and inventory columns shown in the UI
+SKILL_SORT_KEYS = {
+    "Skill Name": lambda skill: skill.name.lower(),
+    "Level": lambda skill: skill.level,
+    "Current EXP": lambda skill: skill.exp,
+    "EXP to Next": lambda skill: get_exp_for_next_level(skill.level)
+}
+INVENTORY_SORT_KEYS = {
+    "Item Name": lambda item: item.name.lower(),
+    "Type": lambda item: item.item_type.lower(),
+    "Qty": lambda item: item.quantity
+}
+
+# --- Derived Stats ---
+# Each derived stat is (inputs, formula). An input is "level", a core attribute's base
+# score ("Constitution"), its score with equipment ("Constitution Total"), or another
+# derived stat; the formula receives the inputs' values in that order.
+DERIVED_STATS = {
+    "Health": (("Constitution",), lambda con: 100 + (con - 10) * 5),
+    "Mana": (("Intelligence",), lambda intelligence: 100 + (intelligence - 10) * 5),
+}
+DERIVED_STATS.update({f"{attr} Modifier": ((f"{attr} Total",), lambda total: (total - 10) // 2) for attr in CORE_ATTRIBUTES})
+
+class StatGraph:
+    """
+    Derived stat definitions compiled into dependency order, so a change to
+    one input only re-evaluates the stats downstream of it.
+    """
+    def __init__(self, definitions):
+        self.definitions = dict(definitions)
+        self.order = []
+        self._depends_on = {} # stat -> every input and stat it reads, directly or not
+        for name in self.definitions:
+            self._visit(name, ())
+
+    def _visit(self, name, path):
+        if name in self._depends_on:
+            return
+        if name in path:
+            raise ValueError(f"Derived stat '{name}' depends on itself: {' -> '.join(path + (name,))}")
+        depends_on = set()
+        for input_name in self.definitions[name][0]:
+            depends_on.add(input_name)
+            if input_name in self.definitions:
+                self._visit(input_name, path + (name,))
+                depends_on |= self._depends_on[input_name]
+        self._depends_on[name] = depends_on
+        self.order.append(name)
+
+    def affected_by(self, changed):
+        """Stats that read any of the `changed` names, in evaluation order."""
+        return [stat for stat in self.order if not self._depends_on[stat].isdisjoint(changed)]
+
+    def evaluate(self, read_input, values, stats=None):
+        """Evaluates `stats` (all of them by default) into `values`; read_input(name) supplies non-stat inputs."""
+        definitions = self.definitions
+        for stat in self.order if stats is None else stats:
+            inputs, formula = definitions[stat]
+            values[stat] = formula(*[values[name] if name in definitions else read_input(name) for name in inputs])
+        return values
+
+STAT_GRAPH = StatGraph(DERIVED_STATS)
+
+def set_derived_stats(definitions):
+    """Replaces the derived stat formulas (e.g. for a balance patch); characters re-evaluate on next use."""
+    global STAT_GRAPH
+    STAT_GRAPH = StatGraph(definitions)
+    return STAT_GRAPH
+
+class Character:
+    def __init__(self, name="", level=1, exp=0, skills=None, notes="", inventory=None, equipment=None, attributes=None):
+        self.name = name
+        self.level = level
+        self.exp = exp
+        self.skills = skills if skills is not None else []
+        self.notes = notes
+        self.inventory = inventory if inventory is not None else []
+        self.equipment = equipment if equipment is not None else {slot: None for slot in EQUIPMENT_SLOTS}
+        self.attributes = attributes if attributes is not None else {
+            "Strength": 10, "Dexterity": 10, "Constitution": 10,
+            "Intelligence": 10, "Wisdom": 10, "Charisma": 10
+        }
+        # Derived data, built on first use and never saved (see character_to_dict)
+        self._skill_search = None
+        self._inventory_search = None
+        self._skill_order = None
+        self._inventory_order = None
+        self._skill_records = None
+        self._inventory_records = None
+        self._equipment_bonus = None
+        self._derived = None # (StatGraph the values were computed with, {stat: value})
+
+    def snapshot(self):
+        """
+        A detached copy of everything that gets saved, so another thread can
+        serialize it while this character keeps changing.
+        """
+        def copy_item(item):
+            return Item(item.name, item.description, item.quantity, item.item_type, dict(item.effects)) if item else None
+
+        return Character(name=self.name, level=self.level, exp=self.exp, notes=self.notes,
+                         skills=[Skill(skill.name, skill.level, skill.exp) for skill in self.skills],
+                         inventory=[copy_item(item) for item in self.inventory],
+                         equipment={slot: copy_item(item) for slot, item in self.equipment.items()},
+                         attributes=dict(self.attributes))
+
+    # --- Search ---
+    def _search_text(self, collection, record):
+        # Fields are joined with a separator no search term contains, so matches never span two fields.
+        if collection is self.skills:
+            return record.name.lower()
+        return f"{record.name}\0{record.item_type}\0{record.description}".lower()
+
+    def record_matches(self, collection, record, term):
+        """Whether a skill or inventory item is among the search results for `term`."""
+        return term.lower() in self._search_text(collection, record)
+
+    def _search_index_for(self, collection):
+        if collection is self.skills:
+            if self._skill_search is None or len(self._skill_search) != len(self.skills):
+                self._skill_search = SearchIndex(self._search_text(self.skills, s) for s in self.skills)
+            return self._skill_search
+        if collection is self.inventory:
+            if self._inventory_search is None or len(self._inventory_search) != len(self.inventory):
+                self._inventory_search = SearchIndex(self._search_text(self.inventory, i) for i in self.inventory)
+            return self._inventory_search
+        return None
+
+    def _existing_search_index(self, collection):
+        if collection is self.skills:
+            return self._skill_search
+        if collection is self.inventory:
+            return self._inventory_search
+        return None
+
+    def _sort_cache_for(self, collection):
+        if collection is self.skills:
+            if self._skill_order is None or len(self._skill_order) != len(self.skills):
+                self._skill_order = SortOrderCache(self.skills, SKILL_SORT_KEYS)
+            return self._skill_order
+        if self._inventory_order is None or len(self._inventory_order) != len(self.inventory):
+            self._inventory_order = SortOrderCache(self.inventory, INVENTORY_SORT_KEYS)
+        return self._inventory_order
+
+    def _existing_sort_cache(self, collection):
+        if collection is self.skills:
+            return self._skill_order
+        if collection is self.inventory:
+            return self._inventory_order
+        return None
+
+    def _record_index_for(self, collection):
+        if collection is self.skills:
+            if self._skill_records is None or len(self._skill_records) != len(self.skills):
+                self._skill_records = RecordIndex(self.skills)
+            return self._skill_records
+        if self._inventory_records is None or len(self._inventory_records) != len(self.inventory):
+            self._inventory_records = RecordIndex(self.inventory)
+        return self._inventory_records
+
+    def _existing_record_index(self, collection):
+        if collection is self.skills:
+            return self._skill_records
+        if collection is self.inventory:
+            return self._inventory_records
+        return None
+
+    def skill_named(self, name):
+        """The skill called `name`, or None, without scanning the skill list."""
+        named = self._record_index_for(self.skills).named(name)
+        return named[0] if named else None
+
+    def items_named(self, name):
+        """Inventory items called `name`, in the order they were added."""
+        return self._record_index_for(self.inventory).named(name)
+
+    def record_for_uid(self, collection, uid):
+        """The skill or inventory item with this uid (e.g. a Treeview IID), or None if it is gone."""
+        return self._record_index_for(collection).get(uid)
+
+    def position_for_uid(self, collection, uid):
+        """The list position of the skill or inventory item with this uid, or None if it is gone."""
+        return self._record_index_for(collection).position(uid)
+
+    def index_record(self, collection, position, replaced=None):
+        """
+        Refreshes lookups, search text and sort keys of a skill or inventory item
+        after it was appended, changed in place, or put in place of `replaced` at `position`.
+        """
+        record = collection[position]
+        records = self._existing_record_index(collection)
+        if records is not None:
+            if replaced is not None:
+                records.replace(replaced, record)
+            else:
+                records.add(record)
+        index = self._existing_search_index(collection)
+        if index is not None:
+            index.set(position, self._search_text(collection, record))
+        order = self._existing_sort_cache(collection)
+        if order is not None:
+            order.update(record, replaced)
+
+    def unindex_record(self, collection, position):
+        """Drops a skill or inventory item from lookups, search and sorting; call before deleting it from `collection`."""
+        records = self._existing_record_index(collection)
+        if records is not None:
+            records.discard(collection[position])
+        index = self._existing_search_index(collection)
+        if index is not None:
+            index.delete(position)
+        order = self._existing_sort_cache(collection)
+        if order is not None and collection[position] in order:
+            order.remove(collection[position])
+
+    def refresh_sort_keys(self, collection, record):
+        """Re-files a record whose sort keys (but not its search text) changed, e.g. after EXP was applied."""
+        order = self._existing_sort_cache(collection)
+        if order is not None:
+            order.update(record)
+
+    def sorted_records(self, collection, column, reverse=False, term=""):
+        """
+        Skills or inventory items matching `term`, ordered by `column`. Orders
+        come from a per-column cache; a descending order is the ascending one reversed.
+        A capped search (see search_capped()) gives the first matches in this
+        order, not the first ones in list order.
+        """
+        key_funcs = SKILL_SORT_KEYS if collection is self.skills else INVENTORY_SORT_KEYS
+        matches = self.search_skills(term) if collection is self.skills else self.search_inventory(term)
+        if column not in key_funcs:
+            return matches
+        if search_capped(term, len(matches)):
+            # Matches are dense enough to fill the cap quickly, walking the column's order
+            order = self._sort_cache_for(collection).order(column)
+            walk = reversed(order) if reverse else order
+            return list(islice((record for record in walk if self.record_matches(collection, record, term)),
+                               SEARCH_SHORT_TERM_HITS))
+        if not term:
+            ordered = self._sort_cache_for(collection).order(column)
+        elif len(matches) * 8 < len(collection):
+            # Few matches: sorting them directly beats walking the whole cached order
+            ordered = sorted(matches, key=key_funcs[column])
+        else:
+            wanted = set(map(id, matches))
+            ordered = [record for record in self._sort_cache_for(collection).order(column) if id(record) in wanted]
+        if reverse:
+            ordered.reverse()
+        return ordered
+
+    def search_skills(self, term):
+        """Skills whose name contains `term`, in list order."""
+        if not term:
+            return list(self.skills)
+        return list(map(self.skills.__getitem__, self._search_index_for(self.skills).search(term)))
+
+    def search_inventory(self, term):
+        """Inventory items whose name, type or description contains `term`, in list order."""
+        if not term:
+            return list(self.inventory)
+        return list(map(self.inventory.__getitem__, self._search_index_for(self.inventory).search(term)))
+
+    def iter_search(self, collection, term):
+        """Time-sliceable search over skills or inventory; see SearchIndex.iter_search."""
+        return self._search_index_for(collection).iter_search(term)
+
+    # --- Derived Stats ---
+    def _stat_input(self, name):
+        if name == "level":
+            return self.level
+        if name.endswith(" Total"):
+            return self.get_total_attribute(name[:-len(" Total")])
+        return self.attributes.get(name, 0)
+
+    def derived_stats(self):
+        """Every derived stat's value, evaluated on first use and then kept current by refresh_stats()."""
+        if self._derived is None or self._derived[0] is not STAT_GRAPH:
+            self._derived = (STAT_GRAPH, STAT_GRAPH.evaluate(self._stat_input, {}))
+        return self._derived[1]
+
+    def get_stat(self, name):
+        return self.derived_stats()[name]
+
+    def refresh_stats(self, changed_inputs):
+        """Re-evaluates the derived stats that read any of `changed_inputs`; returns the stats whose value changed."""
+        affected = STAT_GRAPH.affected_by(set(changed_inputs))
+        if self._derived is None or self._derived[0] is not STAT_GRAPH:
+            return set(affected)
+        values = self._derived[1]
+        old_values = [values[stat] for stat in affected]
+        STAT_GRAPH.evaluate(self._stat_input, values, affected)
+        return {stat for stat, old in zip(affected, old_values) if values[stat] != old}
+
+    def set_attribute(self, attr_name, value):
+        """Sets a base attribute; returns the names of the inputs and derived stats whose value changed."""
+        if self.attributes.get(attr_name) == value:
+            return set()
+        self.attributes[attr_name] = value
+        changed = {attr_name, f"{attr_name} Total"}
+        return changed | self.refresh_stats(changed)
+
+    def get_health(self):
+        return self.get_stat("Health")
+
+    def get_mana(self):
+        return self.get_stat("Mana")
+
+    # --- Equipment ---
+    @staticmethod
+    def _add_effects(bonus, item, sign):
+        if item and hasattr(item, 'effects') and item.effects:
+            for attr, value in item.effects.items():
+                bonus[attr] = bonus.get(attr, 0) + sign * value
+
+    def equipment_bonuses(self):
+        """Summed effects of every equipped item, built on first use and kept current by equip()."""
+        if self._equipment_bonus is None:
+            bonus = {}
+            for item in self.equipment.values():
+                self._add_effects(bonus, item, 1)
+            self._equipment_bonus = bonus
+        return self._equipment_bonus
+
+    def equip(self, slot, item):
+        """Puts `item` (or None to empty it) in `slot` and returns the item it replaced."""
+        previous = self.equipment.get(slot)
+        self.equipment[slot] = item
+        if self._equipment_bonus is not None:
+            self._add_effects(self._equipment_bonus, previous, -1)
+            self._add_effects(self._equipment_bonus, item, 1)
+        touched = {}
+        self._add_effects(touched, previous, 1)
+        self._add_effects(touched, item, 1)
+        self.refresh_stats(f"{attr} Total" for attr in touched)
+        return previous
+
+    def unequip(self, slot):
+        return self.equip(slot, None)
+
+    def get_total_attribute(self, attr_name):
+        return self.attributes.get(attr_name, 0) + self.equipment_bonuses().get(attr_name, 0)
+
+    def get_attribute_modifier(self, attr_name):
+        """Calculates the attribute modifier based on the total score (e.g., D&D style)."""
+        stats = self.derived_stats()
+        if f"{attr_name} Modifier" in stats:
+            return stats[f"{attr_name} Modifier"]
+        total_score = self.get_total_attribute(attr_name)
+        return (total_score - 10) // 2
+
+    def get_exp_for_next_level(self, level):
+        return get_exp_for_next_level(level)
+
+    def add_exp(self, amount):
+        old_level = self.level
+        self.level, self.exp = resolve_level_gain(self.level, self.exp, amount)
+        if self.level != old_level:
+            self.refresh_stats(("level",))
+        return self.level > old_level
+
+    def remove_exp(self, amount):
+        old_level = self.level
+        self.level, self.exp = resolve_level_loss(self.level, self.exp, amount)
+        if self.level != old_level:
+            self.refresh_stats(("level",))
+        return self.level < old_level
+
+    def add_skill_exp(self, skill_index, amount):
+        if 0 <= skill_index < len(self.skills):
+            skill = self.skills[skill_index]
+            old_level = skill.level
+            skill.level, skill.exp = resolve_level_gain(old_level, skill.exp, amount)
+            self.refresh_sort_keys(self.skills, skill)
+            return skill.level > old_level, skill.level
+        return False, None
+
+    def remove_skill_exp(self, skill_index, amount):
+        if 0 <= skill_index < len(self.skills):
+            skill = self.skills[skill_index]
+            old_level = skill.level
+            skill.level, skill.exp = resolve_level_loss(old_level, skill.exp, amount)
+            self.refresh_sort_keys(self.skills, skill)
+            return skill.level < old_level, skill.level
+        return False, None
+
+    # --- Inventory ---
+    def add_item(self, item, stack=True):
+        """
+        Adds `item` to the inventory, merging it into an identical stack when
+        there is one. Returns the inventory entry now holding it.
+        """
+        if stack:
+            key = item_stack_key(item)
+            for existing in self.items_named(item.name):
+                if item_stack_key(existing) == key:
+                    existing.quantity += item.quantity
+                    self.refresh_sort_keys(self.inventory, existing)
+                    return existing
+        self.inventory.append(item)
+        self.index_record(self.inventory, len(self.inventory) - 1)
+        return item
+
+    def take_item(self, position, quantity=1):
+        """
+        Takes `quantity` of the inventory item at `position` and returns them
+        as an Item of their own; the entry is removed once its stack runs out.
+        """
+        item = self.inventory[position]
+        if item.quantity <= quantity:
+            self.unindex_record(self.inventory, position)
+            del self.inventory[position]
+            return item
+        item.quantity -= quantity
+        self.refresh_sort_keys(self.inventory, item)
+        return Item(item.name, item.description, quantity, item.item_type, dict(item.effects))
+
+    def compact_inventory(self):
+        """Merges identical inventory items into the first of each; returns how many entries were merged away."""
+        stacks = {}
+        compacted = []
+        for item in self.inventory:
+            stack = stacks.setdefault(item_stack_key(item), item)
+            if stack is item:
+                compacted.append(item)
+            else:
+                stack.quantity += item.quantity
+        merged = len(self.inventory) - len(compacted)
+        if merged:
+            self.inventory[:] = compacted
+            # Positions and quantities moved wholesale; rebuilt on next use
+            self._inventory_search = self._inventory_order = self._inventory_records = None
+        return merged
+
+    def add_skill(self, name):
+        if self.skill_named(name) is not None:
+            return False
+        self.skills.append(Skill(name))
+        self.index_record(self.skills, len(self.skills) - 1)
+        return True
+
+    def update_skill(self, index, **kwargs):
+        if 0 <= index < len(self.skills):
+            skill = self.skills[index]
+            for field, value in kwargs.items():
+                setattr(skill, field, value)
+            self.index_record(self.skills, index)
+            return True
+        return False
+
+    def remove_skill(self, index):
+        if 0 <= index < len(self.skills):
+            self.unindex_record(self.skills, index)
+            del self.skills[index]
+            return True
+        return False
+
+def _resolve_signed(level, exp, delta):
+    if delta >= 0:
+        return resolve_level_gain(level, exp, delta)
+    return resolve_level_loss(level, exp, -delta)
+
+def apply_exp_events(events):
+    """
+    Applies a batch of EXP events without going through the UI.
+
+    `events` is an iterable of (character, skill_name, delta) tuples, where
+    skill_name is None for the character's main level and delta is signed.
+    Deltas are summed per target and each target's level is resolved once
+    from the net delta. Returns one report dict per target, in the order the
+    targets first appeared; targets naming an unknown skill are reported with
+    levels of None and left untouched.
+    """
+    totals = {}
+    get_total = totals.get
+    for character, skill_name, delta in events:
+        key = (character, skill_name)
+        totals[key] = get_total(key, 0) + delta
+
+    report = []
+    for (character, skill_name), delta in totals.items():
+        if skill_name is None:
+            target = None
+            old_level, exp = character.level, character.exp
+        else:
+            target = character.skill_named(skill_name)
+            if target is None:
+                report.append({'character': character.name, 'skill': skill_name, 'delta': delta,
+                               'old_level': None, 'new_level': None, 'exp': None})
+                continue
+            old_level, exp = target.level, target.exp
+
+        new_level, exp = _resolve_signed(old_level, exp, delta)
+        if target is None:
+            character.level, character.exp = new_level, exp
+            if new_level != old_level:
+                character.refresh_stats(("level",))
+        else:
+            target.level, target.exp = new_level, exp
+            character.refresh_sort_keys(character.skills, target)
+        report.append({'character': character.name, 'skill': skill_name, 'delta': delta,
+                       'old_level': old_level, 'new_level': new_level, 'exp': exp})
+    return report
+
+def _stat_input_columns(characters):
+    """Reads one stat input (see Character._stat_input) for a whole roster, resolving what kind of input it is once."""
+    attributes = [char.attributes for char in characters]
+    bonuses = None
+
+    def column(name):
+        nonlocal bonuses
+        if name == "level":
+            return [char.level for char in characters]
+        if name.endswith(" Total"):
+            attr = name[:-len(" Total")]
+            if bonuses is None:
+                bonuses = [char.equipment_bonuses() for char in characters]
+            return [values.get(attr, 0) + bonus.get(attr, 0) for values, bonus in zip(attributes, bonuses)]
+        return [values.get(name, 0) for values in attributes]
+    return column
+
+def _evaluate_stat_column(formula, columns, count):
+    """
+    `formula` over whole input columns. Arithmetic formulas run once on NumPy
+    arrays; anything else (branches, min/max, type changes) runs per value.
+    """
+    if not columns:
+        return [formula()] * count
+    if np is not None and count > 1:
+        try:
+            result = formula(*map(np.asarray, columns))
+        except (TypeError, ValueError, ArithmeticError):
+            result = None
+        if isinstance(result, np.ndarray) and result.shape == (count,):
+            values = result.tolist()
+            first = formula(*[column[0] for column in columns]) # Catches e.g. round() giving floats on arrays
+            if type(values[0]) is type(first) and values[0] == first:
+                return values
+    return list(map(formula, *columns))
+
+def recompute_all_stats(characters, graph=None):
+    """
+    Evaluates every derived stat for a whole roster, one stat at a time
+    across all characters, and refreshes each character's cached values.
+    Meant for balance patches (see set_derived_stats). Returns a dict of
+    stat -> list of values in `characters` order.
+    """
+    graph = graph or STAT_GRAPH
+    characters = list(characters)
+    read_column = _stat_input_columns(characters)
+    columns = {}
+
+    def column(name):
+        if name not in columns:
+            columns[name] = read_column(name)
+        return columns[name]
+
+    for stat in graph.order:
+        inputs, formula = graph.definitions[stat]
+        columns[stat] = _evaluate_stat_column(formula, [column(name) for name in inputs], len(characters))
+    stat_columns = {stat: columns[stat] for stat in graph.order}
+    for char, values in zip(characters, zip(*stat_columns.values())):
+        char._derived = (graph, dict(zip(stat_columns, values)))
+    return stat_columns
+
+def compact_inventories(characters):
+    """Runs compact_inventory() on every character; returns {name: entries merged} for those that changed."""
+    report = {}
+    for char in characters:
+        merged = char.compact_inventory()
+        if merged:
+            report[char.name] = merged
+    return report
+
+class SkillLevelArrays:
+    """
+    Skill levels and EXP for many skills held in parallel arrays, so EXP
+    deltas and curve rebalances can be applied to a whole roster at once.
+    Uses NumPy when it is installed and the scalar leveling engine otherwise.
+    Call write_back() to copy the results into the Skill records.
+    """
+    def __init__(self, skills, characters=()):
+        self.skills = list(skills)
+        self.characters = list(characters) # Owners whose cached skill orders write_back() invalidates
+        levels = [s.level for s in self.skills]
+        exps = [s.exp for s in self.skills]
+        if np is not None:
+            self.levels = np.array(levels, dtype=np.int64)
+            self.exps = np.array(exps, dtype=np.int64)
+        else:
+            self.levels, self.exps = levels, exps
+
+    @classmethod
+    def from_characters(cls, characters):
+        characters = list(characters)
+        return cls((skill for char in characters for skill in char.skills), characters)
+
+    def __len__(self):
+        return len(self.skills)
+
+    def apply_exp(self, deltas):
+        """Applies one signed EXP delta per skill."""
+        if np is None:
+            for i, delta in enumerate(deltas):
+                self.levels[i], self.exps[i] = _resolve_signed(self.levels[i], self.exps[i], delta)
+            return
+        deltas = np.asarray(deltas, dtype=np.int64)
+        cumulative = np.asarray(CUMULATIVE_EXP_TABLE, dtype=np.int64)
+        levels, exps = self.levels, self.exps
+
+        in_table = (levels >= 1) & (levels <= MAX_LEVEL)
+        safe_levels = np.where(in_table, levels, 1)
+        totals = cumulative[safe_levels] + exps + deltas
+        found = np.searchsorted(cumulative, totals, side='right') - 1
+        gaining = deltas >= 0
+        new_levels = np.where(gaining, np.maximum(found, safe_levels), np.minimum(found, safe_levels))
+        # Losses that stay within the current level keep it, matching resolve_level_loss.
+        new_levels = np.where(~gaining & (exps + deltas >= 0), safe_levels, new_levels)
+        new_levels = np.clip(new_levels, 1, MAX_LEVEL)
+        new_exps = totals - cumulative[new_levels]
+        new_exps = np.where(~gaining & (totals < 0), 0, new_exps)
+
+        self.levels = np.where(in_table, new_levels, levels)
+        self.exps = np.where(in_table, new_exps, exps)
+        for i in np.flatnonzero(~in_table).tolist():
+            self.levels[i], self.exps[i] = _resolve_signed(int(levels[i]), int(exps[i]), int(deltas[i]))
+
+    def rebalance(self, old_exp_table):
+        """Re-levels every skill from the EXP it had earned under `old_exp_table` against the current EXP_TABLE."""
+        old_cumulative = generate_cumulative_exp_table(old_exp_table)
+        top = len(old_cumulative) - 1
+        if np is None:
+            earned = [old_cumulative[min(max(lvl, 1), top)] + exp for lvl, exp in zip(self.levels, self.exps)]
+            self.levels, self.exps = [1] * len(earned), [0] * len(earned)
+        else:
+            old_cumulative = np.asarray(old_cumulative, dtype=np.int64)
+            earned = old_cumulative[np.clip(self.levels, 1, top)] + self.exps
+            self.levels = np.ones_like(self.levels)
+            self.exps = np.zeros_like(self.exps)
+        self.apply_exp(earned)
+
+    def write_back(self):
+        levels = self.levels.tolist() if np is not None else self.levels
+        exps = self.exps.tolist() if np is not None else self.exps
+        for skill, level, exp in zip(self.skills, levels, exps):
+            skill.level = level
+            skill.exp = exp
+        for char in self.characters:
+            char._skill_order = None # Rebuilt on next use; cheaper than re-filing every skill
+
+# --- Persistence Layer ---
+def item_to_dict(item):
+    return {'name': item.name, 'description': item.description, 'quantity': item.quantity,
+            'item_type': item.item_type, 'effects': dict(item.effects)}
+
+def skill_to_dict(skill):
+    return {'name': skill.name, 'level': skill.level, 'exp': skill.exp}
+
+def character_to_dict(char):
+    char_dict = {key: value for key, value in char.__dict__.items() if not key.startswith('_')}
+    char_dict['skills'] = [skill_to_dict(skill) for skill in char.skills]
+    char_dict['inventory'] = [item_to_dict(item) for item in char.inventory]
+    char_dict['equipment'] = {slot: item_to_dict(item) if item else None for slot, item in char.equipment.items()}
+    return char_dict
+
+def character_from_dict(char_data):
+    char_data = dict(char_data)
+    char_data['skills'] = [Skill(**skill_data) for skill_data in char_data.get('skills', [])]
+    inventory = [Item(**item_data) for item_data in char_data.get('inventory', [])]
+    equipment_data = char_data.get('equipment', {})
+    equipment = {slot: Item(**item_data) if item_data else None for slot, item_data in equipment_data.items()}
+    for slot in EQUIPMENT_SLOTS:
+        if slot not in equipment:
+            equipment[slot] = None
+
+    char_data['inventory'] = inventory
+    char_data['equipment'] = equipment
+    return Character(**char_data)
+
+GZIP_MAGIC = b"\x1f\x8b"
+# Everything reading a (possibly compressed) save file can raise
+LOAD_ERRORS = (IOError, EOFError, zlib.error, json.JSONDecodeError)
+
+class SaveError(Exception):
+    """Raised by a persistence manager's save(); the message says what could not be written where."""
+
+def _print_error(title, message):
+    print(f"{title}: {message}", file=sys.stderr)
+
+_error_reporter = _print_error
+
+def set_error_reporter(reporter):
+    """
+    Routes the problems load() recovers from (it falls back to empty or
+    default data) to reporter(title, message). Defaults to stderr; the
+    desktop app shows a message box.
+    """
+    global _error_reporter
+    _error_reporter = reporter
+
+def report_error(title, message):
+    _error_reporter(title, message)
+
+def dump_save_json(data, save_format):
+    if save_format == "pretty":
+        return json.dumps(data, indent=4)
+    return json.dumps(data, separators=(',', ':'))
+
+def encode_save(text, save_format):
+    """What write_atomic() should store for `text` in `save_format`: the text itself, or gzip bytes."""
+    if save_format == "gzip":
+        return gzip.compress(text.encode('utf-8'), compresslevel=GZIP_LEVEL, mtime=0)
+    return text
+
+def is_gzip_file(f):
+    """Checks a binary file for the gzip magic bytes and rewinds it."""
+    magic = f.read(len(GZIP_MAGIC))
+    f.seek(0)
+    return magic == GZIP_MAGIC
+
+def open_save_file(filepath):
+    """Opens a save file of any SAVE_FORMATS for binary reading; gzip files are decompressed transparently."""
+    f = open(filepath, 'rb')
+    if is_gzip_file(f):
+        f.close()
+        return gzip.open(filepath, 'rb')
+    return f
+
+def write_atomic(filepath, text):
+    """
+    Writes text (or bytes) to a temp file in the same directory and swaps it
+    in, so a failed save never truncates the old file.
+    """
+    directory = os.path.dirname(os.path.abspath(filepath))
+    fd, temp_path = tempfile.mkstemp(prefix=".save-", suffix=".tmp", dir=directory)
+    try:
+        with (os.fdopen(fd, 'wb') if isinstance(text, bytes) else os.fdopen(fd, 'w', encoding='utf-8')) as f:
+            f.write(text)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, filepath)
+    except BaseException:
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+        raise
+
+class SaveFileStream:
+    """
+    Reads a v6 save file (any of SAVE_FORMATS) incrementally. Iterating
+    yields (name, Character) pairs as the file is read in chunks, so only
+    one character's parsed dict is alive at a time instead of the whole
+    file's tree. `theme` and `active_character` are set as they are read;
+    the writer puts them before the characters. progress(bytes_read,
+    total_bytes) is called after every chunk, counting bytes on disk.
+    Malformed files raise json.JSONDecodeError. Once iterated, `spans`
+    maps each name to the (offset, size) of its JSON in the uncompressed
+    text, or is None if the text isn't ASCII (offsets wouldn't be bytes).
+    """
+    def __init__(self, filepath, progress=None, chunk_size=LOAD_CHUNK_SIZE):
+        self.filepath = filepath
+        self.progress = progress
+        self.chunk_size = chunk_size
+        self.theme = "dark"
+        self.active_character = None
+        self.spans = None
+        self._decoder = json.JSONDecoder()
+
+    def __iter__(self):
+        with open(self.filepath, 'rb') as raw:
+            self._raw = raw
+            self._file = gzip.GzipFile(fileobj=raw, mode='rb') if is_gzip_file(raw) else raw
+            self._total = os.fstat(raw.fileno()).st_size
+            self._text_decoder = codecs.getincrementaldecoder('utf-8')()
+            self._buffer = ""
+            self._pos = 0
+            self._consumed = 0 # Characters dropped from the front of the buffer
+            self._ascii = True
+            self._spans = {}
+            self._eof = False
+            try:
+                yield from self._parse_root()
+                self.spans = self._spans if self._ascii else None
+            finally:
+                self._file.close()
+                self._raw = self._file = self._buffer = None
+
+    # --- Buffer ---
+    def _fill(self, wanted):
+        """Reads until `wanted` unparsed characters are buffered or the file ends; returns whether they are."""
+        if self._pos > self.chunk_size:
+            self._buffer = self._buffer[self._pos:]
+            self._consumed += self._pos
+            self._pos = 0
+        while len(self._buffer) - self._pos < wanted and not self._eof:
+            data = self._file.read(self.chunk_size)
+            self._eof = not data
+            self._ascii = self._ascii and data.isascii()
+            self._buffer += self._text_decoder.decode(data, final=self._eof)
+            if self.progress:
+                self.progress(self._raw.tell(), self._total)
+        return len(self._buffer) - self._pos >= wanted
+
+    def _error(self, message):
+        return json.JSONDecodeError(message, self._buffer, self._pos)
+
+    def _next_char(self):
+        """Skips whitespace and returns the next character without consuming it ('' at the end)."""
+        while True:
+            while self._pos < len(self._buffer) and self._buffer[self._pos] in " \t\r\n":
+                self._pos += 1
+            if self._pos < len(self._buffer) or not self._fill(1):
+                return self._buffer[self._pos:self._pos + 1]
+
+    def _expect(self, chars):
+        char = self._next_char()
+        if not char or char not in chars:
+            raise self._error(f"Expected one of {chars!r}")
+        self._pos += 1
+        return char
+
+    def _value(self):
+        """Decodes one JSON value, reading more of the file while it is incomplete."""
+        self._next_char()
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self._buffer, self._pos)
+            except json.JSONDecodeError:
+                if self._eof:
+                    raise
+                # Grow geometrically, so a large value is re-tried O(log n) times
+                self._fill(max(self.chunk_size, 2 * (len(self._buffer) - self._pos)))
+                continue
+            if end == len(self._buffer) and not self._eof and not isinstance(value, (dict, list, str)):
+                self._fill(len(self._buffer) - self._pos + 1) # A number may continue in the next chunk
+                continue
+            self._pos = end
+            return value
+
+    # --- Structure ---
+    def _members(self):
+        """Yields the keys of the object starting at the cursor, leaving the cursor on each value."""
+        self._expect("{")
+        if self._next_char() == "}":
+            self._pos += 1
+            return
+        while True:
+            key = self._value()
+            if not isinstance(key, str):
+                raise self._error("Expected an object key")
+            self._expect(":")
+            yield key
+            if self._expect(",}") == "}":
+                return
+
+    def _parse_root(self):
+        for key in self._members():
+            if key == "characters":
+                for name in self._members():
+                    self._next_char()
+                    start = self._consumed + self._pos
+                    value = self._value()
+                    self._spans[name] = (start, self._consumed + self._pos - start)
+                    yield name, character_from_dict(value)
+            elif key == "theme":
+                self.theme = self._value()
+            elif key == "active_character":
+                self.active_character = self._value()
+            else:
+                self._value()
+        if self._next_char():
+            raise self._error("Extra data after the save file")
+
+class RosterSnapshot:
+    """
+    A binary index written next to a v6 save file: fixed-width records with
+    each character's level, EXP, core attributes and skills, a string table
+    for names, and where each character's JSON sits in the save file. It is
+    read through mmap, so the character selector and cross-roster queries
+    never parse JSON. The save file stays the source of truth: open() rejects
+    a snapshot whose CRC32 fails or whose recorded save file size and mtime
+    no longer match.
+
+    Layout: header, character records, skill records, string table, settings
+    JSON. Each character's strings form one block (its name, then its skill
+    names) that its skill records point into relatively, so an unchanged
+    character's bytes can be copied as-is into the next snapshot.
+    """
+    MAGIC = b"CTSNAP01"
+    # magic, characters, skills, string table size, settings size, save file size, save file mtime (ns), CRC32 of the rest
+    HEADER = struct.Struct("<8sQQQQqqI")
+    # strings offset, strings size, name size, level, exp, CORE_ATTRIBUTES..., first skill, skill count, JSON offset, JSON size
+    CHARACTER = struct.Struct(f"<QIIiq{len(CORE_ATTRIBUTES)}iQIqq")
+    # name offset within the character's strings, name size, level, exp
+    SKILL = struct.Struct("<IIiq")
+
+    def __init__(self, data, header):
+        self._data = data
+        _, self.character_count, self.skill_count, strings_size, settings_size, _, _, _ = header
+        self._skills_start = self.HEADER.size + self.character_count * self.CHARACTER.size
+        self._strings_start = self._skills_start + self.skill_count * self.SKILL.size
+        settings_start = self._strings_start + strings_size
+        settings = json.loads(data[settings_start:settings_start + settings_size])
+        self.theme = settings.get("theme", "dark")
+        self.active_character = settings.get("active_character")
+        self._names = None
+        self._index = None # Name -> record number, built with _names
+
+    @classmethod
+    def open(cls, path, source_path):
+        """The snapshot at `path` if it is intact and matches source_path as it is now, else None."""
+        try:
+            stat = os.stat(source_path)
+            with open(path, 'rb') as f:
+                data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError): # ValueError: an empty file can't be mapped
+            return None
+        try:
+            header = cls.HEADER.unpack_from(data)
+            magic, characters, skills, strings_size, settings_size, source_size, source_mtime, crc = header
+            size = (cls.HEADER.size + characters * cls.CHARACTER.size + skills * cls.SKILL.size
+                     + strings_size + settings_size)
+            if (magic == cls.MAGIC and size == len(data)
+                    and (source_size, source_mtime) == (stat.st_size, stat.st_mtime_ns)):
+                with memoryview(data) as view, view[cls.HEADER.size:] as body:
+                    intact = zlib.crc32(body) == crc
+                if intact:
+                    return cls(data, header)
+        except (struct.error, ValueError):
+            pass
+        data.close()
+        return None
+
+    @classmethod
+    def character_parts(cls, name, char):
+        """
+        The position-independent pieces of one character's entry:
+        (record fields, packed skill records, string block).
+        """
+        name_bytes = name.encode('utf-8')
+        strings = [name_bytes]
+        skills = []
+        offset = len(name_bytes)
+        for skill in char.skills:
+            skill_name = skill.name.encode('utf-8')
+            skills.append(cls.SKILL.pack(offset, len(skill_name), skill.level, skill.exp))
+            strings.append(skill_name)
+            offset += len(skill_name)
+        fields = (len(name_bytes), char.level, char.exp, *(char.attributes.get(attr, 0) for attr in CORE_ATTRIBUTES))
+        return fields, b"".join(skills), b"".join(strings)
+
+    @classmethod
+    def write(cls, path, entries, settings, source_path):
+        """
+        Writes a snapshot of `entries`, (character_parts(), json_offset,
+        json_size) tuples in save order, stamped with the current size and
+        mtime of source_path. Raises struct.error for values that don't fit.
+        """
+        records, skill_chunks, string_chunks = [], [], []
+        first_skill = strings_offset = 0
+        for (fields, skill_bytes, string_bytes), json_offset, json_size in entries:
+            skill_count = len(skill_bytes) // cls.SKILL.size
+            records.append(cls.CHARACTER.pack(strings_offset, len(string_bytes), *fields,
+                                              first_skill, skill_count, json_offset, json_size))
+            skill_chunks.append(skill_bytes)
+            string_chunks.append(string_bytes)
+            first_skill += skill_count
+            strings_offset += len(string_bytes)
+        settings_bytes = json.dumps(settings).encode('utf-8')
+        sections = records + skill_chunks + string_chunks + [settings_bytes]
+        crc = 0
+        for chunk in sections:
+            crc = zlib.crc32(chunk, crc)
+        stat = os.stat(source_path)
+        header = cls.HEADER.pack(cls.MAGIC, len(records), first_skill, strings_offset, len(settings_bytes),
+                                 stat.st_size, stat.st_mtime_ns, crc)
+        write_atomic(path, b"".join([header] + sections))
+
+    def close(self):
+        self._data.close()
+
+    def is_current(self, source_path):
+        """Whether source_path still has the size and mtime this snapshot was written against."""
+        _, _, _, _, _, source_size, source_mtime, _ = self.HEADER.unpack_from(self._data)
+        try:
+            stat = os.stat(source_path)
+        except OSError:
+            return False
+        return (source_size, source_mtime) == (stat.st_size, stat.st_mtime_ns)
+
+    @property
+    def has_spans(self):
+        """Whether characters can be read from the save file by offset (it isn't gzip-compressed)."""
+        return self.character_count == 0 or self._record_at(0)[-1] > 0
+
+    def _record_at(self, number):
+        return self.CHARACTER.unpack_from(self._data, self.HEADER.size + number * self.CHARACTER.size)
+
+    def _record(self, name):
+        if self._index is None:
+            self.names()
+        return self._record_at(self._index[name])
+
+    def _string(self, offset, size):
+        start = self._strings_start + offset
+        return self._data[start:start + size].decode('utf-8')
+
+    def _records(self):
+        return self.CHARACTER.iter_unpack(self._data[self.HEADER.size:self._skills_start])
+
+    def names(self):
+        """Every character name, in save order."""
+        if self._names is None:
+            self._names = [self._string(record[0], record[2]) for record in self._records()]
+            self._index = {name: number for number, name in enumerate(self._names)}
+        return self._names
+
+    def stats(self, name):
+        record = self._record(name)
+        return {'level': record[3], 'exp': record[4], 'attributes': dict(zip(CORE_ATTRIBUTES, record[5:-4]))}
+
+    def skills(self, name):
+        """(skill name, level, exp) for each of a character's skills."""
+        record = self._record(name)
+        start = self._skills_start + record[-4] * self.SKILL.size
+        chunk = self._data[start:start + record[-3] * self.SKILL.size]
+        return [(self._string(record[0] + offset, size), level, exp)
+                for offset, size, level, exp in self.SKILL.iter_unpack(chunk)]
+
+    def json_span(self, name):
+        """(offset, size) of a character's JSON object in the save file; size is 0 for gzip saves."""
+        record = self._record(name)
+        return record[-2], record[-1]
+
+    def parts(self, name):
+        """character_parts() for `name`, copied out of the snapshot."""
+        record = self._record(name)
+        skills_start = self._skills_start + record[-4] * self.SKILL.size
+        strings_start = self._strings_start + record[0]
+        return (record[2:-4], self._data[skills_start:skills_start + record[-3] * self.SKILL.size],
+                self._data[strings_start:strings_start + record[1]])
+
+    def top_skills(self, limit=10, skill_name=None):
+        """(character name, skill name, level, exp) rows for the highest skills, optionally for one skill."""
+        data, strings_start = self._data, self._strings_start
+        needle = None if skill_name is None else skill_name.encode('utf-8')
+
+        def candidates():
+            skills = self.SKILL.iter_unpack(data[self._skills_start:strings_start])
+            for number, record in enumerate(self._records()):
+                for offset, size, level, exp in islice(skills, record[-3]):
+                    offset += record[0]
+                    if needle is None or data[strings_start + offset:strings_start + offset + size] == needle:
+                        yield level, exp, number, offset, size
+
+        names = self.names()
+        return [(names[number], self._string(offset, size), level, exp)
+                for level, exp, number, offset, size in heapq.nlargest(limit, candidates(), key=operator.itemgetter(0, 1))]
+
+class PersistenceManager:
+    def __init__(self, filepath, save_format="pretty", snapshot_path=None):
+        if save_format not in SAVE_FORMATS:
+            raise ValueError(f"Unknown save format '{save_format}'")
+        self.filepath = filepath
+        self.save_format = save_format
+        self.snapshot_path = snapshot_path
+        # Serialized JSON text per character name, reused by incremental saves.
+        self._fragments = {}
+        # RosterSnapshot.character_parts() per character name, reused the same way.
+        self._snapshot_parts = {}
+        self._snapshot = None # The open RosterSnapshot matching the save file, if any
+        # Held by save() and lazy loads, so a background save never races a roster lookup.
+        self._lock = threading.RLock()
+
+    def _character_fragment(self, char):
+        if self.save_format != "pretty":
+            return dump_save_json(character_to_dict(char), self.save_format)
+        # Indented to sit at the "characters" nesting level of the save file.
+        return json.dumps(character_to_dict(char), indent=4).replace("\n", "\n        ")
+
+    def _document(self, fragments, theme_name, active_char_name):
+        """
+        The whole save file text, byte-identical to dump_save_json() of the
+        full data, and each fragment's (offset, size) within it. json.dumps()
+        escapes non-ASCII, so offsets in the text are also byte offsets.
+        """
+        theme_json, active_json = json.dumps(theme_name), json.dumps(active_char_name)
+        if self.save_format != "pretty":
+            head = f"{{\"theme\":{theme_json},\"active_character\":{active_json},\"characters\":{{"
+            first, key_separator, separator, tail, empty_tail = "", ":", ",", "}}", "}}"
+        else:
+            head = f"{{\n    \"theme\": {theme_json},\n    \"active_character\": {active_json},\n    \"characters\": {{"
+            first, key_separator, separator, tail, empty_tail = "\n        ", ": ", ",\n        ", "\n    }\n}", "}\n}"
+
+        pieces = [head]
+        spans = {}
+        position = len(head)
+        for name, fragment in fragments.items():
+            key = (separator if spans else first) + json.dumps(name) + key_separator
+            position += len(key)
+            spans[name] = (position, len(fragment))
+            position += len(fragment)
+            pieces += (key, fragment)
+        pieces.append(tail if spans else empty_tail)
+        return "".join(pieces), spans
+
+    def save(self, characters, theme_name, active_char_name, dirty=None):
+        """
+        Writes the save file atomically, then its snapshot if enabled. When
+        `dirty` is given, only those characters (and any not serialized
+        before) are re-serialized; all others reuse the text from the
+        previous save. Characters a snapshot-backed roster never loaded are
+        copied from the current save file without being parsed. Raises
+        SaveError when the save file can't be written.
+        """
+        with self._lock:
+            roster = characters if isinstance(characters, CharacterRoster) else None
+            fragments, parts, unread = {}, {}, []
+            for name in characters:
+                if (roster is not None and not roster.is_loaded(name)
+                        and (name in self._fragments or self._snapshot is not None)):
+                    if name not in self._fragments:
+                        unread.append(name)
+                    part = self._snapshot_parts.get(name)
+                else:
+                    char = characters[name]
+                    fragment = self._fragments.get(name)
+                    part = self._snapshot_parts.get(name)
+                    if fragment is None or dirty is None or name in dirty:
+                        fragment, part = self._character_fragment(char), None
+                    fragments[name] = fragment
+                    if part is None and self.snapshot_path:
+                        part = RosterSnapshot.character_parts(name, char)
+                parts[name] = part
+
+            try:
+                if unread:
+                    self._read_spans(unread)
+                for name in characters:
+                    if name not in fragments:
+                        fragments[name] = self._fragments[name]
+                        if parts[name] is None and self.snapshot_path:
+                            parts[name] = self._snapshot.parts(name)
+                text, spans = self._document(fragments, theme_name, active_char_name)
+                if self._snapshot is not None:
+                    self._snapshot.close() # A mapped file can't be replaced on Windows
+                    self._snapshot = None
+                write_atomic(self.filepath, encode_save(text, self.save_format))
+            except IOError as e:
+                if self.snapshot_path and self._snapshot is None:
+                    # write_atomic() left the old save file in place, so its snapshot still holds.
+                    self._snapshot = RosterSnapshot.open(self.snapshot_path, self.filepath)
+                raise SaveError(f"Failed to save data to {self.filepath}\n{e}") from e
+            self._fragments = fragments
+            self._snapshot_parts = parts if self.snapshot_path else {}
+            if self.snapshot_path:
+                self._write_snapshot(spans, theme_name, active_char_name)
+
+    def _read_spans(self, names):
+        """Caches the save file text of characters a lazy roster never loaded, read by their snapshot offsets."""
+        if not self._snapshot.is_current(self.filepath):
+            raise IOError(f"{self.filepath} changed on disk since it was loaded")
+        with open(self.filepath, 'rb') as f:
+            for name in names:
+                offset, size = self._snapshot.json_span(name)
+                f.seek(offset)
+                self._fragments[name] = f.read(size).decode('utf-8')
+
+    def _write_snapshot(self, spans, theme_name, active_char_name):
+        if self.save_format == "gzip":
+            spans = dict.fromkeys(spans, (0, 0)) # Offsets into the uncompressed text are no use for seeking
+        entries = [(self._snapshot_parts[name], *span) for name, span in spans.items()]
+        settings = {"theme": theme_name, "active_character": active_char_name}
+        try:
+            RosterSnapshot.write(self.snapshot_path, entries, settings, self.filepath)
+        except (IOError, struct.error):
+            # The snapshot is only an accelerator; the stale one fails open()'s check on the next load.
+            return
+        self._snapshot = RosterSnapshot.open(self.snapshot_path, self.filepath)
+
+    def stream(self, progress=None):
+        """A SaveFileStream over the save file, for callers that want characters one at a time."""
+        return SaveFileStream(self.filepath, progress)
+
+    def load(self, progress=None, on_character=None):
+        """
+        Loads the save file. With an up-to-date snapshot of an uncompressed
+        save this returns a CharacterRoster that parses each character's
+        span of the file on first use, and neither callback fires.
+        Otherwise the file is streamed one character at a time:
+        on_character(char) is called as each character is built,
+        progress(bytes_read, total_bytes) as the file is read, and a missing
+        or stale snapshot is rebuilt from the spans the stream parsed. The
+        save file itself is never written here.
+        """
+        if not os.path.exists(self.filepath):
+            return {}, "dark", None
+        if self.snapshot_path:
+            if self._snapshot is not None:
+                self._snapshot.close()
+            self._fragments, self._snapshot_parts = {}, {}
+            self._snapshot = RosterSnapshot.open(self.snapshot_path, self.filepath)
+            if self._snapshot is not None and self._snapshot.has_spans:
+                roster = CharacterRoster(self._snapshot.names(), self._load_character)
+                return roster, self._snapshot.theme, self._snapshot.active_character
+        try:
+            stream = self.stream(progress)
+            characters = {}
+            for name, char in stream:
+                characters[name] = char
+                if on_character:
+                    on_character(char)
+        except LOAD_ERRORS as e:
+            report_error("Load Error", f"Failed to load data from {self.filepath}\n{e}")
+            return {}, "dark", None
+        if self.snapshot_path and self._snapshot is None and stream.spans is not None:
+            with self._lock:
+                self._snapshot_parts = {name: RosterSnapshot.character_parts(name, char)
+                                        for name, char in characters.items()}
+                self._write_snapshot(stream.spans, stream.theme, stream.active_character)
+        return characters, stream.theme, stream.active_character
+
+    def has_stored(self, name):
+        """Whether `name` has text from the last save, which save() reuses if a roster hands it over unloaded."""
+        return name in self._fragments
+
+    def _load_character(self, name):
+        """CharacterRoster loader: parses one character's span of the save file."""
+        try:
+            with self._lock:
+                if name not in self._fragments:
+                    self._read_spans([name])
+                fragment = self._fragments[name]
+            return character_from_dict(json.loads(fragment))
+        except LOAD_ERRORS + (UnicodeDecodeError,) as e:
+            report_error("Load Error", f"Failed to load '{name}' from {self.filepath}\n{e}")
+            return Character(name=name)
+
+    def top_skills(self, limit=10, skill_name=None):
+        """
+        Same rows as SQLitePersistenceManager.top_skills(), read from the
+        snapshot as of the last save; None when there is no snapshot.
+        """
+        if self._snapshot is None:
+            return None
+        return self._snapshot.top_skills(limit, skill_name)
+
+class CharacterRoster(MutableMapping):
+    """
+    A name -> Character mapping that knows every character name up front but
+    only builds a Character the first time it is looked up. Membership tests,
+    iteration and len() never trigger a load.
+    """
+    def __init__(self, names, loader):
+        self._names = dict.fromkeys(names)
+        self._loaded = {}
+        self._loader = loader
+
+    def __getitem__(self, name):
+        if name not in self._names:
+            raise KeyError(name)
+        char = self._loaded.get(name)
+        if char is None:
+            char = self._loaded[name] = self._loader(name)
+        return char
+
+    def __setitem__(self, name, char):
+        self._names[name] = None
+        self._loaded[name] = char
+
+    def __delitem__(self, name):
+        del self._names[name]
+        self._loaded.pop(name, None)
+
+    def __contains__(self, name):
+        return name in self._names
+
+    def __iter__(self):
+        return iter(self._names)
+
+    def __len__(self):
+        return len(self._names)
+
+    def is_loaded(self, name):
+        return name in self._loaded
+
+    def loaded_items(self):
+        return self._loaded.items()
+
+    def detached(self, convert):
+        """
+        A roster with the same names and loader whose loaded characters are
+        convert(name, char); those it returns None for are left unloaded.
+        """
+        roster = CharacterRoster(self._names, self._loader)
+        for name, char in self._loaded.items():
+            copy = convert(name, char)
+            if copy is not None:
+                roster._loaded[name] = copy
+        return roster
+
+class ShardedPersistenceManager:
+    """
+    Stores a small index file (theme, active character, character names) plus
+    one JSON file per character, and loads characters lazily through a
+    CharacterRoster. Migrates a v6 single-file save on first load.
+    """
+    INDEX_FILE = "index.json"
+    FORMAT_VERSION = 7
+
+    def __init__(self, directory, legacy_filepath=None, save_format="pretty"):
+        if save_format not in SAVE_FORMATS:
+            raise ValueError(f"Unknown save format '{save_format}'")
+        self.directory = directory
+        self.legacy_filepath = legacy_filepath
+        self.save_format = save_format
+        self.index_path = os.path.join(directory, self.INDEX_FILE)
+        self._files = {} # Character name -> shard file name, as recorded in the index
+        self._lock = threading.RLock() # Held by save() and lazy loads, which may run on different threads
+
+    def _shard_filename(self, name):
+        slug = re.sub(r'[^A-Za-z0-9_-]+', '_', name).strip('_')[:40] or "character"
+        digest = hashlib.sha1(name.encode('utf-8')).hexdigest()[:10]
+        return f"{slug}-{digest}.json"
+
+    def has_stored(self, name):
+        """Whether `name` has a shard, which save() leaves in place if a roster hands it over unloaded."""
+        return name in self._files
+
+    def _load_character(self, name):
+        with self._lock:
+            shard_path = os.path.join(self.directory, self._files[name])
+        try:
+            with open_save_file(shard_path) as f:
+                return character_from_dict(json.load(f))
+        except LOAD_ERRORS as e:
+            report_error("Load Error", f"Failed to load '{name}' from {shard_path}\n{e}")
+            return Character(name=name)
+
+    def save(self, characters, theme_name, active_char_name, dirty=None):
+        """
+        Writes the shards of changed characters and then the index. Characters
+        a CharacterRoster never loaded are left untouched on disk. Raises
+        SaveError when a file can't be written.
+        """
+        with self._lock:
+            if isinstance(characters, CharacterRoster):
+                loaded = characters.loaded_items()
+            else:
+                loaded = characters.items()
+            files = {name: self._files.get(name) or self._shard_filename(name) for name in characters}
+
+            try:
+                os.makedirs(self.directory, exist_ok=True)
+                for name, char in loaded:
+                    if dirty is None or name in dirty or name not in self._files:
+                        text = dump_save_json(character_to_dict(char), self.save_format)
+                        write_atomic(os.path.join(self.directory, files[name]), encode_save(text, self.save_format))
+                index = {
+                    "format": self.FORMAT_VERSION,
+                    "theme": theme_name,
+                    "active_character": active_char_name,
+                    "characters": files
+                }
+                write_atomic(self.index_path, encode_save(dump_save_json(index, self.save_format), self.save_format))
+            except IOError as e:
+                raise SaveError(f"Failed to save data to {self.directory}\n{e}") from e
+
+            # Drop the shards of deleted or renamed characters only once the new index is in place.
+            kept_files = set(files.values())
+            for name, filename in self._files.items():
+                if name not in files and filename not in kept_files:
+                    try:
+                        os.remove(os.path.join(self.directory, filename))
+                    except OSError:
+                        pass
+            self._files = files
+
+    def load(self, progress=None):
+        """Reads the index and returns a lazy roster; progress(done, total) only fires while migrating a v6 file."""
+        if not os.path.exists(self.index_path):
+            return self._migrate_legacy(progress)
+        try:
+            with open_save_file(self.index_path) as f:
+                index = json.load(f)
+        except LOAD_ERRORS as e:
+            report_error("Load Error", f"Failed to load data from {self.index_path}\n{e}")
+            return {}, "dark", None
+        self._files = dict(index.get("characters", {}))
+        roster = CharacterRoster(self._files, self._load_character)
+        return roster, index.get("theme", "dark"), index.get("active_character")
+
+    def _migrate_legacy(self, progress=None):
+        """Splits a v6 single-file save into shards. The v6 file is left in place as a backup."""
+        if not self.legacy_filepath or not os.path.exists(self.legacy_filepath):
+            return {}, "dark", None
+        characters, theme_name, active_char_name = PersistenceManager(self.legacy_filepath).load(progress)
+        if characters:
+            try:
+                self.save(characters, theme_name, active_char_name)
+            except SaveError as e:
+                report_error("Save Error", str(e))
+        return characters, theme_name, active_char_name
+
+class SQLitePersistenceManager:
+    """
+    Stores characters in normalized SQLite tables so single changes become
+    single-row writes and cross-character questions run as indexed SQL.
+    Remembers the rows it last wrote per character and only issues the
+    UPDATE/INSERT/DELETE statements needed to bring them up to date.
+    """
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS settings (
+            key TEXT PRIMARY KEY,
+            value TEXT
+        );
+        CREATE TABLE IF NOT EXISTS characters (
+            id INTEGER PRIMARY KEY,
+            name TEXT NOT NULL UNIQUE,
+            level INTEGER NOT NULL,
+            exp INTEGER NOT NULL,
+            notes TEXT NOT NULL,
+            attributes TEXT NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS skills (
+            character_id INTEGER NOT NULL REFERENCES characters(id) ON DELETE CASCADE,
+            position INTEGER NOT NULL,
+            name TEXT NOT NULL,
+            level INTEGER NOT NULL,
+            exp INTEGER NOT NULL,
+            PRIMARY KEY (character_id, position)
+        );
+        CREATE TABLE IF NOT EXISTS items (
+            id INTEGER PRIMARY KEY,
+            character_id INTEGER NOT NULL REFERENCES characters(id) ON DELETE CASCADE,
+            position INTEGER, -- Inventory order; NULL for equipped items
+            name TEXT NOT NULL,
+            description TEXT NOT NULL,
+            quantity INTEGER NOT NULL,
+            item_type TEXT NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS equipment (
+            character_id INTEGER NOT NULL REFERENCES characters(id) ON DELETE CASCADE,
+            slot TEXT NOT NULL,
+            item_id INTEGER REFERENCES items(id) ON DELETE SET NULL,
+            PRIMARY KEY (character_id, slot)
+        );
+        CREATE TABLE IF NOT EXISTS item_effects (
+            item_id INTEGER NOT NULL REFERENCES items(id) ON DELETE CASCADE,
+            attribute TEXT NOT NULL,
+            value INTEGER NOT NULL,
+            PRIMARY KEY (item_id, attribute)
+        );
+        CREATE INDEX IF NOT EXISTS idx_skills_name ON skills(name, level DESC);
+        CREATE INDEX IF NOT EXISTS idx_skills_level ON skills(level DESC, exp DESC);
+        CREATE INDEX IF NOT EXISTS idx_items_character ON items(character_id);
+        CREATE INDEX IF NOT EXISTS idx_items_name ON items(name);
+        CREATE INDEX IF NOT EXISTS idx_items_type ON items(item_type);
+    """
+
+    def __init__(self, filepath, legacy_filepath=None):
+        self.filepath = filepath
+        self.legacy_filepath = legacy_filepath
+        # sqlite3 connections must stay on the thread that opened them, so a
+        # background save gets its own; it is closed when that thread ends.
+        self._local = threading.local()
+        self._lock = threading.RLock() # Guards _ids and _rows between save() and lazy loads
+        self._ids = {} # Character name -> row id, for every character in the database
+        self._rows = {} # Character name -> rows as last written, see _character_rows
+        self._settings = None
+
+    @property
+    def conn(self):
+        """The calling thread's connection, opened on first use."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._local.conn = sqlite3.connect(self.filepath)
+            conn.execute("PRAGMA foreign_keys = ON")
+            conn.executescript(self.SCHEMA)
+        return conn
+
+    def close(self):
+        """Closes the calling thread's connection."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+    def _character_rows(self, char):
+        core = (char.level, char.exp, char.notes, json.dumps(char.attributes))
+        skills = [(s.name, s.level, s.exp) for s in char.skills]
+        items = (
+            tuple(self._item_row(item) for item in char.inventory),
+            tuple((slot, self._item_row(item) if item else None) for slot, item in char.equipment.items())
+        )
+        return {'core': core, 'skills': skills, 'items': items}
+
+    @staticmethod
+    def _item_row(item):
+        return (item.name, item.description, item.quantity, item.item_type, tuple(sorted(item.effects.items())))
+
+    def _write_character(self, name, char):
+        rows = self._character_rows(char)
+        old_rows = self._rows.get(name)
+        char_id = self._ids.get(name)
+        if char_id is None:
+            char_id = self.conn.execute(
+                "INSERT INTO characters (name, level, exp, notes, attributes) VALUES (?, ?, ?, ?, ?)",
+                (name, *rows['core'])).lastrowid
+            self._ids[name] = char_id
+        elif old_rows is None or rows['core'] != old_rows['core']:
+            self.conn.execute("UPDATE characters SET level = ?, exp = ?, notes = ?, attributes = ? WHERE id = ?",
+                              (*rows['core'], char_id))
+
+        old_skills = old_rows['skills'] if old_rows else None
+        if old_skills is None:
+            self.conn.execute("DELETE FROM skills WHERE character_id = ?", (char_id,))
+            old_skills = []
+        for position, skill_row in enumerate(rows['skills']):
+            if position >= len(old_skills):
+                self.conn.execute("INSERT INTO skills (character_id, position, name, level, exp) VALUES (?, ?, ?, ?, ?)",
+                                  (char_id, position, *skill_row))
+            elif skill_row != old_skills[position]:
+                self.conn.execute("UPDATE skills SET name = ?, level = ?, exp = ? WHERE character_id = ? AND position = ?",
+                                  (*skill_row, char_id, position))
+        if len(old_skills) > len(rows['skills']):
+            self.conn.execute("DELETE FROM skills WHERE character_id = ? AND position >= ?", (char_id, len(rows['skills'])))
+
+        if old_rows is None or rows['items'] != old_rows['items']:
+            self._write_items(char_id, char)
+        self._rows[name] = rows
+
+    def _write_items(self, char_id, char):
+        self.conn.execute("DELETE FROM equipment WHERE character_id = ?", (char_id,))
+        self.conn.execute("DELETE FROM items WHERE character_id = ?", (char_id,))
+
+        def insert_item(item, position):
+            item_id = self.conn.execute(
+                "INSERT INTO items (character_id, position, name, description, quantity, item_type) VALUES (?, ?, ?, ?, ?, ?)",
+                (char_id, position, item.name, item.description, item.quantity, item.item_type)).lastrowid
+            self.conn.executemany("INSERT INTO item_effects (item_id, attribute, value) VALUES (?, ?, ?)",
+                                  [(item_id, attr, value) for attr, value in item.effects.items()])
+            return item_id
+
+        for position, item in enumerate(char.inventory):
+            insert_item(item, position)
+        self.conn.executemany("INSERT INTO equipment (character_id, slot, item_id) VALUES (?, ?, ?)",
+                              [(char_id, slot, insert_item(item, None) if item else None)
+                               for slot, item in char.equipment.items()])
+
+    def save(self, characters, theme_name, active_char_name, dirty=None):
+        """
+        Brings the database in line with `characters`; unloaded roster
+        entries are left as stored. Raises SaveError if the transaction fails.
+        """
+        with self._lock:
+            if isinstance(characters, CharacterRoster):
+                loaded = characters.loaded_items()
+            else:
+                loaded = characters.items()
+            try:
+                with self.conn:
+                    for name in [name for name in self._ids if name not in characters]:
+                        self.conn.execute("DELETE FROM characters WHERE id = ?", (self._ids.pop(name),))
+                        self._rows.pop(name, None)
+                    for name, char in loaded:
+                        if dirty is None or name in dirty or name not in self._rows:
+                            self._write_character(name, char)
+                    if self._settings != (theme_name, active_char_name):
+                        self.conn.executemany("INSERT OR REPLACE INTO settings (key, value) VALUES (?, ?)",
+                                              [("theme", theme_name), ("active_character", active_char_name)])
+                        self._settings = (theme_name, active_char_name)
+            except sqlite3.Error as e:
+                # The transaction was rolled back, so forget what we thought we had written.
+                self._rows.clear()
+                self._settings = None
+                self._ids = dict(self.conn.execute("SELECT name, id FROM characters"))
+                raise SaveError(f"Failed to save data to {self.filepath}\n{e}") from e
+
+    def has_stored(self, name):
+        """Whether `name` has rows, which save() leaves as stored if a roster hands it over unloaded."""
+        return name in self._ids
+
+    def _load_character(self, name):
+        with self._lock:
+            return self._read_character(name)
+
+    def _read_character(self, name):
+        char_id = self._ids[name]
+        level, exp, notes, attributes = self.conn.execute(
+            "SELECT level, exp, notes, attributes FROM characters WHERE id = ?", (char_id,)).fetchone()
+        skills = [Skill(n, lvl, e) for n, lvl, e in self.conn.execute(
+            "SELECT name, level, exp FROM skills WHERE character_id = ? ORDER BY position", (char_id,))]
+
+        effects = {}
+        for item_id, attr, value in self.conn.execute(
+                "SELECT e.item_id, e.attribute, e.value FROM item_effects e JOIN items i ON i.id = e.item_id "
+                "WHERE i.character_id = ?", (char_id,)):
+            effects.setdefault(item_id, {})[attr] = value
+        items = {}
+        inventory = []
+        for item_id, position, item_name, description, quantity, item_type in self.conn.execute(
+                "SELECT id, position, name, description, quantity, item_type FROM items "
+                "WHERE character_id = ? ORDER BY position", (char_id,)):
+            item = items[item_id] = Item(item_name, description, quantity, item_type, effects.get(item_id))
+            if position is not None:
+                inventory.append(item)
+        equipment = {slot: None for slot in EQUIPMENT_SLOTS}
+        for slot, item_id in self.conn.execute("SELECT slot, item_id FROM equipment WHERE character_id = ?", (char_id,)):
+            equipment[slot] = items.get(item_id)
+
+        char = Character(name=name, level=level, exp=exp, skills=skills, notes=notes, inventory=inventory,
+                         equipment=equipment, attributes=json.loads(attributes))
+        self._rows[name] = self._character_rows(char)
+        return char
+
+    def load(self, progress=None):
+        """Returns a lazy roster; progress(done, total) only fires while importing a v6 file."""
+        is_new = not os.path.exists(self.filepath)
+        try:
+            if is_new and self.legacy_filepath and os.path.exists(self.legacy_filepath):
+                characters, theme_name, active_char_name = PersistenceManager(self.legacy_filepath).load(progress)
+                if characters:
+                    try:
+                        self.save(characters, theme_name, active_char_name)
+                    except SaveError as e:
+                        report_error("Save Error", str(e))
+                return characters, theme_name, active_char_name
+            self._ids = dict(self.conn.execute("SELECT name, id FROM characters ORDER BY id"))
+            settings = dict(self.conn.execute("SELECT key, value FROM settings"))
+        except sqlite3.Error as e:
+            report_error("Load Error", f"Failed to load data from {self.filepath}\n{e}")
+            return {}, "dark", None
+        self._rows = {}
+        self._settings = (settings.get("theme", "dark"), settings.get("active_character"))
+        roster = CharacterRoster(self._ids, self._load_character)
+        return roster, self._settings[0], self._settings[1]
+
+    # --- Cross-character queries ---
+    def characters_holding_item(self, item_name):
+        """Names of characters carrying or wearing an item with this exact name."""
+        return [row[0] for row in self.conn.execute(
+            "SELECT DISTINCT c.name FROM items i JOIN characters c ON c.id = i.character_id "
+            "WHERE i.name = ? ORDER BY c.name", (item_name,))]
+
+    def top_skills(self, limit=10, skill_name=None):
+        """(character name, skill name, level, exp) rows for the highest skills, optionally for one skill."""
+        query = "SELECT c.name, s.name, s.level, s.exp FROM skills s JOIN characters c ON c.id = s.character_id "
+        params = []
+        if skill_name is not None:
+            query += "WHERE s.name = ? "
+            params.append(skill_name)
+        query += "ORDER BY s.level DESC, s.exp DESC LIMIT ?"
+        params.append(limit)
+        return self.conn.execute(query, params).fetchall()
+
+def migrate_storage(source, target):
+    """
+    Copies every character and setting from one persistence manager to
+    another (e.g. JSON <-> SQLite), replacing whatever the target held:
+    characters the source doesn't have are removed from it. Raises
+    SaveError if the target can't be written.
+    """
+    characters, theme_name, active_char_name = source.load()
+    characters = dict(characters.items()) # Materialize lazy rosters so every character is written
+    target.load() # So the target knows what it already stores, and updates or removes it instead of re-adding it
+    target.save(characters, theme_name, active_char_name)
+
+def create_persistence_manager(backend):
+    if backend == "json":
+        return PersistenceManager(SAVE_FILE, save_format=SAVE_FORMAT, snapshot_path=SAVE_SNAPSHOT)
+    if backend == "sharded":
+        return ShardedPersistenceManager(SAVE_DIR, legacy_filepath=SAVE_FILE, save_format=SAVE_FORMAT)
+    if backend == "sqlite":
+        return SQLitePersistenceManager(SAVE_DB, legacy_filepath=SAVE_FILE)
+    raise ValueError(f"Unknown storage backend '{backend}'")
+
+# --- Export ---
+# Per target: the file extension, how text is escaped, the document skeleton, and
+# each section's templates. List sections are (title, opening, row, closing, empty).
+SHEET_TARGETS = {
+    "markdown": {
+        "extension": ".md",
+        "escape": None,
+        "document": "{body}",
+        "header": "# Character Sheet: {0}\n",
+        "header_separator": "\n",
+        "section_separator": "\n\n---\n\n",
+        "status": ("## Status", None, "- **{0}:** {1}", None, None),
+        "attributes": ("## Attributes", "| Attribute    | Base | Total | Modifier |\n|--------------|------|-------|----------|",
+                       "| {0:<12} | {1:<4} | {2:<5} | {3:+<8} |", None, None),
+        "skills": ("## Skills", "| Skill        | Level | Experience |\n|--------------|-------|------------|",
+                   "| {0:<12} | {1:<5} | {2:<10} |", None, None),
+        "equipment": ("## Equipment", None, "- **{0}:** {1}", None, "_No items equipped._"),
+        "inventory": ("## Inventory", None, "- **{0} (x{1})**", None, "_Inventory is empty._"),
+        "described_item": "- **{0} (x{1})**: {2}",
+        "notes": ("## Notes", "{0}", "_No notes._"),
+    },
+    "text": {
+        "extension": ".txt",
+        "escape": None,
+        "document": "{body}\n",
+        "header": "CHARACTER SHEET: {0}\n" + "=" * 40,
+        "header_separator": "\n\n",
+        "section_separator": "\n\n",
+        "status": ("STATUS", None, "  {0:<12} {1}", None, None),
+        "attributes": ("ATTRIBUTES", "  Attribute     Base  Total  Modifier", "  {0:<12}  {1:>4}  {2:>5}  {3:>+8}", None, None),
+        "skills": ("SKILLS", "  Skill         Level  Experience", "  {0:<12}  {1:>5}  {2}", None, None),
+        "equipment": ("EQUIPMENT", None, "  {0:<12} {1}", None, "  (no items equipped)"),
+        "inventory": ("INVENTORY", None, "  {0} (x{1})", None, "  (inventory is empty)"),
+        "described_item": "  {0} (x{1}): {2}",
+        "notes": ("NOTES", "{0}", "  (no notes)"),
+    },
+    "html": {
+        "extension": ".html",
+        "escape": lambda text: html.escape(text).replace("\n", "<br>\n"),
+        "document": ("<!DOCTYPE html>\n<html>\n<head>\n<meta charset=\"utf-8\">\n<title>Character Sheet: {title}</title>\n"
+                     "</head>\n<body>\n{body}\n</body>\n</html>\n"),
+        "header": "<h1>Character Sheet: {0}</h1>",
+        "header_separator": "\n",
+        "section_separator": "\n",
+        "status": ("<h2>Status</h2>", "<ul>", "<li><strong>{0}:</strong> {1}</li>", "</ul>", None),
+        "attributes": ("<h2>Attributes</h2>", "<table>\n<tr><th>Attribute</th><th>Base</th><th>Total</th><th>Modifier</th></tr>",
+                       "<tr><td>{0}</td><td>{1}</td><td>{2}</td><td>{3:+}</td></tr>", "</table>", None),
+        "skills": ("<h2>Skills</h2>", "<table>\n<tr><th>Skill</th><th>Level</th><th>Experience</th></tr>",
+                   "<tr><td>{0}</td><td>{1}</td><td>{2}</td></tr>", "</table>", None),
+        "equipment": ("<h2>Equipment</h2>", "<ul>", "<li><strong>{0}:</strong> {1}</li>", "</ul>", "<p><em>No items equipped.</em></p>"),
+        "inventory": ("<h2>Inventory</h2>", "<ul>", "<li><strong>{0} (x{1})</strong></li>", "</ul>", "<p><em>Inventory is empty.</em></p>"),
+        "described_item": "<li><strong>{0} (x{1})</strong>: {2}</li>",
+        "notes": ("<h2>Notes</h2>", "<p>{0}</p>", "<p><em>No notes.</em></p>"),
+    },
+}
+
+def _exp_progress(exp, level, separator):
+    next_exp = get_exp_for_next_level(level)
+    return f"{exp}{separator}{next_exp}" if next_exp != float('inf') else "MAX"
+
+# What each sheet section is rendered from. The tuples double as cache keys, so
+# they hold raw values; sorting and formatting happen in _SHEET_SECTION_ROWS.
+_SHEET_SECTION_DATA = {
+    "header": lambda char: (char.name,),
+    "status": lambda char: (("Level", char.level), ("Experience", _exp_progress(char.exp, char.level, " / ")),
+                            ("Health", char.get_health()), ("Mana", char.get_mana())),
+    "attributes": lambda char: tuple((attr, char.attributes.get(attr, 10), char.get_total_attribute(attr),
+                                      char.get_attribute_modifier(attr)) for attr in CORE_ATTRIBUTES),
+    "skills": lambda char: tuple((skill.name, skill.level, skill.exp) for skill in char.skills),
+    "equipment": lambda char: tuple((slot, item.name) for slot, item in char.equipment.items() if item),
+    "inventory": lambda char: tuple((item.name, item.quantity, item.description) for item in char.inventory),
+    "notes": lambda char: (char.notes.strip(),),
+}
+_SHEET_SECTION_ROWS = {
+    "skills": lambda data: [(name, level, _exp_progress(exp, level, "/"))
+                            for name, level, exp in sorted(data, key=operator.itemgetter(0))],
+    "inventory": lambda data: sorted(data, key=operator.itemgetter(0)),
+}
+
+class SheetRenderer:
+    """
+    Renders character sheets for one of SHEET_TARGETS. The target's
+    templates are compiled into one function per section up front, and each
+    rendered section is cached per character name along with the data it was
+    rendered from, so rendering a character again only redoes the sections
+    whose data changed. `hits` and `misses` count sections. Whoever keeps a
+    renderer across exports owns its cache and should prune() it to the
+    current roster.
+    """
+    SECTIONS = ("header", "status", "attributes", "skills", "equipment", "inventory", "notes")
+
+    def __init__(self, target="markdown"):
+        if target not in SHEET_TARGETS:
+            raise ValueError(f"Unknown sheet target '{target}'")
+        self.target = target
+        spec = SHEET_TARGETS[target]
+        escape = spec["escape"]
+        self._escape = (lambda value: escape(value) if isinstance(value, str) else value) if escape else None
+        self._document = spec["document"].format
+        self._header_separator = spec["header_separator"]
+        self._section_separator = spec["section_separator"]
+        self._sections = [(name, _SHEET_SECTION_DATA[name], self._compile(name, spec)) for name in self.SECTIONS]
+        self._cache = {} # Character name -> {section: (data, text)}, plus None: document
+        self.hits = self.misses = 0
+
+    def _fields(self, values):
+        return values if self._escape is None else [self._escape(value) for value in values]
+
+    def _compile(self, name, spec):
+        """The function turning a section's data into its text, or None when the section is left out."""
+        fields = self._fields
+        if name == "header":
+            header = spec["header"].format
+            return lambda data: header(*fields(data))
+        if name == "notes":
+            title, body, empty = spec["notes"]
+            body = body.format
+            return lambda data: f"{title}\n{body(*fields(data)) if data[0] else empty}"
+
+        title, opening, row, closing, empty = spec[name]
+        row = row.format
+        described = spec["described_item"].format if name == "inventory" else None
+        to_rows = _SHEET_SECTION_ROWS.get(name, list)
+
+        def render(data):
+            if not data:
+                return None if empty is None else f"{title}\n{empty}"
+            lines = [title] if opening is None else [title, opening]
+            for values in to_rows(data):
+                if described is not None and values[2]:
+                    lines.append(described(*fields(values)))
+                else:
+                    lines.append(row(*fields(values)))
+            if closing is not None:
+                lines.append(closing)
+            return "\n".join(lines)
+        return render
+
+    def render(self, char):
+        cache = self._cache.setdefault(char.name, {})
+        texts = []
+        changed = False
+        for name, data_for, render in self._sections:
+            data = data_for(char)
+            cached = cache.get(name)
+            if cached is not None and cached[0] == data:
+                self.hits += 1
+            else:
+                self.misses += 1
+                changed = True
+                cached = cache[name] = (data, render(data))
+            if cached[1] is not None:
+                texts.append(cached[1])
+        if changed or None not in cache:
+            body = texts[0] + self._header_separator + self._section_separator.join(texts[1:])
+            title = char.name if self._escape is None else self._escape(char.name)
+            cache[None] = self._document(body=body, title=title)
+        return cache[None]
+
+    def prune(self, names):
+        """Drops cached sections of characters not in `names`."""
+        for name in [name for name in self._cache if name not in names]:
+            del self._cache[name]
+
+def render_character_sheet(char, target="markdown", renderer=None):
+    """
+    A character's sheet (status, attributes, skills, equipment, inventory and
+    notes) as one of SHEET_TARGETS. Pass a SheetRenderer for `target` to
+    reuse its cached sections; without one nothing is cached.
+    """
+    return (renderer or SheetRenderer(target)).render(char)
+
+def sheet_target_for(filepath):
+    """The SHEET_TARGETS entry whose extension `filepath` has; Markdown for anything else."""
+    extension = os.path.splitext(filepath)[1].lower()
+    return next((target for target, spec in SHEET_TARGETS.items() if spec["extension"] == extension), "markdown")
+
+def sheet_filename(name, target="markdown"):
+    """Default file name for a character's sheet, with characters no file system allows replaced."""
+    return re.sub(r'[\\/:*?"<>|\x00-\x1f]', '_', name.replace(' ', '_')) + "_sheet" + SHEET_TARGETS[target]["extension"]
+
+def _render_sheet_batch(job):
+    """
+    Export worker job: renders a (target, [(name, character_to_dict())])
+    batch into (name, sheet, error) triples. A character that fails to
+    render gets an error message instead of stopping the batch. Nothing is
+    cached between batches, so pooled exports always render every section.
+    """
+    target, batch = job
+    renderer = SheetRenderer(target) # Compiled once per batch and dropped with it
+    results = []
+    for name, char_data in batch:
+        try:
+            results.append((name, render_character_sheet(character_from_dict(char_data), target, renderer), None))
+        except Exception as e:
+            results.append((name, None, f"{type(e).__name__}: {e}"))
+    return results
+
+def _submit_bounded(executor, func, jobs, in_flight):
+    """
+    Yields (job, future) pairs as futures finish, submitting from `jobs`
+    lazily so no more than `in_flight` jobs and their results are held at once.
+    Once the pool breaks (a worker died, or submit() refuses) nothing more is
+    taken from `jobs`; the jobs in flight come back with failed futures.
+    """
+    pending = {}
+    for job in jobs:
+        try:
+            pending[executor.submit(func, job)] = job
+        except (BrokenProcessPool, RuntimeError) as e:
+            failed = Future()
+            failed.set_exception(e if isinstance(e, BrokenProcessPool) else BrokenProcessPool(str(e)))
+            pending[failed] = job
+            break
+        if len(pending) >= in_flight:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            broken = False
+            for future in done:
+                broken = broken or isinstance(future.exception(), BrokenProcessPool)
+                yield pending.pop(future), future
+            if broken:
+                break
+    for future in as_completed(pending):
+        yield pending[future], future
+
+def _drain(queue):
+    while queue:
+        yield queue.popleft()
+
+def export_sheets(characters, destination, target="markdown", processes=1, batch_size=EXPORT_BATCH_SIZE,
+                  progress=None, renderer=None):
+    """
+    Renders every character's sheet (one of SHEET_TARGETS) and streams each
+    one out as it is done: as files in the `destination` directory, or into
+    one zip archive when destination ends in ".zip". A character that fails
+    to render or write is recorded and skipped.
+
+    By default sheets render here, through `renderer` if given (a
+    SheetRenderer for `target` the caller keeps), so sections unchanged
+    since its last use come from its cache. processes > 1 (None: one per
+    CPU) renders in a process pool instead, which only pays off when
+    rendering outweighs sending every character to a worker and rebuilding
+    it there. The pool path is uncached, and it is only used while the
+    derived stats are the defaults: workers rebuild characters under the
+    formulas their own import set up, and formulas can't be sent to them.
+    If a worker dies, the batches it took down are retried one character
+    at a time on a fresh pool, so only the character that kills a worker
+    is recorded as failed. progress(done, total) is called after every batch.
+
+    Returns {'exported', 'failed' ({name: error}), 'bytes', 'seconds',
+    'sheets_per_second'}. Raises IOError if the destination can't be opened,
+    and ValueError if `renderer` is for another target.
+    """
+    if renderer is not None and renderer.target != target:
+        raise ValueError(f"Renderer is for '{renderer.target}', not '{target}'")
+    start = time.perf_counter()
+    names = list(characters)
+    report = {'exported': 0, 'failed': {}, 'bytes': 0}
+    used_filenames = set()
+
+    def jobs():
+        for first in range(0, len(names), batch_size):
+            batch = []
+            for name in names[first:first + batch_size]:
+                try:
+                    batch.append((name, character_to_dict(characters[name])))
+                except Exception as e:
+                    report['failed'][name] = f"{type(e).__name__}: {e}"
+            yield target, batch
+
+    def render_here():
+        local = renderer or SheetRenderer(target)
+        for first in range(0, len(names), batch_size):
+            results = []
+            for name in names[first:first + batch_size]:
+                try:
+                    results.append((name, local.render(characters[name]), None))
+                except Exception as e:
+                    results.append((name, None, f"{type(e).__name__}: {e}"))
+            yield results
+
+    if destination.lower().endswith(".zip"):
+        archive = zipfile.ZipFile(destination, 'w', zipfile.ZIP_DEFLATED)
+    else:
+        archive = None
+        os.makedirs(destination, exist_ok=True)
+
+    def write(name, sheet):
+        filename = sheet_filename(name, target)
+        stem, extension = os.path.splitext(filename)
+        copy = 1
+        while filename.lower() in used_filenames: # Names that only differ in replaced or cased characters
+            copy += 1
+            filename = f"{stem[:-len('_sheet')]}_{copy}_sheet{extension}"
+        used_filenames.add(filename.lower())
+        data = sheet.encode('utf-8')
+        if archive is not None:
+            archive.writestr(filename, data)
+        else:
+            with open(os.path.join(destination, filename), 'wb') as f:
+                f.write(data)
+        report['bytes'] += len(data)
+
+    def collect(results):
+        for name, sheet, error in results:
+            if error is None:
+                try:
+                    write(name, sheet)
+                    report['exported'] += 1
+                    continue
+                except IOError as e:
+                    error = f"{type(e).__name__}: {e}"
+            report['failed'][name] = error
+        if progress:
+            progress(report['exported'] + len(report['failed']), len(names))
+
+    def render_pooled(executor, source, in_flight):
+        """Collects sheets from `executor`; returns the batches lost if a worker died and broke the pool, else None."""
+        lost = None
+        for (_, batch), future in _submit_bounded(executor, _render_sheet_batch, source, in_flight):
+            try:
+                results = future.result()
+            except BrokenProcessPool as e:
+                lost = lost or []
+                if in_flight > 1:
+                    lost.append(batch)
+                    continue
+                # Running alone, so this character is what killed the worker
+                results = [(name, None, f"{type(e).__name__}: {e}") for name, _ in batch]
+            except Exception as e: # The batch couldn't be sent
+                results = [(name, None, f"{type(e).__name__}: {e}") for name, _ in batch]
+            collect(results)
+        return lost
+
+    processes = processes or os.cpu_count() or 1
+    if STAT_GRAPH.definitions != DERIVED_STATS:
+        processes = 1 # Workers would render the default derived stats
+    try:
+        if processes == 1: # A lone worker would only add pickling and IPC to the same work
+            for results in render_here():
+                collect(results)
+        else:
+            remaining, retry = jobs(), deque()
+            while True:
+                with ProcessPoolExecutor(processes) as executor:
+                    lost = render_pooled(executor, _drain(retry), 1) if retry else None
+                    if lost is None:
+                        # Two jobs per worker keep every process busy without buffering the roster.
+                        lost = render_pooled(executor, remaining, 2 * processes)
+                if lost is None:
+                    break
+                # Every batch in flight died with the pool; retry them on a fresh one, one character each
+                retry.extend((target, [entry]) for batch in lost for entry in batch)
+    finally:
+        if archive is not None:
+            archive.close()
+
+    report['seconds'] = time.perf_counter() - start
+    report['sheets_per_second'] = report['exported'] / report['seconds'] if report['seconds'] else 0.0
+    return report
@@ -0,0 +1,68 @@
+"""Roster-wide derived stats (recompute_all_stats) against per-character evaluation.
+
+Run with `python -m unittest test_derived_stats` or `python -m pytest test_derived_stats.py`.
+"""
+import random
+import unittest
+from unittest import mock
+
+import character_tracker_core
+from character_tracker_core import CORE_ATTRIBUTES, Character, Item, recompute_all_stats, set_derived_stats
+
+PATCHES = {
+    "arithmetic": {"Health": (("Constitution Total", "level"), lambda con, level: 80 + con * 4 + level * 2),
+                   "Toughness": (("Health", "Strength"), lambda health, strength: health / 10 + strength % 3)},
+    "branching": {"Health": (("Constitution Total",), lambda con: 150 if con > 15 else 100),
+                  "Mana": (("Intelligence", "level"), lambda intelligence, level: max(intelligence, level) * 3)},
+    "rounding": {"Mana": (("Intelligence",), lambda intelligence: round(intelligence / 3))},
+    "constant": {"Luck": ((), lambda: 7)},
+}
+
+
+def _roster(seed, count=300):
+    rng = random.Random(seed)
+    roster = []
+    for c in range(count):
+        char = Character(name=f"Character {c}", level=rng.randint(1, 50),
+                         attributes={attr: rng.randint(3, 20) for attr in CORE_ATTRIBUTES})
+        if c % 3:
+            char.equip("Ring 1", Item("Ring of Vigor", item_type="Ring", effects={"Constitution": rng.randint(1, 4)}))
+        roster.append(char)
+    return roster
+
+
+class RecomputeAllStatsTestCase(unittest.TestCase):
+    numpy = True
+
+    def setUp(self):
+        if self.numpy and character_tracker_core.np is None:
+            self.skipTest("NumPy is not installed")
+        if not self.numpy:
+            patcher = mock.patch.object(character_tracker_core, "np", None)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        definitions = dict(character_tracker_core.DERIVED_STATS)
+        self.addCleanup(set_derived_stats, definitions)
+        self.definitions = definitions
+
+    def test_matches_per_character_evaluation(self):
+        for patch, stats in PATCHES.items():
+            with self.subTest(patch=patch):
+                graph = set_derived_stats({**self.definitions, **stats})
+                roster = _roster(seed=len(patch))
+                expected = [graph.evaluate(char._stat_input, {}) for char in roster]
+                columns = recompute_all_stats(roster)
+                for char, values in zip(roster, expected):
+                    self.assertEqual(char.derived_stats(), values)
+                    for stat, value in values.items():
+                        self.assertIs(type(char.derived_stats()[stat]), type(value), stat)
+                self.assertEqual(columns["Health"], [values["Health"] for values in expected])
+
+
+class PurePythonRecomputeAllStatsTestCase(RecomputeAllStatsTestCase):
+    """The same checks with NumPy hidden, so every formula runs per value."""
+    numpy = False
+
+
+if __name__ == "__main__":
+    unittest.main()
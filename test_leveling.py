@@ -0,0 +1,110 @@
+"""Vectorized leveling (SkillLevelArrays) against the scalar engine.
+
+Run with `python -m unittest test_leveling` or `python -m pytest test_leveling.py`.
+"""
+import random
+import unittest
+from unittest import mock
+
+import character_tracker_core
+from character_tracker_core import (
+    MAX_LEVEL, Skill, SkillLevelArrays, get_exp_for_next_level, rebuild_exp_tables, resolve_level_gain,
+    resolve_level_loss
+)
+
+
+def _scalar(level, exp, delta):
+    if delta >= 0:
+        return resolve_level_gain(level, exp, delta)
+    return resolve_level_loss(level, exp, -delta)
+
+
+def _loop_scalar(level, exp, delta):
+    """The original per-level loops, independent of the prefix table."""
+    exp += delta
+    while level < MAX_LEVEL and exp >= get_exp_for_next_level(level):
+        exp -= get_exp_for_next_level(level)
+        level += 1
+    while level > 1 and exp < 0:
+        level -= 1
+        exp += get_exp_for_next_level(level)
+    return level, max(exp, 0)
+
+
+def _cases(seed, count=2000):
+    """(level, exp, delta) triples: random ones plus level-boundary and out-of-table edges."""
+    rng = random.Random(seed)
+    cases = [(rng.randint(1, MAX_LEVEL), rng.randint(0, 300), rng.randint(-2_000_000, 2_000_000))
+             for _ in range(count)]
+    for level in (1, 2, MAX_LEVEL - 1, MAX_LEVEL):
+        need = get_exp_for_next_level(level)
+        need = 0 if need == float('inf') else need
+        for delta in (0, 1, -1, need, need - 1, -need, 10 ** 9, -10 ** 9):
+            cases.append((level, 0, delta))
+            cases.append((level, 5, delta))
+    for level in (0, MAX_LEVEL + 3): # Outside the table, resolved per level
+        for delta in (0, 50, -50, 10 ** 6, -10 ** 6):
+            cases.append((level, 10, delta))
+    return cases
+
+
+class LevelingTestCase(unittest.TestCase):
+    numpy = True
+
+    def setUp(self):
+        if self.numpy and character_tracker_core.np is None:
+            self.skipTest("NumPy is not installed")
+        if not self.numpy:
+            patcher = mock.patch.object(character_tracker_core, "np", None)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def apply(self, cases):
+        arrays = SkillLevelArrays([Skill(f"Skill {i}", level, exp) for i, (level, exp, _) in enumerate(cases)])
+        arrays.apply_exp([delta for _, _, delta in cases])
+        arrays.write_back()
+        return [(skill.level, skill.exp) for skill in arrays.skills]
+
+    def test_apply_exp_matches_scalar(self):
+        cases = _cases(seed=1)
+        self.assertEqual(self.apply(cases), [_scalar(*case) for case in cases])
+
+    def test_scalar_matches_per_level_loops(self):
+        for case in _cases(seed=2):
+            if 1 <= case[0] <= MAX_LEVEL:
+                self.assertEqual(_scalar(*case), _loop_scalar(*case), case)
+
+    def test_rebuilt_curve_is_used_by_both_paths(self):
+        self.addCleanup(rebuild_exp_tables) # Runs last, after the patches below are undone
+        for name, value in (("BASE_EXP", 80), ("GROWTH_FACTOR", 1.4)):
+            patcher = mock.patch.object(character_tracker_core, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        old_exp_table = rebuild_exp_tables()
+        self.assertNotEqual(old_exp_table, character_tracker_core.EXP_TABLE)
+        self.assertEqual(character_tracker_core.CUMULATIVE_EXP_TABLE,
+                         character_tracker_core.generate_cumulative_exp_table(character_tracker_core.EXP_TABLE))
+        self.assertEqual(get_exp_for_next_level(10), int(80 * 10 ** 1.4))
+        cases = _cases(seed=3)
+        self.assertEqual(self.apply(cases), [_loop_scalar(*case) if 1 <= case[0] <= MAX_LEVEL else _scalar(*case)
+                                             for case in cases])
+
+    def test_rebalance_matches_scalar(self):
+        rng = random.Random(4)
+        old_exp_table = [0] + [int(80 * (lvl ** 1.4)) for lvl in range(1, MAX_LEVEL + 1)]
+        old_cumulative = character_tracker_core.generate_cumulative_exp_table(old_exp_table)
+        skills = [Skill(f"Skill {i}", rng.randint(1, MAX_LEVEL), rng.randint(0, 300)) for i in range(2000)]
+        expected = [resolve_level_gain(1, 0, old_cumulative[skill.level] + skill.exp) for skill in skills]
+        arrays = SkillLevelArrays(skills)
+        arrays.rebalance(old_exp_table)
+        arrays.write_back()
+        self.assertEqual([(skill.level, skill.exp) for skill in skills], expected)
+
+
+class PurePythonLevelingTestCase(LevelingTestCase):
+    """The same checks with NumPy hidden, so SkillLevelArrays falls back to the scalar engine."""
+    numpy = False
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,80 @@
+"""migrate_storage() between every pair of storage backends, run more than once.
+
+Run with `python -m unittest test_migration` or `python -m pytest test_migration.py`.
+"""
+import os
+import tempfile
+import unittest
+
+from character_tracker_core import (
+    Character, Item, PersistenceManager, ShardedPersistenceManager, Skill, SQLitePersistenceManager,
+    character_to_dict, migrate_storage
+)
+
+BACKENDS = {
+    "json": lambda tmp: PersistenceManager(os.path.join(tmp, "character_data_v6.json")),
+    "sharded": lambda tmp: ShardedPersistenceManager(os.path.join(tmp, "character_data")),
+    "sqlite": lambda tmp: SQLitePersistenceManager(os.path.join(tmp, "character_data.db")),
+}
+
+
+def _roster(names):
+    roster = {}
+    for number, name in enumerate(names, start=1):
+        char = Character(name=name, level=number, exp=number * 10, notes=f"Notes for {name}")
+        char.skills = [Skill(f"Skill {i}", i + number, i) for i in range(3)]
+        char.inventory = [Item(f"Item {i}", quantity=i + 1, item_type="Material") for i in range(4)]
+        char.equipment["Weapon"] = Item("Sword", item_type="Weapon", effects={"Strength": number})
+        roster[name] = char
+    return roster
+
+
+def _close(manager):
+    if hasattr(manager, "close"):
+        manager.close()
+
+
+class MigrateStorageTestCase(unittest.TestCase):
+    def migrate(self, tmp, source_kind, target_kind, roster, active):
+        """Saves `roster` with a fresh source manager and migrates it with a fresh target, as the CLI does."""
+        source, target = BACKENDS[source_kind](tmp), BACKENDS[target_kind](tmp)
+        try:
+            source.load()
+            source.save(roster, "light", active)
+            migrate_storage(source, target)
+        finally:
+            _close(source)
+            _close(target)
+
+    def stored(self, tmp, kind):
+        manager = BACKENDS[kind](tmp)
+        try:
+            characters, theme_name, active_char_name = manager.load()
+            return {name: character_to_dict(char) for name, char in characters.items()}, theme_name, active_char_name
+        finally:
+            _close(manager)
+
+    def test_migrating_twice_replaces_the_target(self):
+        for source_kind in BACKENDS:
+            for target_kind in BACKENDS:
+                if source_kind == target_kind:
+                    continue
+                with self.subTest(source=source_kind, target=target_kind), tempfile.TemporaryDirectory() as tmp:
+                    first = _roster(["Aria", "Borin", "Cass"])
+                    self.migrate(tmp, source_kind, target_kind, first, "Aria")
+
+                    second = _roster(["Aria", "Cass", "Dara"])
+                    second["Cass"].notes = "Changed since the first migration"
+                    self.migrate(tmp, source_kind, target_kind, second, "Dara")
+
+                    characters, theme_name, active_char_name = self.stored(tmp, target_kind)
+                    self.assertEqual(characters, {name: character_to_dict(char) for name, char in second.items()})
+                    self.assertEqual((theme_name, active_char_name), ("light", "Dara"))
+                    if target_kind == "sharded":
+                        directory = os.path.join(tmp, "character_data")
+                        shards = set(os.listdir(directory)) - {ShardedPersistenceManager.INDEX_FILE}
+                        self.assertEqual(len(shards), len(second)) # No shard left behind for Borin
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,71 @@
+"""Uid, name and position lookups (RecordIndex) against the record lists they index.
+
+Run with `python -m unittest test_record_index` or `python -m pytest test_record_index.py`.
+"""
+import random
+import unittest
+
+from character_tracker_core import Character, Item, RecordIndex
+
+NAMES = ["Rope", "Torch", "Potion", "Arrow", "Ration"]
+
+
+class RecordIndexTestCase(unittest.TestCase):
+    def assertIndexes(self, char, inventory):
+        for position, item in enumerate(inventory):
+            self.assertIs(char.record_for_uid(inventory, item.uid), item)
+            self.assertEqual(char.position_for_uid(inventory, item.uid), position)
+        for name in NAMES:
+            named = char.items_named(name) # In the order they were indexed, not list order
+            self.assertCountEqual([item.uid for item in named], [item.uid for item in inventory if item.name == name])
+
+    def test_positions_follow_edits_and_deletes(self):
+        rng = random.Random(1)
+        char = Character(name="Packrat")
+        char.inventory = [Item(rng.choice(NAMES)) for _ in range(500)]
+        inventory = char.inventory
+        self.assertIndexes(char, inventory)
+        gone = []
+        for step in range(600):
+            action = rng.random()
+            if action < 0.5 and inventory:
+                position = rng.randrange(len(inventory))
+                gone.append(inventory[position])
+                char.unindex_record(inventory, position)
+                del inventory[position]
+            elif action < 0.7:
+                inventory.append(Item(rng.choice(NAMES)))
+                char.index_record(inventory, len(inventory) - 1)
+            elif inventory:
+                position = rng.randrange(len(inventory))
+                replaced, inventory[position] = inventory[position], Item(rng.choice(NAMES))
+                gone.append(replaced)
+                char.index_record(inventory, position, replaced=replaced)
+            if step % 50 == 0:
+                self.assertIndexes(char, inventory)
+        self.assertIndexes(char, inventory)
+        for item in gone:
+            self.assertIsNone(char.position_for_uid(inventory, item.uid))
+            self.assertIsNone(char.record_for_uid(inventory, item.uid))
+
+    def test_renamed_skill_is_refiled_in_place(self):
+        char = Character(name="Scholar")
+        for name in ("Alchemy", "Smithing", "Tailoring"):
+            char.add_skill(name)
+        char.update_skill(1, name="Armoring")
+        self.assertIsNone(char.skill_named("Smithing"))
+        self.assertIs(char.skill_named("Armoring"), char.skills[1])
+        self.assertEqual(char.position_for_uid(char.skills, char.skills[1].uid), 1)
+
+    def test_delete_renumbers_once_most_slots_are_freed(self):
+        items = [Item(f"Item {i}") for i in range(10)]
+        index = RecordIndex(items)
+        for item in items[:8]:
+            index.discard(item)
+        self.assertEqual([index.position(item.uid) for item in items[8:]], [0, 1])
+        index.add(Item("Late"))
+        self.assertEqual(len(index), 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
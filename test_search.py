@@ -0,0 +1,92 @@
+"""SearchIndex and sorted searches against a plain substring scan.
+
+Run with `python -m unittest test_search` or `python -m pytest test_search.py`.
+"""
+import random
+import unittest
+
+from character_tracker_core import (
+    INVENTORY_SORT_KEYS, SEARCH_SHORT_TERM_HITS, Character, Item, SearchIndex, search_capped
+)
+
+WORDS = ["iron", "sword", "shield", "potion", "golden", "goblin", "dagger", "ring", "dragon", "old"]
+TERMS = ["gol", "gold", "golden", "old", "olden", "lde", "golden d", "golden dagger", "dagger 1", " ring",
+         "ring\0", "x y", "zzz", "n s", "iron sword 12"]
+
+
+def _text(rng, number):
+    return f"{rng.choice(WORDS)} {rng.choice(WORDS)} {number}\0{rng.choice(WORDS)}\0{rng.choice(WORDS)} {rng.choice(WORDS)}"
+
+
+def _scan(texts, term):
+    return [position for position, text in enumerate(texts) if term in text]
+
+
+class SearchIndexTestCase(unittest.TestCase):
+    def assertSearches(self, index, texts, terms=TERMS):
+        for term in terms:
+            expected = _scan(texts, term)
+            found = index.search(term)
+            if search_capped(term, len(found)):
+                expected = expected[:SEARCH_SHORT_TERM_HITS]
+            self.assertEqual(found, expected, repr(term))
+
+    def test_matches_scan_through_edits(self):
+        rng = random.Random(1)
+        texts = [_text(rng, i) for i in range(3000)]
+        index = SearchIndex(texts)
+        self.assertSearches(index, texts)
+        for step in range(300):
+            action = rng.random()
+            if action < 0.4 and texts:
+                position = rng.randrange(len(texts))
+                index.delete(position)
+                del texts[position]
+            elif action < 0.7:
+                texts.append(_text(rng, 5000 + step))
+                index.set(len(texts) - 1, texts[-1])
+            else:
+                position = rng.randrange(len(texts))
+                texts[position] = _text(rng, 9000 + step)
+                index.set(position, texts[position])
+            if step % 25 == 0:
+                self.assertSearches(index, texts)
+        self.assertSearches(index, texts)
+
+    def test_short_terms_stop_at_the_cap(self):
+        texts = [f"golden ring {i}" for i in range(SEARCH_SHORT_TERM_HITS * 2)] + ["ga"]
+        index = SearchIndex(texts)
+        self.assertEqual(index.search("g"), list(range(SEARCH_SHORT_TERM_HITS)))
+        self.assertEqual(index.search("ga"), [len(texts) - 1]) # Too few matches to reach the cap
+        self.assertEqual(index.search("gold"), _scan(texts, "gold"))
+
+    def test_time_sliced_search_restarts_after_a_change(self):
+        texts = [f"golden ring {i}" for i in range(500)]
+        index = SearchIndex(texts)
+        search = index.iter_search("golden", chunk_size=50)
+        next(search)
+        index.delete(0)
+        del texts[0]
+        with self.assertRaises(StopIteration) as done:
+            while True:
+                next(search)
+        self.assertEqual(done.exception.value, _scan(texts, "golden"))
+
+
+class SortedSearchTestCase(unittest.TestCase):
+    def test_capped_search_takes_the_first_matches_in_sort_order(self):
+        rng = random.Random(2)
+        char = Character(name="Hoarder")
+        char.inventory = [Item(f"{rng.choice(WORDS)} {i}", item_type=rng.choice(["Weapon", "Ring"]))
+                          for i in range(SEARCH_SHORT_TERM_HITS * 3)]
+        key = INVENTORY_SORT_KEYS["Item Name"]
+        for reverse in (False, True):
+            everything = sorted((item for item in char.inventory if "g" in char._search_text(char.inventory, item)),
+                                key=key, reverse=reverse)
+            shown = char.sorted_records(char.inventory, "Item Name", reverse, "g")
+            self.assertEqual(len(shown), SEARCH_SHORT_TERM_HITS)
+            self.assertEqual(list(map(key, shown)), list(map(key, everything[:SEARCH_SHORT_TERM_HITS])))
+
+
+if __name__ == "__main__":
+    unittest.main()